@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 from . import acquisition, exceptions, models, optim, posteriors, test_functions
-from .cross_validation import batch_cross_validation
+from .cross_validation import batch_cross_validation, loo_cross_validation
 from .fit import fit_gpytorch_model
 from .gen import gen_candidates_scipy, gen_candidates_torch, get_best_candidates
+from .model_selection import batch_model_selection
 from .utils import manual_seed
 
 
@@ -13,11 +14,13 @@ __version__ = "0.1.0"
 __all__ = [
     "acquisition",
     "batch_cross_validation",
+    "batch_model_selection",
     "exceptions",
     "fit_gpytorch_model",
     "gen_candidates_scipy",
     "gen_candidates_torch",
     "get_best_candidates",
+    "loo_cross_validation",
     "manual_seed",
     "models",
     "optim",
@@ -4,16 +4,36 @@ r"""
 Cross-validation utilities using batch evaluation mode.
 """
 
-from typing import Any, Dict, NamedTuple, Optional, Type
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+)
 
 import torch
+from gpytorch.distributions.multitask_multivariate_normal import (
+    MultitaskMultivariateNormal,
+)
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.lazy.diag_lazy_tensor import DiagLazyTensor
+from gpytorch.likelihoods.gaussian_likelihood import FixedNoiseGaussianLikelihood
 from gpytorch.mlls.marginal_log_likelihood import MarginalLogLikelihood
+from gpytorch.models.exact_gp import ExactGP
 from torch import Tensor
 
+from .exceptions.errors import UnsupportedError
 from .fit import fit_gpytorch_model
-from .models.gpytorch import GPyTorchModel
+from .models.gpytorch import BatchedMultiOutputGPyTorchModel, GPyTorchModel
 from .optim.utils import _filter_kwargs
 from .posteriors.gpytorch import GPyTorchPosterior
+from .utils.sampling import manual_seed
 
 
 class CVFolds(NamedTuple):
@@ -65,30 +85,26 @@ def gen_loo_cv_folds(
         >>> train_Y = torch.sin(6 * train_X) + 0.2 * torch.rand_like(train_X)
         >>> cv_folds = gen_loo_cv_folds(train_X, train_Y)
     """
-    masks = torch.eye(train_X.shape[-2], dtype=torch.uint8, device=train_X.device)
+    n = train_X.shape[-2]
     if train_Y.dim() < train_X.dim():
         # add output dimension
         train_Y = train_Y.unsqueeze(-1)
         if train_Yvar is not None:
             train_Yvar = train_Yvar.unsqueeze(-1)
-    train_X_cv = torch.cat(
-        [train_X[..., ~m, :].unsqueeze(dim=-3) for m in masks], dim=-3
-    )
-    test_X_cv = torch.cat([train_X[..., m, :].unsqueeze(dim=-3) for m in masks], dim=-3)
-    train_Y_cv = torch.cat(
-        [train_Y[..., ~m, :].unsqueeze(dim=-3) for m in masks], dim=-3
-    )
-    test_Y_cv = torch.cat([train_Y[..., m, :].unsqueeze(dim=-3) for m in masks], dim=-3)
+    # `n x (n-1)` indices of the training points and `n x 1` indices of the test
+    # point of each fold
+    idcs = torch.arange(n, device=train_X.device)
+    masks = torch.eye(n, dtype=torch.bool, device=train_X.device)
+    train_idcs = idcs.expand(n, n)[~masks].view(n, n - 1)
+    test_idcs = idcs.unsqueeze(-1)
+    train_X_cv, test_X_cv = train_X[..., train_idcs, :], train_X[..., test_idcs, :]
+    train_Y_cv, test_Y_cv = train_Y[..., train_idcs, :], train_Y[..., test_idcs, :]
     if train_Yvar is None:
         train_Yvar_cv = None
         test_Yvar_cv = None
     else:
-        train_Yvar_cv = torch.cat(
-            [train_Yvar[..., ~m, :].unsqueeze(dim=-3) for m in masks], dim=-3
-        )
-        test_Yvar_cv = torch.cat(
-            [train_Yvar[..., m, :].unsqueeze(dim=-3) for m in masks], dim=-3
-        )
+        train_Yvar_cv = train_Yvar[..., train_idcs, :]
+        test_Yvar_cv = train_Yvar[..., test_idcs, :]
     return CVFolds(
         train_X=train_X_cv,
         test_X=test_X_cv,
@@ -99,6 +115,97 @@ def gen_loo_cv_folds(
     )
 
 
+def gen_kfold_cv_folds(
+    train_X: Tensor,
+    train_Y: Tensor,
+    train_Yvar: Optional[Tensor] = None,
+    num_folds: int = 5,
+    num_repeats: int = 1,
+    stratify: bool = False,
+    seed: Optional[int] = None,
+) -> Iterator[CVFolds]:
+    r"""Lazily generate (repeated, stratified) K-fold CV folds w.r.t. to `n`.
+
+    The training points are randomly partitioned into `num_folds` folds of
+    (almost) equal size, and each fold is used as test set once. In contrast to
+    `gen_loo_cv_folds`, the folds are not stacked into a single tensor but are
+    generated one at a time, so only the data of a single fold needs to be held
+    in memory. The folds can be passed to `streaming_cross_validation`.
+
+    Args:
+        train_X: A `n x d` or `batch_shape x n x d` (batch mode) tensor of training
+            features.
+        train_Y: A `n x (o)` or `batch_shape x n x (o)` (batch mode) tensor of
+            training observations.
+        train_Yvar: A `batch_shape x n x (o)` or `batch_shape x n x (o)`
+            (batch mode) tensor of observed measurement noise.
+        num_folds: The number of folds `k`.
+        num_repeats: The number of times the K-fold partitioning is repeated (with
+            independent random partitions).
+        stratify: If True, stratify the folds w.r.t. the (first) output, i.e.,
+            assign points with similar observations to different folds, so that
+            the distribution of observations is similar across folds. Requires
+            non-batched `n x d` training data.
+        seed: The random seed used for partitioning the training points.
+
+    Returns:
+        An iterator over `num_repeats * num_folds` CVFolds tuples, each with the
+        following fields
+
+        - train_X: A `n_train x d` or `batch_shape x n_train x d` tensor of
+          training features.
+        - test_X: A `n_test x d` or `batch_shape x n_test x d` tensor of test
+          features.
+        - train_Y: A `n_train x o` or `batch_shape x n_train x o` tensor of
+          training observations.
+        - test_Y: A `n_test x o` or `batch_shape x n_test x o` tensor of test
+          observations.
+        - train_Yvar: A `n_train x o` or `batch_shape x n_train x o` tensor of
+          observed measurement noise.
+        - test_Yvar: A `n_test x o` or `batch_shape x n_test x o` tensor of
+          observed measurement noise.
+
+    Example:
+        >>> train_X = torch.rand(100, 1)
+        >>> train_Y = torch.sin(6 * train_X) + 0.2 * torch.rand_like(train_X)
+        >>> for cv_fold in gen_kfold_cv_folds(train_X, train_Y, num_folds=10):
+        >>>     ...
+    """
+    n = train_X.shape[-2]
+    if not 2 <= num_folds <= n:
+        raise ValueError(f"num_folds must be between 2 and n={n}, got {num_folds}.")
+    if train_Y.dim() < train_X.dim():
+        # add output dimension
+        train_Y = train_Y.unsqueeze(-1)
+        if train_Yvar is not None:
+            train_Yvar = train_Yvar.unsqueeze(-1)
+    if stratify and train_X.dim() > 2:
+        raise UnsupportedError("Stratified K-fold CV requires `n x d` training data.")
+    with manual_seed(seed=seed):
+        fold_idcs = [
+            _get_fold_assignment(
+                train_Y=train_Y, num_folds=num_folds, stratify=stratify
+            ).to(device=train_X.device)
+            for _ in range(num_repeats)
+        ]
+    # the folds are generated lazily to avoid materializing the data of all folds
+    for fold_idx in fold_idcs:
+        for i in range(num_folds):
+            test_mask = fold_idx == i
+            train_Yvar_cv, test_Yvar_cv = None, None
+            if train_Yvar is not None:
+                train_Yvar_cv = train_Yvar[..., ~test_mask, :]
+                test_Yvar_cv = train_Yvar[..., test_mask, :]
+            yield CVFolds(
+                train_X=train_X[..., ~test_mask, :],
+                test_X=train_X[..., test_mask, :],
+                train_Y=train_Y[..., ~test_mask, :],
+                test_Y=train_Y[..., test_mask, :],
+                train_Yvar=train_Yvar_cv,
+                test_Yvar=test_Yvar_cv,
+            )
+
+
 def batch_cross_validation(
     model_cls: Type[GPyTorchModel],
     mll_cls: Type[MarginalLogLikelihood],
@@ -136,28 +243,329 @@ def batch_cross_validation(
         >>> )
 
     WARNING: This function is currently very memory inefficient, use it only
-        for problems of small size.
+        for problems of small size. For larger problems, use
+        `streaming_cross_validation` with `gen_kfold_cv_folds`.
     """
     fit_args = fit_args or {}
+    model_cv = _get_cv_model(model_cls=model_cls, cv_folds=cv_folds)
+    mll_cv = mll_cls(model_cv.likelihood, model_cv)
+    mll_cv.to(cv_folds.train_X)
+    mll_cv = fit_gpytorch_model(mll_cv, **fit_args)
+    return _evaluate_cv_model(
+        model_cv=model_cv, cv_folds=cv_folds, observation_noise=observation_noise
+    )
+
+
+def streaming_cross_validation(
+    model_cls: Type[GPyTorchModel],
+    mll_cls: Type[MarginalLogLikelihood],
+    cv_folds: Iterable[CVFolds],
+    fold_batch_size: int = 1,
+    fit_args: Optional[Dict[str, Any]] = None,
+    observation_noise: bool = False,
+    max_workers: Optional[int] = None,
+) -> Iterator[CVResults]:
+    r"""Perform cross validation on groups of folds with bounded memory.
+
+    Consumes the CV folds (e.g. generated by `gen_kfold_cv_folds`) lazily and
+    fits them in groups of at most `fold_batch_size` folds, stacking the folds
+    of each group in a batch dimension (as in `batch_cross_validation`). Only
+    folds with the same numbers of training and test points are grouped
+    together. The memory requirements are thus bounded by the size of a single
+    group rather than by the total number of folds.
+
+    If `max_workers` is specified, the groups are fit in parallel in worker
+    processes, with at most `max_workers` groups in flight at any time. Only
+    the fitted parameters are sent back from the workers; the hold-out
+    posteriors are computed in the main process.
+
+    Args:
+        model_cls: A GPyTorchModel class. This class must initialize the likelihood
+            internally. Note: Multi-task GPs are not currently supported.
+        mll_cls: A MarginalLogLikelihood class.
+        cv_folds: An iterable of CVFolds tuples, each representing a single fold
+            with non-stacked `(batch_shape) x n_train x d` training data.
+        fold_batch_size: The maximum number of folds fit jointly in batch mode.
+        fit_args: Arguments passed along to fit_gpytorch_model
+        observation_noise: If True, include observation noise in the posteriors.
+        max_workers: If specified, the maximum number of worker processes used to
+            fit the groups of folds in parallel.
+
+    Returns:
+        An iterator over CVResults tuples (one for each group of folds, in the
+        order of the folds), each with the following fields
+
+        - model: GPyTorchModel for batched cross validation of the group.
+        - posterior: GPyTorchPosterior where the mean has shape
+          `k' x n_test x o` or `batch_shape x k' x n_test x o`, where `k'` is
+          the number of folds in the group.
+        - observed_Y: A `k' x n_test x o` or `batch_shape x k' x n_test x o`
+          tensor of observations.
+        - observed_Yvar: A `k' x n_test x o` or `batch_shape x k' x n_test x o`
+          tensor of observed measurement noise.
+
+    Example:
+        >>> cv_folds = gen_kfold_cv_folds(train_X, train_Y, num_folds=10)
+        >>> for cv_results in streaming_cross_validation(
+        >>>     SingleTaskGP, ExactMarginalLogLikelihood, cv_folds, fold_batch_size=2
+        >>> ):
+        >>>     ...
+    """
+    fit_args = fit_args or {}
+    groups = _group_cv_folds(cv_folds=cv_folds, fold_batch_size=fold_batch_size)
+    if max_workers is None:
+        for cv_folds_group in groups:
+            yield batch_cross_validation(
+                model_cls=model_cls,
+                mll_cls=mll_cls,
+                cv_folds=cv_folds_group,
+                fit_args=fit_args,
+                observation_noise=observation_noise,
+            )
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        for cv_folds_group in groups:
+            future = executor.submit(
+                _fit_cv_model_state_dict, model_cls, mll_cls, cv_folds_group, fit_args
+            )
+            pending.append((cv_folds_group, future))
+            # bound the number of groups in flight
+            if len(pending) >= max_workers:
+                yield _get_worker_cv_results(
+                    model_cls, *pending.pop(0), observation_noise=observation_noise
+                )
+        for cv_folds_group, future in pending:
+            yield _get_worker_cv_results(
+                model_cls, cv_folds_group, future, observation_noise=observation_noise
+            )
+
+
+def loo_cross_validation(
+    model: BatchedMultiOutputGPyTorchModel, observation_noise: bool = False
+) -> CVResults:
+    r"""Closed-form leave-one-out cross validation of an exact GP.
+
+    For an exact GP with fixed hyperparameters, the leave-one-out (LOO)
+    predictive distributions follow in closed form from a single Cholesky
+    factorization of the kernel matrix `K` (including observation noise) of the
+    training data: The LOO predictive variance of the `i`-th training point is
+    `1 / [K^-1]_ii` and the LOO predictive mean is `y_i - [K^-1 (y - m)]_i /
+    [K^-1]_ii`. In contrast to `batch_cross_validation` with
+    `gen_loo_cv_folds`, this neither materializes `n` copies of the training
+    data nor refits the model for each fold (the hyperparameters of the given
+    model are used for all folds), resulting in `O(n^3)` total cost.
+
+    Args:
+        model: A (fitted) exact GP model, e.g. a `SingleTaskGP` or
+            `FixedNoiseGP`. Multi-task GPs are not supported.
+        observation_noise: If True, include the observation noise of the
+            left-out training point in the predictive variance.
+
+    Returns:
+        A CVResults tuple with the following fields
+
+        - model: The model passed in.
+        - posterior: GPyTorchPosterior of the LOO predictions, where the mean
+          has shape `n x 1 x o` or `batch_shape x n x 1 x o`.
+        - observed_Y: A `n x 1 x o` or `batch_shape x n x 1 x o` tensor of
+          observations.
+        - observed_Yvar: A `n x 1 x o` or `batch_shape x n x 1 x o` tensor of
+          observed measurement noise (if the model uses fixed noise levels,
+          otherwise None).
+
+    Example:
+        >>> model = SingleTaskGP(train_X, train_Y)
+        >>> mll = ExactMarginalLogLikelihood(model.likelihood, model)
+        >>> fit_gpytorch_model(mll)
+        >>> cv_results = loo_cross_validation(model)
+    """
+    if not isinstance(model, ExactGP) or not isinstance(
+        model, BatchedMultiOutputGPyTorchModel
+    ):
+        raise UnsupportedError(
+            "Closed-form LOO cross validation requires an exact GP of type "
+            "BatchedMultiOutputGPyTorchModel."
+        )
+    train_inputs, train_targets = model.train_inputs, model.train_targets
+    with torch.no_grad():
+        prior = model.forward(*train_inputs)
+        prior_noisy = model.likelihood(prior, *train_inputs)
+        loo_mean, loo_variance = _loo_mean_and_variance(
+            mean=prior.mean,
+            covariance_matrix=prior_noisy.covariance_matrix,
+            targets=train_targets,
+        )
+        noise = prior_noisy.variance - prior.variance
+    if not observation_noise:
+        loo_variance = loo_variance - noise
+    observed_Y = train_targets
+    observed_Yvar = (
+        noise if isinstance(model.likelihood, FixedNoiseGaussianLikelihood) else None
+    )
+    # bring the results into `batch_shape x n x o` shape (the model represents
+    # multiple outputs as the leading batch dimension)
+    tensors = [loo_mean, loo_variance, observed_Y, observed_Yvar]
+    if model._num_outputs > 1:
+        tensors = [
+            None if t is None else t.permute(*range(1, t.dim()), 0) for t in tensors
+        ]
+    else:
+        tensors = [None if t is None else t.unsqueeze(-1) for t in tensors]
+    loo_mean, loo_variance, observed_Y, observed_Yvar = tensors
+    if model._num_outputs > 1:
+        mvn = MultitaskMultivariateNormal(
+            mean=loo_mean.unsqueeze(-2), covariance_matrix=DiagLazyTensor(loo_variance)
+        )
+    else:
+        mvn = MultivariateNormal(
+            mean=loo_mean, covariance_matrix=DiagLazyTensor(loo_variance)
+        )
+    return CVResults(
+        model=model,
+        posterior=GPyTorchPosterior(mvn=mvn),
+        observed_Y=observed_Y.unsqueeze(-2),
+        observed_Yvar=None if observed_Yvar is None else observed_Yvar.unsqueeze(-2),
+    )
+
+
+def _loo_mean_and_variance(
+    mean: Tensor, covariance_matrix: Tensor, targets: Tensor
+) -> Tuple[Tensor, Tensor]:
+    r"""Closed-form leave-one-out predictive means and variances of an exact GP.
+
+    Args:
+        mean: A `batch_shape x n` tensor with the prior mean at the training points.
+        covariance_matrix: A `batch_shape x n x n` tensor with the prior covariance
+            (including observation noise) at the training points.
+        targets: A `batch_shape x n` tensor of training observations.
+
+    Returns:
+        2-element tuple containing
+
+        - A `batch_shape x n` tensor of LOO predictive means.
+        - A `batch_shape x n` tensor of LOO predictive variances (including
+          observation noise).
+    """
+    L = torch.cholesky(covariance_matrix)
+    eye = torch.eye(L.size(-1), dtype=L.dtype, device=L.device)
+    K_inv_diag = torch.cholesky_solve(eye.expand_as(L), L).diagonal(dim1=-2, dim2=-1)
+    alpha = torch.cholesky_solve((targets - mean).unsqueeze(-1), L).squeeze(-1)
+    loo_variance = K_inv_diag.reciprocal()
+    loo_mean = targets - alpha * loo_variance
+    return loo_mean, loo_variance
+
+
+def _get_fold_assignment(train_Y: Tensor, num_folds: int, stratify: bool) -> Tensor:
+    r"""Randomly assign the training points to folds.
+
+    Args:
+        train_Y: A `(batch_shape) x n x o` tensor of training observations.
+        num_folds: The number of folds `k`.
+        stratify: If True, stratify the folds w.r.t. the first output.
+
+    Returns:
+        A `n`-dim tensor with the index of the fold of each training point.
+    """
+    n = train_Y.shape[-2]
+    fold_ids = torch.arange(n) % num_folds
+    if not stratify:
+        fold_idx = torch.empty_like(fold_ids)
+        fold_idx[torch.randperm(n)] = fold_ids
+        return fold_idx
+    # assign each block of `k` consecutive points in the order of the
+    # observations to all different folds (in random order)
+    order = train_Y[..., 0].detach().cpu().argsort()
+    blocks = torch.arange(n) // num_folds
+    shuffled = (blocks.double() + torch.rand(n, dtype=torch.double)).argsort()
+    fold_idx = torch.empty_like(fold_ids)
+    fold_idx[order[shuffled]] = fold_ids
+    return fold_idx
+
+
+def _group_cv_folds(
+    cv_folds: Iterable[CVFolds], fold_batch_size: int
+) -> Iterator[CVFolds]:
+    r"""Lazily stack consecutive folds of the same size into groups.
+
+    Args:
+        cv_folds: An iterable of (non-stacked) CVFolds tuples.
+        fold_batch_size: The maximum number of folds in a group.
+
+    Returns:
+        An iterator over CVFolds tuples with the folds of each group stacked
+        in dimension -3.
+    """
+    group: List[CVFolds] = []
+    for cv_fold in cv_folds:
+        if group and (
+            len(group) == fold_batch_size
+            or cv_fold.train_X.shape != group[0].train_X.shape
+            or cv_fold.test_X.shape != group[0].test_X.shape
+        ):
+            yield _stack_cv_folds(group)
+            group = []
+        group.append(cv_fold)
+    if group:
+        yield _stack_cv_folds(group)
+
+
+def _stack_cv_folds(cv_folds: List[CVFolds]) -> CVFolds:
+    r"""Stack a list of CVFolds of the same size in dimension -3."""
+    return CVFolds(
+        *(None if ts[0] is None else torch.stack(ts, dim=-3) for ts in zip(*cv_folds))
+    )
+
+
+def _get_cv_model(model_cls: Type[GPyTorchModel], cv_folds: CVFolds) -> GPyTorchModel:
+    r"""Construct a batched (unfitted) CV model on the training data of the folds."""
     kwargs = {
         "train_X": cv_folds.train_X,
         "train_Y": cv_folds.train_Y,
         "train_Yvar": cv_folds.train_Yvar,
     }
-    model_cv = model_cls(**_filter_kwargs(model_cls, **kwargs))
-    mll_cv = mll_cls(model_cv.likelihood, model_cv)
-    mll_cv.to(cv_folds.train_X)
-    mll_cv = fit_gpytorch_model(mll_cv, **fit_args)
+    return model_cls(**_filter_kwargs(model_cls, **kwargs))
+
 
-    # Evaluate on the hold-out set in batch mode
+def _evaluate_cv_model(
+    model_cv: GPyTorchModel, cv_folds: CVFolds, observation_noise: bool
+) -> CVResults:
+    r"""Evaluate a fitted batched CV model on the hold-out sets of the folds."""
     with torch.no_grad():
         posterior = model_cv.posterior(
             cv_folds.test_X, observation_noise=observation_noise
         )
-
     return CVResults(
         model=model_cv,
         posterior=posterior,
         observed_Y=cv_folds.test_Y,
         observed_Yvar=cv_folds.test_Yvar,
     )
+
+
+def _fit_cv_model_state_dict(
+    model_cls: Type[GPyTorchModel],
+    mll_cls: Type[MarginalLogLikelihood],
+    cv_folds: CVFolds,
+    fit_args: Dict[str, Any],
+) -> Dict[str, Tensor]:
+    r"""Fit a batched CV model and return its state dict (used in workers)."""
+    model_cv = _get_cv_model(model_cls=model_cls, cv_folds=cv_folds)
+    mll_cv = mll_cls(model_cv.likelihood, model_cv)
+    mll_cv.to(cv_folds.train_X)
+    fit_gpytorch_model(mll_cv, **fit_args)
+    return model_cv.state_dict()
+
+
+def _get_worker_cv_results(
+    model_cls: Type[GPyTorchModel],
+    cv_folds: CVFolds,
+    future: Future,
+    observation_noise: bool,
+) -> CVResults:
+    r"""Construct the CVResults of a group of folds fit in a worker process."""
+    model_cv = _get_cv_model(model_cls=model_cls, cv_folds=cv_folds)
+    model_cv.load_state_dict(future.result())
+    return _evaluate_cv_model(
+        model_cv=model_cv, cv_folds=cv_folds, observation_noise=observation_noise
+    )
@@ -8,6 +8,7 @@ from typing import Any, Callable
 
 from gpytorch.mlls.marginal_log_likelihood import MarginalLogLikelihood
 
+from .models.inference import InferenceSettings, inference_settings
 from .optim.fit import fit_gpytorch_scipy
 
 
@@ -16,7 +17,8 @@ def fit_gpytorch_model(
 ) -> MarginalLogLikelihood:
     r"""Fit hyperparameters of a gpytorch model.
 
-    Optimizer functions are in botorch.optim.fit.
+    Optimizer functions are in botorch.optim.fit. The model is fit using its
+    `inference_settings` (see `InferenceSettings`), if it has any.
 
     Args:
         mll: MarginalLogLikelihood to be maximized.
@@ -32,6 +34,8 @@ def fit_gpytorch_model(
         >>> fit_gpytorch_model(mll)
     """
     mll.train()
-    mll, _ = optimizer(mll, track_iterations=False, **kwargs)
+    config = getattr(mll.model, "inference_settings", InferenceSettings())
+    with inference_settings(config):
+        mll, _ = optimizer(mll, track_iterations=False, **kwargs)
     mll.eval()
     return mll
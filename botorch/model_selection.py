@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+r"""
+Model selection utilities using batch evaluation mode.
+"""
+
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import torch
+from gpytorch.constraints.constraints import GreaterThan
+from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.likelihoods.gaussian_likelihood import GaussianLikelihood
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+from gpytorch.priors.torch_priors import GammaPrior
+from torch import Tensor
+
+from .cross_validation import _loo_mean_and_variance
+from .exceptions.errors import UnsupportedError
+from .fit import fit_gpytorch_model
+from .models.gp_regression import MIN_INFERRED_NOISE_LEVEL, SingleTaskGP
+from .models.kernels.mixed_matern import MixedMaternKernel
+from .optim.fit import fit_gpytorch_torch_batched
+
+
+class ModelCandidate(NamedTuple):
+    r"""Configuration of a candidate `SingleTaskGP` model.
+
+    The smoothness `nu` must be one of 0.5, 1.5, 2.5 (Matern kernels) or
+    `math.inf` (RBF kernel). Priors are Gamma priors specified as
+    `(concentration, rate)` tuples.
+    """
+
+    nu: float = 2.5
+    lengthscale_prior: Tuple[float, float] = (3.0, 6.0)
+    outputscale_prior: Tuple[float, float] = (2.0, 0.15)
+    noise_prior: Tuple[float, float] = (1.1, 0.05)
+
+
+class ModelSelectionResults(NamedTuple):
+    model: SingleTaskGP
+    scores: Tensor
+    best_index: Tensor
+    best_model: SingleTaskGP
+
+
+def batch_model_selection(
+    train_X: Tensor,
+    train_Y: Tensor,
+    candidates: List[ModelCandidate],
+    criterion: str = "mll",
+    fit_args: Optional[Dict[str, Any]] = None,
+) -> ModelSelectionResults:
+    r"""Select between `SingleTaskGP` configurations by fitting them jointly.
+
+    All candidate configurations are stacked in the batch dimension of a single
+    `SingleTaskGP` (using a `MixedMaternKernel` to represent different kernel
+    families), which is fit with per-batch convergence using
+    `fit_gpytorch_torch_batched`. Selection thus requires a single batched fit
+    rather than one fit per candidate. For multi-output data, the best candidate
+    is selected separately for each output.
+
+    Args:
+        train_X: A `n x d` tensor of training features.
+        train_Y: A `n x (o)` tensor of training observations.
+        candidates: A list of `c` ModelCandidate configurations.
+        criterion: The selection criterion. Either "mll" (the exact marginal log
+            likelihood of the fitted model) or "loo" (the closed-form
+            leave-one-out log predictive density of the fitted model).
+        fit_args: Arguments passed along to `fit_gpytorch_model`.
+
+    Returns:
+        A ModelSelectionResults tuple with the following fields
+
+        - model: The batched `SingleTaskGP` containing all fitted candidates.
+        - scores: A `c x o` tensor of scores (higher is better).
+        - best_index: A `o`-dim tensor with the index of the best candidate for
+          each output.
+        - best_model: A `SingleTaskGP` on the original training data with the
+          configuration and fitted hyperparameters of the best candidate(s).
+
+    Example:
+        >>> candidates = [ModelCandidate(nu=nu) for nu in (0.5, 1.5, 2.5, math.inf)]
+        >>> results = batch_model_selection(train_X, train_Y, candidates)
+        >>> model = results.best_model
+    """
+    if train_X.dim() != 2:
+        raise UnsupportedError("Model selection requires `n x d`-dim training data.")
+    if criterion not in ("mll", "loo"):
+        raise ValueError(f"Unknown model selection criterion {criterion}.")
+    fit_args = fit_args or {}
+    num_candidates = len(candidates)
+    train_X_c = train_X.expand(num_candidates, *train_X.shape)
+    train_Y_c = train_Y.expand(num_candidates, *train_Y.shape)
+    model = _get_candidate_model(
+        train_X=train_X_c, train_Y=train_Y_c, candidates=candidates
+    )
+    mll = ExactMarginalLogLikelihood(model.likelihood, model)
+    mll.to(train_X)
+    fit_gpytorch_model(mll, optimizer=fit_gpytorch_torch_batched, **fit_args)
+
+    model.train()
+    with torch.no_grad():
+        train_inputs, train_targets = model.train_inputs, model.train_targets
+        output = model.likelihood(model(*train_inputs), *train_inputs)
+        if criterion == "mll":
+            scores = output.log_prob(train_targets)
+        else:
+            scores = _loo_log_predictive_density(
+                mean=output.mean,
+                covariance_matrix=output.covariance_matrix,
+                targets=train_targets,
+            )
+    model.eval()
+    # make scores `c x o`
+    scores = scores.t() if model._num_outputs > 1 else scores.unsqueeze(-1)
+    best_index = scores.argmax(dim=0)
+
+    best_model = _get_candidate_model(
+        train_X=train_X,
+        train_Y=train_Y,
+        candidates=[candidates[i] for i in best_index.tolist()],
+    )
+    params = dict(model.named_parameters())
+    output_idcs = torch.arange(model._num_outputs, device=best_index.device)
+    with torch.no_grad():
+        for name, param in best_model.named_parameters():
+            if model._num_outputs > 1:
+                param.copy_(params[name][output_idcs, best_index])
+            else:
+                param.copy_(params[name][best_index[0]])
+    best_model.eval()
+    return ModelSelectionResults(
+        model=model, scores=scores, best_index=best_index, best_model=best_model
+    )
+
+
+def _get_candidate_model(
+    train_X: Tensor, train_Y: Tensor, candidates: List[ModelCandidate]
+) -> SingleTaskGP:
+    r"""Construct a `SingleTaskGP` with candidate-specific kernels and priors.
+
+    Args:
+        train_X: A `n x d` or `c x n x d` tensor of training features.
+        train_Y: A `n x (o)` or `c x n x (o)` tensor of training observations.
+        candidates: The list of candidates. If the training data is batched,
+            this must contain one candidate per batch, otherwise it must contain
+            one candidate per output.
+
+    Returns:
+        The (unfitted) `SingleTaskGP`.
+    """
+    num_outputs = train_Y.shape[-1] if train_Y.dim() == train_X.dim() else 1
+    aug_batch_shape = train_X.shape[:-2]
+    if num_outputs > 1:
+        aug_batch_shape = torch.Size([num_outputs]) + aug_batch_shape
+
+    def stack(values: List[float], num_trailing_dims: int) -> Tensor:
+        res = torch.tensor(values, dtype=train_X.dtype, device=train_X.device)
+        if len(aug_batch_shape) == 0:
+            return res.squeeze(0)
+        return res.view(res.shape + torch.Size([1] * num_trailing_dims))
+
+    def gamma_prior(attr: str, num_trailing_dims: int) -> GammaPrior:
+        concentration, rate = zip(*(getattr(c, attr) for c in candidates))
+        return GammaPrior(
+            stack(concentration, num_trailing_dims), stack(rate, num_trailing_dims)
+        )
+
+    noise_prior = gamma_prior("noise_prior", num_trailing_dims=1)
+    noise_prior_mode = (noise_prior.concentration - 1) / noise_prior.rate
+    likelihood = GaussianLikelihood(
+        noise_prior=noise_prior,
+        batch_shape=aug_batch_shape,
+        noise_constraint=GreaterThan(
+            MIN_INFERRED_NOISE_LEVEL, transform=None, initial_value=noise_prior_mode
+        ),
+    )
+    model = SingleTaskGP(train_X=train_X, train_Y=train_Y, likelihood=likelihood)
+    model.covar_module = ScaleKernel(
+        MixedMaternKernel(
+            nu=stack([c.nu for c in candidates], num_trailing_dims=0),
+            ard_num_dims=train_X.shape[-1],
+            batch_shape=aug_batch_shape,
+            lengthscale_prior=gamma_prior("lengthscale_prior", num_trailing_dims=2),
+        ),
+        batch_shape=aug_batch_shape,
+        outputscale_prior=gamma_prior("outputscale_prior", num_trailing_dims=0),
+    )
+    return model.to(train_X)
+
+
+def _loo_log_predictive_density(
+    mean: Tensor, covariance_matrix: Tensor, targets: Tensor
+) -> Tensor:
+    r"""Closed-form leave-one-out log predictive density of an exact GP.
+
+    Args:
+        mean: A `batch_shape x n` tensor with the prior mean at the training points.
+        covariance_matrix: A `batch_shape x n x n` tensor with the prior covariance
+            (including observation noise) at the training points.
+        targets: A `batch_shape x n` tensor of training observations.
+
+    Returns:
+        A `batch_shape`-dim tensor with the sum of the leave-one-out log predictive
+        densities over the `n` training points.
+    """
+    loo_mean, loo_variance = _loo_mean_and_variance(
+        mean=mean, covariance_matrix=covariance_matrix, targets=targets
+    )
+    log_density = -0.5 * (
+        math.log(2 * math.pi)
+        + loo_variance.log()
+        + (targets - loo_mean) ** 2 / loo_variance
+    )
+    return log_density.sum(dim=-1)
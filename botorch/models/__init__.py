@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 
+from .additive import AdditiveSingleTaskGP
+from .approximate_gp import SingleTaskVariationalGP
+from .ensemble import RankWeightedGPEnsemble
+from .fully_bayesian import FullyBayesianSingleTaskGP
 from .gp_regression import FixedNoiseGP, HeteroskedasticSingleTaskGP, SingleTaskGP
+from .inference import InferenceSettings
+from .kiss_gp import SingleTaskKISSGP
 from .model_list_gp_regression import ModelListGP
-from .multitask import FixedNoiseMultiTaskGP, MultiTaskGP
+from .multitask import FixedNoiseMultiTaskGP, KroneckerMultiTaskGP, MultiTaskGP
+from .out_of_core import OutOfCoreMarginalLogLikelihood, OutOfCoreSingleTaskGP
+from .sliding_window import SlidingWindowGP
 
 
 __all__ = [
+    "AdditiveSingleTaskGP",
     "FixedNoiseGP",
     "FixedNoiseMultiTaskGP",
+    "FullyBayesianSingleTaskGP",
     "HeteroskedasticSingleTaskGP",
+    "InferenceSettings",
+    "KroneckerMultiTaskGP",
     "ModelListGP",
     "MultiTaskGP",
+    "OutOfCoreMarginalLogLikelihood",
+    "OutOfCoreSingleTaskGP",
+    "RankWeightedGPEnsemble",
     "SingleTaskGP",
+    "SingleTaskKISSGP",
+    "SingleTaskVariationalGP",
+    "SlidingWindowGP",
 ]
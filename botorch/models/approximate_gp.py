@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+
+r"""
+Approximate (sparse variational) GP models for large datasets.
+"""
+
+from typing import Optional
+
+import torch
+from gpytorch.constraints.constraints import GreaterThan
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.kernels.matern_kernel import MaternKernel
+from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.likelihoods.gaussian_likelihood import GaussianLikelihood
+from gpytorch.likelihoods.likelihood import Likelihood
+from gpytorch.means.constant_mean import ConstantMean
+from gpytorch.models.abstract_variational_gp import AbstractVariationalGP
+from gpytorch.priors.torch_priors import GammaPrior
+from gpytorch.utils.broadcasting import _mul_broadcast_shape
+from gpytorch.variational.cholesky_variational_distribution import (
+    CholeskyVariationalDistribution,
+)
+from gpytorch.variational.variational_strategy import VariationalStrategy
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from .gp_regression import MIN_INFERRED_NOISE_LEVEL
+from .gpytorch import BatchedMultiOutputGPyTorchModel
+from .utils import multioutput_to_batch_mode_transform
+
+
+class SingleTaskVariationalGP(AbstractVariationalGP, BatchedMultiOutputGPyTorchModel):
+    r"""A single-task sparse variational GP (SVGP) model.
+
+    An approximate GP using `m` learned inducing points and a full-rank Gaussian
+    variational distribution over the inducing values (Hensman et al., 2015).
+    Training (via gpytorch's `VariationalELBO`) costs `O(n m^2)` per pass over
+    the data, and can be done on minibatches of the training data (see the
+    `data_loader` argument of `fit_gpytorch_torch`), so that this model scales
+    to datasets with hundreds of thousands of observations. Posterior
+    evaluations cost `O(m^2)` per test point, independently of `n`.
+
+    The priors and the kernel are the same as those of `SingleTaskGP`. When the
+    training observations include multiple outputs, this model uses batching to
+    model outputs independently (each output having its own inducing points).
+    The posterior works with all (MC) acquisition functions; model
+    modifications that are specific to exact GPs (`freeze`,
+    `condition_on_observations`) are not supported.
+    """
+
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        num_inducing: int = 128,
+        inducing_points: Optional[Tensor] = None,
+        likelihood: Optional[Likelihood] = None,
+    ) -> None:
+        r"""A single-task sparse variational GP (SVGP) model.
+
+        Args:
+            train_X: A `n x d` tensor of training features.
+            train_Y: A `n x (o)` tensor of training observations.
+            num_inducing: The number of inducing points `m`. If `inducing_points`
+                is omitted, the inducing points are initialized at a random
+                subset of the training features.
+            inducing_points: A `m x d` tensor of initial inducing point locations
+                (shared across outputs).
+            likelihood: A likelihood. If omitted, use a standard
+                GaussianLikelihood with inferred noise level.
+
+        Example:
+            >>> model = SingleTaskVariationalGP(train_X, train_Y, num_inducing=256)
+            >>> mll = VariationalELBO(model.likelihood, model, num_data=n)
+            >>> loader = DataLoader(TensorDataset(train_X, train_Y), batch_size=1024)
+            >>> fit_gpytorch_model(
+            >>>     mll,
+            >>>     optimizer=fit_gpytorch_torch,
+            >>>     data_loader=loader,
+            >>>     options={"maxiter": 2000, "lr": 0.01},
+            >>> )
+        """
+        if train_X.dim() != 2:
+            raise UnsupportedError(
+                "SingleTaskVariationalGP requires `n x d`-dim training data."
+            )
+        self._set_dimensions(train_X=train_X, train_Y=train_Y)
+        if inducing_points is None:
+            num_inducing = min(num_inducing, train_X.shape[-2])
+            idcs = torch.randperm(train_X.shape[-2], device=train_X.device)
+            inducing_points = train_X[idcs[:num_inducing]]
+        inducing_points = inducing_points.expand(
+            self._aug_batch_shape + inducing_points.shape[-2:]
+        ).clone()
+        train_X, train_Y, _ = multioutput_to_batch_mode_transform(
+            train_X=train_X, train_Y=train_Y, num_outputs=self._num_outputs
+        )
+        variational_distribution = CholeskyVariationalDistribution(
+            num_inducing_points=inducing_points.shape[-2],
+            batch_shape=self._aug_batch_shape,
+        )
+        variational_strategy = VariationalStrategy(
+            self,
+            inducing_points=inducing_points,
+            variational_distribution=variational_distribution,
+            learn_inducing_locations=True,
+        )
+        super().__init__(variational_strategy)
+        # the training data is only used for full-batch training
+        self.train_inputs = (train_X,)
+        self.train_targets = train_Y
+        if likelihood is None:
+            noise_prior = GammaPrior(1.1, 0.05)
+            noise_prior_mode = (noise_prior.concentration - 1) / noise_prior.rate
+            likelihood = GaussianLikelihood(
+                noise_prior=noise_prior,
+                batch_shape=self._aug_batch_shape,
+                noise_constraint=GreaterThan(
+                    MIN_INFERRED_NOISE_LEVEL,
+                    transform=None,
+                    initial_value=noise_prior_mode,
+                ),
+            )
+        self.likelihood = likelihood
+        self.mean_module = ConstantMean(batch_shape=self._aug_batch_shape)
+        self.covar_module = ScaleKernel(
+            MaternKernel(
+                nu=2.5,
+                ard_num_dims=train_X.shape[-1],
+                batch_shape=self._aug_batch_shape,
+                lengthscale_prior=GammaPrior(3.0, 6.0),
+            ),
+            batch_shape=self._aug_batch_shape,
+            outputscale_prior=GammaPrior(2.0, 0.15),
+        )
+        self.to(train_X)
+
+    def __call__(self, x: Tensor, **kwargs) -> MultivariateNormal:
+        # the variational strategy does not broadcast the inputs against the
+        # (batched) inducing points
+        batch_shape = _mul_broadcast_shape(x.shape[:-2], self._aug_batch_shape)
+        return super().__call__(x.expand(batch_shape + x.shape[-2:]), **kwargs)
+
+    def forward(self, x: Tensor) -> MultivariateNormal:
+        mean_x = self.mean_module(x)
+        covar_x = self.covar_module(x)
+        return MultivariateNormal(mean_x, covar_x)
@@ -0,0 +1,160 @@
+#! /usr/bin/env python3
+
+r"""
+Converters between `ModelListGP` and batched multi-output models.
+"""
+
+from itertools import chain
+from typing import Dict, List
+
+import torch
+from torch import Tensor
+from torch.nn import Module
+
+from ..exceptions.errors import UnsupportedError
+from .gp_regression import FixedNoiseGP, SingleTaskGP
+from .gpytorch import BatchedMultiOutputGPyTorchModel
+from .model_list_gp_regression import ModelListGP
+
+
+def model_list_to_batched(model_list: ModelListGP) -> BatchedMultiOutputGPyTorchModel:
+    r"""Convert a `ModelListGP` into a batched multi-output model.
+
+    All sub-models must be single-output `SingleTaskGP`s (or `FixedNoiseGP`s) of
+    the same structure (and with the same inference settings) that share the
+    same training inputs. The batched model evaluates the kernels of all outputs
+    in a single (batched) kernel call. The hyperparameters of the sub-models are
+    copied into the output batch dimension of the batched model.
+
+    Args:
+        model_list: The `ModelListGP` to convert.
+
+    Returns:
+        The batched multi-output model (of the same class as the sub-models).
+
+    Example:
+        >>> list_gp = ModelListGP([SingleTaskGP(X, Y1), SingleTaskGP(X, Y2)])
+        >>> batch_gp = model_list_to_batched(list_gp)
+    """
+    models = list(model_list.models)
+    _check_compatibility(models)
+    model_cls = type(models[0])
+    train_X = models[0].train_inputs[0]
+    train_Y = torch.stack([m.train_targets for m in models], dim=-1)
+    kwargs = {"train_X": train_X, "train_Y": train_Y}
+    if model_cls is FixedNoiseGP:
+        kwargs["train_Yvar"] = torch.stack(
+            [m.likelihood.noise_covar.noise for m in models], dim=-1
+        )
+    batch_model = model_cls(**kwargs)
+    if _get_structure(batch_model) != _get_structure(models[0]):
+        raise UnsupportedError("Sub-models must have the default model structure.")
+    batch_model.load_state_dict(
+        _stack_state_dicts(batch_model.state_dict(), [m.state_dict() for m in models])
+    )
+    batch_model.inference_settings = models[0].inference_settings
+    return batch_model.to(train_X)
+
+
+def batched_to_model_list(batch_model: BatchedMultiOutputGPyTorchModel) -> ModelListGP:
+    r"""Convert a batched multi-output model into a `ModelListGP`.
+
+    This is the inverse of `model_list_to_batched`, and can e.g. be used to unpack
+    the hyperparameters of a batched model that was fit jointly.
+
+    Args:
+        batch_model: A multi-output `SingleTaskGP` or `FixedNoiseGP`.
+
+    Returns:
+        A `ModelListGP` with one single-output sub-model (of the same class as
+        `batch_model`) per output.
+
+    Example:
+        >>> batch_gp = SingleTaskGP(train_X, train_Y)
+        >>> list_gp = batched_to_model_list(batch_gp)
+    """
+    model_cls = type(batch_model)
+    if model_cls not in (SingleTaskGP, FixedNoiseGP):
+        raise UnsupportedError(
+            "Only SingleTaskGP and FixedNoiseGP models can be converted."
+        )
+    num_outputs = batch_model._num_outputs
+    if num_outputs == 1:
+        return ModelListGP([batch_model])
+    # the training data is in batch mode, with the outputs in the first dimension
+    train_X = batch_model.train_inputs[0][0]
+    batch_sd = batch_model.state_dict()
+    models = []
+    for i in range(num_outputs):
+        kwargs = {"train_X": train_X, "train_Y": batch_model.train_targets[i]}
+        if model_cls is FixedNoiseGP:
+            kwargs["train_Yvar"] = batch_model.likelihood.noise_covar.noise[i]
+        model = model_cls(**kwargs)
+        model.load_state_dict(_select_output(batch_sd, model.state_dict(), i))
+        model.inference_settings = batch_model.inference_settings
+        models.append(model.to(train_X))
+    return ModelListGP(models)
+
+
+def _check_compatibility(models: List[SingleTaskGP]) -> None:
+    r"""Check that a list of models can be converted into a batched model."""
+    model_cls = type(models[0])
+    if model_cls not in (SingleTaskGP, FixedNoiseGP):
+        raise UnsupportedError(
+            "Only SingleTaskGP and FixedNoiseGP models can be converted."
+        )
+    if any(type(m) is not model_cls for m in models):
+        raise UnsupportedError("All sub-models must be of the same class.")
+    if any(m._num_outputs != 1 for m in models):
+        raise UnsupportedError("All sub-models must be single-output models.")
+    if any(m.inference_settings != models[0].inference_settings for m in models):
+        raise UnsupportedError("All sub-models must have the same inference settings.")
+    train_X = models[0].train_inputs[0]
+    if any(not torch.equal(m.train_inputs[0], train_X) for m in models[1:]):
+        raise UnsupportedError("All sub-models must have the same training inputs.")
+
+
+def _get_structure(model: Module) -> List[type]:
+    r"""Get the types of the modules of a model that hold parameters or buffers.
+
+    Modules without state (e.g. the `Distance` modules that gpytorch kernels
+    create on their first evaluation) are ignored.
+    """
+    return [
+        type(m)
+        for m in model.modules()
+        if any(True for _ in chain(m.parameters(False), m.buffers(False)))
+    ]
+
+
+def _stack_state_dicts(
+    batch_sd: Dict[str, Tensor], sds: List[Dict[str, Tensor]]
+) -> Dict[str, Tensor]:
+    r"""Stack the state dicts of non-batched models into a batched state dict.
+
+    Tensors whose shape differs between `batch_sd` and the non-batched state
+    dicts are stacked along the (leading) batch dimension. All other tensors
+    (such as prior parameters) are shared, and must be equal across models.
+    """
+    state_dict = {}
+    for name, value in batch_sd.items():
+        values = [sd[name] for sd in sds]
+        if value.shape == values[0].shape:
+            if not all(torch.equal(values[0], v) for v in values[1:]):
+                raise UnsupportedError(
+                    f"Sub-models have different non-batched values for {name}."
+                )
+            state_dict[name] = values[0]
+        else:
+            state_dict[name] = torch.stack(values, dim=0)
+    return state_dict
+
+
+def _select_output(
+    batch_sd: Dict[str, Tensor], sd: Dict[str, Tensor], i: int
+) -> Dict[str, Tensor]:
+    r"""Select the state of the `i`-th output from a batched state dict."""
+    return {
+        name: value if value.shape == sd[name].shape else value[i]
+        for name, value in batch_sd.items()
+    }
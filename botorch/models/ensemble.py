@@ -0,0 +1,233 @@
+#! /usr/bin/env python3
+
+r"""
+Rank-weighted ensembles of GPs for transfer learning from previous experiments.
+"""
+
+from typing import Any, List, Optional
+
+import torch
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.lazy import lazify
+from gpytorch.utils.cholesky import psd_safe_cholesky
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from ..posteriors.gpytorch import GPyTorchPosterior
+from .converter import _get_structure, _stack_state_dicts
+from .gp_regression import SingleTaskGP
+from .model import Model
+
+
+class RankWeightedGPEnsemble(Model):
+    r"""A rank-weighted ensemble of single-task GPs (RGPE).
+
+    Combines GPs fit to the data of previous (base) experiments with a GP fit
+    to the data of the current (target) experiment (Feurer et al., 2018). The
+    posterior is the Gaussian with mean `sum_i w_i mu_i(x)` and covariance
+    `sum_i w_i^2 Sigma_i(x, x')`, where `mu_i` and `Sigma_i` are the posterior
+    mean and covariance of the `i`-th member, and `w_i` are the ensemble
+    weights, so that it can be used with all (MC) acquisition functions.
+
+    The members are stacked into a single batched `SingleTaskGP` (with the
+    hyperparameters of the members in the batch dimension). Training data of
+    different sizes are padded to the largest size, and masked out of the
+    (batched) training covariance, so that the posteriors of all members are
+    computed exactly in a single batched evaluation.
+
+    If no weights are given, the weight of each member is the fraction of
+    posterior samples for which the member has the smallest ranking loss on
+    the target data, i.e. the smallest number of misranked pairs of target
+    observations. For the target model, the closed-form leave-one-out
+    predictive distributions (with fixed hyperparameters) are used instead of
+    its posterior. All ranking losses are computed in a single vectorized
+    pass.
+
+    The members (and their posterior caches) are a snapshot of the models
+    passed in. Create a new ensemble after updating the target model.
+    """
+
+    def __init__(
+        self,
+        base_models: List[SingleTaskGP],
+        target_model: SingleTaskGP,
+        weights: Optional[Tensor] = None,
+        num_samples: int = 256,
+    ) -> None:
+        r"""A rank-weighted ensemble of single-task GPs (RGPE).
+
+        Args:
+            base_models: A list of (fitted) single-output `SingleTaskGP`s of the
+                base experiments.
+            target_model: A (fitted) single-output `SingleTaskGP` of the target
+                experiment.
+            weights: A `num_base_models + 1`-dim tensor of weights of the base
+                models and the target model (normalized to sum to one). If
+                omitted, use the ranking-loss weights.
+            num_samples: The number of posterior samples used for computing the
+                ranking-loss weights.
+
+        Example:
+            >>> base_models = [SingleTaskGP(X, Y) for X, Y in base_data]
+            >>> target_model = SingleTaskGP(train_X, train_Y)
+            >>> model = RankWeightedGPEnsemble(base_models, target_model)
+            >>> qEI = qExpectedImprovement(model, best_f=train_Y.max())
+        """
+        super().__init__()
+        models = list(base_models) + [target_model]
+        for m in models:
+            if type(m) is not SingleTaskGP:
+                raise UnsupportedError(
+                    "RankWeightedGPEnsemble only supports SingleTaskGP members."
+                )
+            if m.train_inputs[0].dim() != 2 or m._num_outputs != 1:
+                raise UnsupportedError(
+                    "RankWeightedGPEnsemble requires non-batched, single-output "
+                    "members."
+                )
+        train_inputs = [m.train_inputs[0] for m in models]
+        train_targets = [m.train_targets for m in models]
+        n_max = max(X.size(-2) for X in train_inputs)
+        train_X = torch.stack(
+            [torch.cat([X, X[:1].expand(n_max - X.size(-2), -1)]) for X in train_inputs]
+        )
+        train_Y = torch.stack(
+            [torch.cat([Y, Y.new_zeros(n_max - Y.size(-1))]) for Y in train_targets]
+        )
+        mask = torch.stack(
+            [torch.arange(n_max, device=Y.device) < Y.size(-1) for Y in train_targets]
+        )
+        batch_model = SingleTaskGP(train_X, train_Y)
+        if _get_structure(batch_model) != _get_structure(target_model):
+            raise UnsupportedError("Members must have the default model structure.")
+        batch_model.load_state_dict(
+            _stack_state_dicts(
+                batch_model.state_dict(), [m.state_dict() for m in models]
+            )
+        )
+        self.batch_model = batch_model.to(train_X).eval()
+        self.register_buffer("train_mask", mask)
+        self._build_cache()
+        if weights is None:
+            weights = self._get_rank_weights(
+                target_model=target_model, num_samples=num_samples
+            )
+        if weights.shape != torch.Size([len(models)]):
+            raise ValueError(f"Expected {len(models)} weights.")
+        self.register_buffer("weights", weights.to(train_X) / weights.sum())
+
+    def member_posterior(self, X: Tensor) -> GPyTorchPosterior:
+        r"""Computes the posteriors of all members at the provided points.
+
+        Args:
+            X: A `(batch_shape) x q x d`-dim Tensor of test points.
+
+        Returns:
+            A `GPyTorchPosterior` over `q` points with batch shape
+            `(batch_shape) x m`, where `m` is the number of members (with the
+            target model last).
+        """
+        model, mask = self.batch_model, self.train_mask
+        train_X, L, alpha = self._train_X, self._L, self._alpha
+        X = X.unsqueeze(-3).expand(X.shape[:-2] + train_X.shape[:1] + X.shape[-2:])
+        # padded training points do not affect the posterior
+        K_xt = lazify(model.covar_module(X, train_X)).evaluate()
+        K_xt = K_xt * mask.unsqueeze(-2).to(K_xt)
+        K_xx = lazify(model.covar_module(X)).evaluate()
+        mean = model.mean_module(X) + (K_xt @ alpha.unsqueeze(-1)).squeeze(-1)
+        L = L.expand(K_xt.shape[:-2] + L.shape[-2:])
+        V = torch.triangular_solve(K_xt.transpose(-1, -2), L, upper=False)[0]
+        covar = K_xx - V.transpose(-1, -2) @ V
+        return GPyTorchPosterior(mvn=MultivariateNormal(mean, lazify(covar)))
+
+    def posterior(
+        self,
+        X: Tensor,
+        output_indices: Optional[List[int]] = None,
+        observation_noise: bool = False,
+        **kwargs: Any,
+    ) -> GPyTorchPosterior:
+        r"""Computes the posterior of the ensemble at the provided points.
+
+        Args:
+            X: A `(batch_shape) x q x d`-dim Tensor, where `d` is the dimension of the
+                feature space and `q` is the number of points considered jointly.
+            output_indices: Ignored (the ensemble has a single output).
+            observation_noise: Not supported (the members have different noise
+                levels).
+
+        Returns:
+            A `GPyTorchPosterior` object, representing a batch of `b` joint
+            distributions over `q` points.
+        """
+        if observation_noise:
+            raise UnsupportedError(
+                "RankWeightedGPEnsemble does not support observation noise."
+            )
+        mvn = self.member_posterior(X).mvn
+        weights = self.weights.to(X)
+        mean = (weights.unsqueeze(-1) * mvn.mean).sum(dim=-2)
+        covar = (weights.pow(2).view(-1, 1, 1) * mvn.covariance_matrix).sum(dim=-3)
+        return GPyTorchPosterior(mvn=MultivariateNormal(mean, lazify(covar)))
+
+    def _build_cache(self) -> None:
+        r"""Factorize the masked training covariances of all members."""
+        model, mask = self.batch_model, self.train_mask
+        train_X = model.train_inputs[0]
+        with torch.no_grad():
+            prior = model.forward(train_X)
+            covar = model.likelihood(prior, train_X).covariance_matrix
+            # decouple the padded training points (with unit variance)
+            mask = mask.to(covar)
+            covar = covar * mask.unsqueeze(-1) * mask.unsqueeze(-2)
+            covar = covar + torch.diag_embed(1 - mask)
+            residual = (model.train_targets - prior.mean) * mask
+            L = psd_safe_cholesky(covar)
+            alpha = torch.cholesky_solve(residual.unsqueeze(-1), L).squeeze(-1)
+        self.register_buffer("_train_X", train_X)
+        self.register_buffer("_L", L)
+        self.register_buffer("_alpha", alpha)
+
+    def _get_rank_weights(self, target_model: SingleTaskGP, num_samples: int) -> Tensor:
+        r"""Compute the ranking-loss weights of the members."""
+        train_X, train_Y = target_model.train_inputs[0], target_model.train_targets
+        with torch.no_grad():
+            # `num_samples x m x n` samples of the members at the target data
+            samples = self.member_posterior(train_X).mvn.sample(
+                torch.Size([num_samples])
+            )
+            # closed-form LOO predictive distributions of the target model from
+            # its (unpadded) block of the cached factorization
+            n = train_Y.size(-1)
+            K_inv_diag = torch.cholesky_inverse(self._L[-1, :n, :n]).diagonal()
+            loo_mean = train_Y - self._alpha[-1, :n] / K_inv_diag
+            noise = self.batch_model.likelihood.noise[-1].view(-1)
+            loo_std = (1 / K_inv_diag - noise).clamp_min(0).sqrt()
+            samples[:, -1] = loo_mean + loo_std * torch.randn_like(samples[:, -1])
+            ranking_loss = compute_ranking_loss(samples.transpose(0, 1), train_Y)
+        best_models = ranking_loss.argmin(dim=0)
+        counts = best_models.bincount(minlength=samples.size(1))
+        return counts.to(train_X) / num_samples
+
+
+def compute_ranking_loss(f_samples: Tensor, target_Y: Tensor) -> Tensor:
+    r"""Compute the ranking loss of samples w.r.t. target observations.
+
+    The ranking loss is the number of (ordered) pairs of target observations
+    whose order is not preserved by the sample.
+
+    Args:
+        f_samples: A `batch_shape x n`-dim tensor of samples at the `n` target
+            points.
+        target_Y: A `n`-dim tensor of target observations.
+
+    Returns:
+        A `batch_shape`-dim tensor of ranking losses.
+
+    Example:
+        >>> f_samples = model.posterior(train_X).sample(torch.Size([64]))
+        >>> loss = compute_ranking_loss(f_samples.view(64, -1), train_Y.view(-1))
+    """
+    f_less = f_samples.unsqueeze(-1) < f_samples.unsqueeze(-2)
+    y_less = target_Y.unsqueeze(-1) < target_Y.unsqueeze(-2)
+    return (f_less ^ y_less).sum(dim=(-2, -1))
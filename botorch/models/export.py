@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+
+r"""
+Export of fitted GP models to TorchScript for low-latency predictions.
+"""
+
+import math
+from typing import Tuple
+
+import torch
+from gpytorch.kernels.matern_kernel import MaternKernel
+from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.means.constant_mean import ConstantMean
+from torch import Tensor
+from torch.nn import Module
+
+from ..exceptions.errors import UnsupportedError
+from .gp_regression import FixedNoiseGP, SingleTaskGP
+from .prediction_cache import build_prediction_cache, get_variance_root
+
+
+class ExportedMaternGP(Module):
+    r"""Posterior predictions of an exact GP with a scaled Matern kernel.
+
+    A self-contained module holding the (detached) hyperparameters and cached
+    training quantities of a fitted exact GP with a constant mean and a
+    `ScaleKernel(MaternKernel)` covariance (as used by `SingleTaskGP` and
+    `FixedNoiseGP`). The module only depends on torch and can be compiled with
+    `torch.jit.script`, so that the compiled module can be loaded and evaluated
+    without botorch or gpytorch. Use `export_to_torchscript` to construct the
+    compiled module from a model.
+    """
+
+    __constants__ = ["nu", "num_outputs", "num_batch_dims"]
+
+    def __init__(
+        self,
+        train_inputs: Tensor,
+        alpha: Tensor,
+        variance_root: Tensor,
+        constant: Tensor,
+        lengthscale: Tensor,
+        outputscale: Tensor,
+        nu: float,
+        num_outputs: int,
+    ) -> None:
+        r"""Posterior predictions of an exact GP with a scaled Matern kernel.
+
+        All tensors are in the augmented batch shape `(o) x batch_shape` of the
+        model.
+
+        Args:
+            train_inputs: A `(o) x batch_shape x n x d` tensor of training inputs.
+            alpha: A `(o) x batch_shape x n` tensor `K^-1 (y - m)`.
+            variance_root: A `(o) x batch_shape x n x n` tensor with the inverse
+                `L^-1` of the Cholesky factor of the training covariance.
+            constant: A `(o) x batch_shape x 1` tensor of constant means.
+            lengthscale: A `(o) x batch_shape x 1 x d` tensor of lengthscales.
+            outputscale: A `(o) x batch_shape` tensor of outputscales.
+            nu: The smoothness parameter of the Matern kernel.
+            num_outputs: The number of outputs `o` of the model.
+        """
+        super().__init__()
+        self.nu = nu
+        self.num_outputs = num_outputs
+        self.num_batch_dims = train_inputs.dim() - 2 - int(num_outputs > 1)
+        # center the inputs for numerical stability (as gpytorch does)
+        self.register_buffer("center", train_inputs.mean(dim=-2, keepdim=True))
+        self.register_buffer("train_inputs", (train_inputs - self.center) / lengthscale)
+        self.register_buffer("alpha", alpha.unsqueeze(-1))
+        self.register_buffer("variance_root", variance_root)
+        self.register_buffer("constant", constant)
+        self.register_buffer("lengthscale", lengthscale)
+        self.register_buffer("outputscale", outputscale.unsqueeze(-1).unsqueeze(-1))
+
+    def forward(self, X: Tensor) -> Tuple[Tensor, Tensor]:
+        r"""Compute the posterior mean and variance.
+
+        Args:
+            X: A `(batch_shape) x q x d` tensor of test points.
+
+        Returns:
+            2-element tuple containing
+
+            - A `(batch_shape) x q x o` tensor of posterior means.
+            - A `(batch_shape) x q x o` tensor of posterior variances (without
+              observation noise).
+        """
+        K_xt = self._covar(self._add_output_dim(X))
+        mean = self.constant + K_xt.matmul(self.alpha).squeeze(-1)
+        V = self.variance_root.matmul(K_xt.transpose(-1, -2))
+        variance = (self.outputscale.squeeze(-1) - V.pow(2).sum(dim=-2)).clamp_min(0)
+        return self._move_output_dim(mean), self._move_output_dim(variance)
+
+    @torch.jit.export
+    def covariance(self, X: Tensor) -> Tensor:
+        r"""Compute the joint posterior covariance (use for small `q` only).
+
+        Args:
+            X: A `(batch_shape) x q x d` tensor of test points.
+
+        Returns:
+            A `(batch_shape) x (o) x q x q` tensor of posterior covariances
+            (without observation noise) of the `q` test points.
+        """
+        X = self._add_output_dim(X)
+        K_xt = self._covar(X)
+        V = self.variance_root.matmul(K_xt.transpose(-1, -2))
+        X = (X - self.center) / self.lengthscale
+        covar = self._matern(self._sq_dist(X, X)) - V.transpose(-1, -2).matmul(V)
+        if self.num_outputs > 1:
+            # move the output dimension to the left of the `q x q` dimensions
+            dim = -(self.num_batch_dims + 4)
+            covar = covar.unsqueeze(-3).transpose(dim, -3).squeeze(dim)
+        return covar
+
+    def _add_output_dim(self, X: Tensor) -> Tensor:
+        r"""Insert the output dimension into X (for multi-output models)."""
+        if self.num_outputs > 1:
+            X = X.unsqueeze(-(self.num_batch_dims + 3))
+        return X
+
+    def _move_output_dim(self, Y: Tensor) -> Tensor:
+        r"""Move the output dimension of a `... x o x batch_shape x q` tensor last."""
+        if self.num_outputs > 1:
+            dim = -(self.num_batch_dims + 3)
+            return Y.unsqueeze(-1).transpose(dim, -1).squeeze(dim)
+        return Y.unsqueeze(-1)
+
+    def _covar(self, X: Tensor) -> Tensor:
+        r"""Compute the covariance between X and the training inputs."""
+        X = (X - self.center) / self.lengthscale
+        return self._matern(self._sq_dist(X, self.train_inputs))
+
+    def _sq_dist(self, x1: Tensor, x2: Tensor) -> Tensor:
+        r"""Compute the squared distances between x1 and x2."""
+        x1_norm = x1.pow(2).sum(dim=-1, keepdim=True)
+        x2_norm = x2.pow(2).sum(dim=-1, keepdim=True)
+        res = x1_norm - 2 * x1.matmul(x2.transpose(-1, -2))
+        return (res + x2_norm.transpose(-1, -2)).clamp_min(1e-30)
+
+    def _matern(self, sq_dist: Tensor) -> Tensor:
+        r"""Evaluate the scaled Matern kernel from squared distances."""
+        distance = sq_dist.sqrt()
+        exp_component = torch.exp(-math.sqrt(self.nu * 2) * distance)
+        if self.nu == 0.5:
+            constant_component = torch.ones_like(distance)
+        elif self.nu == 1.5:
+            constant_component = (math.sqrt(3) * distance).add(1)
+        else:
+            constant_component = (
+                (math.sqrt(5) * distance).add(1).add(5.0 / 3.0 * sq_dist)
+            )
+        return self.outputscale * constant_component * exp_component
+
+
+def export_to_torchscript(model: SingleTaskGP) -> torch.jit.ScriptModule:
+    r"""Export the posterior mean and variance of a fitted GP to TorchScript.
+
+    The hyperparameters of the model are fixed, and the Cholesky factor of the
+    training covariance and `K^-1 (y - m)` are precomputed, so that predictions
+    only require a kernel evaluation against the training inputs and two
+    matrix multiplications. The resulting module can be saved with `save` and
+    loaded with `torch.jit.load` without requiring botorch or gpytorch.
+
+    Args:
+        model: A fitted `SingleTaskGP` or `FixedNoiseGP` (with the default constant
+            mean and scaled Matern kernel).
+
+    Returns:
+        A compiled `ExportedMaternGP` module. Calling it with a
+        `(batch_shape) x q x d` tensor `X` returns a tuple of
+        `(batch_shape) x q x o` posterior means and variances, and its
+        `covariance` method returns the `(batch_shape) x (o) x q x q` posterior
+        covariances.
+
+    Example:
+        >>> model = SingleTaskGP(train_X, train_Y)
+        >>> fit_gpytorch_model(ExactMarginalLogLikelihood(model.likelihood, model))
+        >>> exported = export_to_torchscript(model)
+        >>> exported.save("model.pt")
+        >>> mean, variance = torch.jit.load("model.pt")(test_X)
+    """
+    if not isinstance(model, (SingleTaskGP, FixedNoiseGP)):
+        raise UnsupportedError(
+            "Only SingleTaskGP and FixedNoiseGP models can be exported."
+        )
+    mean_module, covar_module = model.mean_module, model.covar_module
+    if (
+        type(mean_module) is not ConstantMean
+        or type(covar_module) is not ScaleKernel
+        or not isinstance(covar_module.base_kernel, MaternKernel)
+    ):
+        raise UnsupportedError(
+            "Only models with a constant mean and a scaled Matern kernel can be "
+            "exported."
+        )
+    model.eval()
+    cache = model._prediction_cache or build_prediction_cache(model=model)
+    with torch.no_grad():
+        module = ExportedMaternGP(
+            train_inputs=cache.train_inputs.clone(),
+            alpha=cache.alpha.clone(),
+            variance_root=get_variance_root(cache),
+            constant=mean_module.constant.detach().clone(),
+            lengthscale=covar_module.base_kernel.lengthscale.detach().clone(),
+            outputscale=covar_module.outputscale.detach().clone(),
+            nu=float(covar_module.base_kernel.nu),
+            num_outputs=model._num_outputs,
+        )
+    return torch.jit.script(module)
@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+
+r"""
+Fully Bayesian GP models with hyperparameter samples in a batch dimension.
+"""
+
+from contextlib import ExitStack
+from typing import Any, List, Optional
+
+from gpytorch import settings
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from ..posteriors.fully_bayesian import FullyBayesianPosterior
+from .gp_regression import SingleTaskGP
+from .inference import inference_settings
+
+
+class FullyBayesianSingleTaskGP(SingleTaskGP):
+    r"""A fully Bayesian single-task exact GP model.
+
+    Instead of point estimates, this model holds `num_samples` samples of the
+    kernel, mean and noise hyperparameters. The samples live in the batch
+    dimension of the model, so the posteriors of all samples are computed in a
+    single batched evaluation. The posterior of the model is the equally
+    weighted mixture of these posteriors (see `FullyBayesianPosterior`).
+
+    The hyperparameter samples are obtained by fitting the model with
+    `fit_gpytorch_hmc`, which runs one vectorized HMC chain per batch element
+    under the (relatively strong) priors of `SingleTaskGP`.
+
+    This model currently only supports a single output and non-batched training
+    data.
+    """
+
+    def __init__(self, train_X: Tensor, train_Y: Tensor, num_samples: int = 16) -> None:
+        r"""A fully Bayesian single-task exact GP model.
+
+        Args:
+            train_X: A `n x d` tensor of training features.
+            train_Y: A `n` or `n x 1` tensor of training observations.
+            num_samples: The number of hyperparameter samples.
+
+        Example:
+            >>> train_X = torch.rand(20, 2)
+            >>> train_Y = torch.sin(train_X[:, 0]) + torch.cos(train_X[:, 1])
+            >>> model = FullyBayesianSingleTaskGP(train_X, train_Y)
+            >>> mll = ExactMarginalLogLikelihood(model.likelihood, model)
+            >>> fit_gpytorch_model(mll, optimizer=fit_gpytorch_hmc)
+        """
+        if train_X.dim() != 2:
+            raise UnsupportedError(
+                "FullyBayesianSingleTaskGP requires `n x d`-dim training data."
+            )
+        if train_Y.dim() == 2:
+            if train_Y.shape[-1] != 1:
+                raise UnsupportedError(
+                    "FullyBayesianSingleTaskGP only supports a single output."
+                )
+            train_Y = train_Y.squeeze(-1)
+        self.num_samples = num_samples
+        super().__init__(
+            train_X=train_X.expand(num_samples, *train_X.shape),
+            train_Y=train_Y.expand(num_samples, *train_Y.shape),
+        )
+
+    def posterior(
+        self,
+        X: Tensor,
+        output_indices: Optional[List[int]] = None,
+        observation_noise: bool = False,
+        **kwargs: Any,
+    ) -> FullyBayesianPosterior:
+        r"""Computes the posterior over model outputs at the provided points.
+
+        Args:
+            X: A `(batch_shape) x q x d`-dim Tensor, where `d` is the dimension of
+                the feature space and `q` is the number of points considered
+                jointly.
+            output_indices: Ignored (this is a single-output model).
+            observation_noise: If True, add observation noise to the posterior.
+            detach_test_caches: If True, detach GPyTorch test caches during
+                computation of the posterior. Required for being able to compute
+                derivatives with respect to training inputs at test time (used
+                e.g. by qNoisyExpectedImprovement). Defaults to `True`.
+
+        Returns:
+            A `FullyBayesianPosterior` object, representing `batch_shape` mixtures
+            of joint distributions over `q` points.
+        """
+        self.eval()  # make sure model is in eval mode
+        detach_test_caches = kwargs.get("detach_test_caches", True)
+        # insert a batch dimension for the hyperparameter samples
+        X = X.unsqueeze(-3)
+        with ExitStack() as es:
+            es.enter_context(settings.debug(False))
+            es.enter_context(inference_settings(self.inference_settings))
+            es.enter_context(settings.detach_test_caches(detach_test_caches))
+            mvn = self(X)
+            if observation_noise:
+                mvn = self.likelihood(mvn, X)
+        return FullyBayesianPosterior(mvn=mvn)
@@ -5,13 +5,15 @@ Gaussian Process Regression models based on GPyTorch models.
 """
 
 from copy import deepcopy
-from typing import Optional
+from typing import Any, List, Optional, Tuple
 
 import torch
-from gpytorch.constraints.constraints import GreaterThan
+from gpytorch import settings
+from gpytorch.constraints.constraints import GreaterThan, Interval
 from gpytorch.distributions.multivariate_normal import MultivariateNormal
 from gpytorch.kernels.matern_kernel import MaternKernel
 from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.lazy import DiagLazyTensor
 from gpytorch.likelihoods.gaussian_likelihood import (
     FixedNoiseGaussianLikelihood,
     GaussianLikelihood,
@@ -26,7 +28,18 @@ from gpytorch.priors.torch_priors import GammaPrior
 from torch import Tensor
 
 from .gpytorch import BatchedMultiOutputGPyTorchModel
-from .utils import multioutput_to_batch_mode_transform
+from .kernels.cached_matern import CachedDistanceMaternKernel
+from .prediction_cache import (
+    ExactPredictionCache,
+    build_prediction_cache,
+    predict_mean_from_cache,
+)
+from .utils import (
+    _get_first_indices,
+    aggregate_replicates,
+    group_replicates,
+    multioutput_to_batch_mode_transform,
+)
 
 
 MIN_INFERRED_NOISE_LEVEL = 1e-6
@@ -50,7 +63,11 @@ class SingleTaskGP(ExactGP, BatchedMultiOutputGPyTorchModel):
     """
 
     def __init__(
-        self, train_X: Tensor, train_Y: Tensor, likelihood: Optional[Likelihood] = None
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        likelihood: Optional[Likelihood] = None,
+        cache_distances: bool = False,
     ) -> None:
         r"""A single-task exact GP model.
 
@@ -61,6 +78,9 @@ class SingleTaskGP(ExactGP, BatchedMultiOutputGPyTorchModel):
                 training observations.
             likelihood: A likelihood. If omitted, use a standard
                 GaussianLikelihood with inferred noise level.
+            cache_distances: If True, cache the per-dimension squared distances
+                of the training inputs to speed up model fitting (see
+                `CachedDistanceMaternKernel`). This requires `n^2 d` memory.
 
         Example:
             >>> train_X = torch.rand(20, 2)
@@ -68,6 +88,7 @@ class SingleTaskGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             >>> model = SingleTaskGP(train_X, train_Y)
         """
         ard_num_dims = train_X.shape[-1]
+        orig_train_X = train_X
         self._set_dimensions(train_X=train_X, train_Y=train_Y)
         train_X, train_Y, _ = multioutput_to_batch_mode_transform(
             train_X=train_X, train_Y=train_Y, num_outputs=self._num_outputs
@@ -88,8 +109,9 @@ class SingleTaskGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             self._likelihood_state_dict = deepcopy(likelihood.state_dict())
         super().__init__(train_X, train_Y, likelihood)
         self.mean_module = ConstantMean(batch_shape=self._aug_batch_shape)
+        kernel_cls = CachedDistanceMaternKernel if cache_distances else MaternKernel
         self.covar_module = ScaleKernel(
-            MaternKernel(
+            kernel_cls(
                 nu=2.5,
                 ard_num_dims=ard_num_dims,
                 batch_shape=self._aug_batch_shape,
@@ -98,6 +120,8 @@ class SingleTaskGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             batch_shape=self._aug_batch_shape,
             outputscale_prior=GammaPrior(2.0, 0.15),
         )
+        if cache_distances:
+            self.covar_module.base_kernel.cache_inputs(orig_train_X)
         self.to(train_X)
 
     def forward(self, x: Tensor) -> MultivariateNormal:
@@ -117,7 +141,14 @@ class FixedNoiseGP(ExactGP, BatchedMultiOutputGPyTorchModel):
     This model works in batch mode (each batch having its own hyperparameters).
     """
 
-    def __init__(self, train_X: Tensor, train_Y: Tensor, train_Yvar: Tensor) -> None:
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        train_Yvar: Tensor,
+        cache_distances: bool = False,
+        replicate_tol: Optional[float] = None,
+    ) -> None:
         r"""A single-task exact GP model using fixed noise levels.
 
         Args:
@@ -127,6 +158,15 @@ class FixedNoiseGP(ExactGP, BatchedMultiOutputGPyTorchModel):
                 training observations.
             train_Yvar: A `batch_shape x n x (t)` or `batch_shape x n x (t)`
                 (batch mode) tensor of observed measurement noise.
+            cache_distances: If True, cache the per-dimension squared distances
+                of the training inputs to speed up model fitting (see
+                `CachedDistanceMaternKernel`). This requires `n^2 d` memory.
+            replicate_tol: If specified, aggregate the observations at training
+                points whose features are within `replicate_tol` of each other
+                into their inverse-variance weighted means (see
+                `aggregate_replicates`). For exact replicates (`replicate_tol=0`),
+                this yields the same posterior at a reduced cost. Requires `n x d`
+                training features.
 
         Example:
             >>> train_X = torch.rand(20, 2)
@@ -134,7 +174,15 @@ class FixedNoiseGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             >>> train_Yvar = torch.full_like(train_Y, 0.2)
             >>> model = FixedNoiseGP(train_X, train_Y, train_Yvar)
         """
+        if replicate_tol is not None:
+            train_X, train_Y, train_Yvar = aggregate_replicates(
+                train_X=train_X,
+                train_Y=train_Y,
+                train_Yvar=train_Yvar,
+                tol=replicate_tol,
+            )
         ard_num_dims = train_X.shape[-1]
+        orig_train_X = train_X
         self._set_dimensions(train_X=train_X, train_Y=train_Y)
         train_X, train_Y, train_Yvar = multioutput_to_batch_mode_transform(
             train_X=train_X,
@@ -149,8 +197,9 @@ class FixedNoiseGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             train_inputs=train_X, train_targets=train_Y, likelihood=likelihood
         )
         self.mean_module = ConstantMean(batch_shape=self._aug_batch_shape)
+        kernel_cls = CachedDistanceMaternKernel if cache_distances else MaternKernel
         self.covar_module = ScaleKernel(
-            base_kernel=MaternKernel(
+            base_kernel=kernel_cls(
                 nu=2.5,
                 ard_num_dims=ard_num_dims,
                 batch_shape=self._aug_batch_shape,
@@ -159,6 +208,8 @@ class FixedNoiseGP(ExactGP, BatchedMultiOutputGPyTorchModel):
             batch_shape=self._aug_batch_shape,
             outputscale_prior=GammaPrior(2.0, 0.15),
         )
+        if cache_distances:
+            self.covar_module.base_kernel.cache_inputs(orig_train_X)
         self.to(train_X)
 
     def forward(self, x: Tensor) -> MultivariateNormal:
@@ -175,7 +226,13 @@ class HeteroskedasticSingleTaskGP(SingleTaskGP):
     observation noise levels.
     """
 
-    def __init__(self, train_X: Tensor, train_Y: Tensor, train_Yvar: Tensor) -> None:
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        train_Yvar: Tensor,
+        replicate_tol: Optional[float] = None,
+    ) -> None:
         r"""A single-task exact GP model using a heteroskedastic noise model.
 
         Args:
@@ -185,6 +242,15 @@ class HeteroskedasticSingleTaskGP(SingleTaskGP):
                 training observations.
             train_Yvar: A `batch_shape x n x (o)` or `batch_shape x n x (o)`
                 (batch mode) tensor of observed measurement noise..
+            replicate_tol: If specified, aggregate the observations at training
+                points whose features are within `replicate_tol` of each other
+                into their means (see `group_replicates`). The noise model is
+                fit to the noise levels of the original observations, and the
+                noise levels of the aggregated observations are computed from
+                its predictions (see `CachedHeteroskedasticNoise`). For exact
+                replicates (`replicate_tol=0`), the posterior is identical to
+                that of the model on the original observations. Requires
+                `n x d` training features.
 
         Example:
             >>> train_X = torch.rand(20, 2)
@@ -203,7 +269,158 @@ class HeteroskedasticSingleTaskGP(SingleTaskGP):
         noise_model = SingleTaskGP(
             train_X=train_X, train_Y=train_Y_log_var, likelihood=noise_likelihood
         )
-
-        likelihood = _GaussianLikelihoodBase(HeteroskedasticNoise(noise_model))
+        replicate_group = None
+        if replicate_tol is not None:
+            _, replicate_group = group_replicates(train_X=train_X, tol=replicate_tol)
+            # the noise levels predicted by the noise model are equal for exact
+            # replicates, so that their inverse-variance weighted mean is the mean
+            train_X, train_Y, _ = aggregate_replicates(
+                train_X=train_X,
+                train_Y=train_Y,
+                train_Yvar=torch.ones_like(train_Yvar),
+                tol=replicate_tol,
+            )
+        likelihood = _GaussianLikelihoodBase(
+            CachedHeteroskedasticNoise(noise_model, replicate_group=replicate_group)
+        )
         super().__init__(train_X=train_X, train_Y=train_Y, likelihood=likelihood)
         self.to(train_X)
+
+    def freeze(self) -> None:
+        r"""Freeze the model (and its noise model) for low-latency posteriors.
+
+        See `BatchedMultiOutputGPyTorchModel.freeze`. The noise model is frozen
+        as well, so that the noise levels at the training inputs and at test
+        points are computed from its pinned caches.
+        """
+        self.likelihood.noise_covar.noise_model.freeze()
+        super().freeze()
+
+    def unfreeze(self) -> None:
+        r"""Unfreeze a frozen model (and its noise model)."""
+        super().unfreeze()
+        self.likelihood.noise_covar.noise_model.unfreeze()
+
+
+class CachedHeteroskedasticNoise(HeteroskedasticNoise):
+    r"""A heteroskedastic noise model with cached noise GP predictions.
+
+    In eval mode, `HeteroskedasticNoise` computes the full posterior of the
+    noise GP (including its covariance) whenever the noise levels are needed,
+    although only the posterior mean is used. This noise model instead
+    computes the posterior mean from the prediction cache of the noise GP
+    (see `build_prediction_cache`), which is built once and kept along with the
+    noise level of the noise GP until the parameters, buffers or training data
+    of the noise GP are modified (or is pinned if the noise GP is frozen):
+
+    - At the training inputs of the noise GP, the posterior mean follows from
+      the cache without any cross-covariance evaluations as
+      `y - sigma^2 K^-1 (y - m)`, where `sigma^2` is the effective noise level
+      of the noise GP, i.e. the diagonal of `K = L L^T` minus the prior
+      variances (which includes any jitter added by the Cholesky
+      decomposition).
+    - At test points, only the cross-covariance to the training inputs is
+      evaluated (see `predict_mean_from_cache`).
+
+    In train mode (i.e. while fitting), the noise GP returns its prior, so
+    that the noise levels are computed as in `HeteroskedasticNoise`. The same
+    holds in eval mode if gpytorch's test caches are not detached.
+
+    If the observations of the GP using this noise model are aggregated
+    replicates of the training observations of the noise GP (see
+    `aggregate_replicates`), `replicate_group` maps each training input of the
+    noise GP to its aggregated observation. The noise levels at the aggregated
+    training inputs are then computed from the noise levels `s_i` of the
+    original observations as `1 / sum_i (1 / s_i)`.
+    """
+
+    def __init__(
+        self,
+        noise_model: ExactGP,
+        noise_indices: Optional[List[int]] = None,
+        noise_constraint: Optional[Interval] = None,
+        replicate_group: Optional[Tensor] = None,
+    ) -> None:
+        r"""A heteroskedastic noise model with cached noise GP predictions.
+
+        Args:
+            noise_model: The noise GP (a `SingleTaskGP`) modeling the log noise
+                levels.
+            noise_indices: The indices of the noise GP outputs to use.
+            noise_constraint: The constraint mapping the outputs of the noise
+                GP to noise levels.
+            replicate_group: A `n`-dim tensor of the index of the aggregated
+                observation of each training input of the noise GP (see
+                `group_replicates`).
+        """
+        super().__init__(
+            noise_model=noise_model,
+            noise_indices=noise_indices,
+            noise_constraint=noise_constraint,
+        )
+        self.register_buffer("replicate_group", replicate_group)
+        self._noise_model_cache = None
+        if replicate_group is not None:
+            first_idcs = _get_first_indices(replicate_group)
+            self.register_buffer("replicate_first_idcs", first_idcs)
+
+    def forward(
+        self,
+        *params: Any,
+        batch_shape: Optional[torch.Size] = None,
+        shape: Optional[torch.Size] = None,
+    ) -> DiagLazyTensor:
+        X = params[0] if torch.is_tensor(params[0]) else params[0][0]
+        group = self.replicate_group
+        if group is None or X.shape[-2] != self.replicate_first_idcs.numel():
+            return DiagLazyTensor(self._get_noise(X))
+        # the noise levels at the aggregated training inputs are computed from
+        # those of the original observations
+        train_X = self.noise_model.train_inputs[0]
+        agg_X = train_X.index_select(-2, self.replicate_first_idcs)
+        if X.shape[-2:] != agg_X.shape[-2:] or not torch.equal(X, agg_X.expand_as(X)):
+            return DiagLazyTensor(self._get_noise(X))
+        noise = self._get_noise(train_X)
+        inv_noise = torch.zeros(
+            noise.shape[:-1] + X.shape[-2:-1], dtype=noise.dtype, device=noise.device
+        ).index_add(noise.dim() - 1, group, 1 / noise)
+        return DiagLazyTensor(1 / inv_noise)
+
+    def _get_noise(self, X: Tensor) -> Tensor:
+        noise_model = self.noise_model
+        if noise_model.training or not settings.detach_test_caches.on():
+            return super().forward(X).diag()
+        cache, noise_level = self._get_noise_model_cache()
+        train_X = cache.train_inputs
+        if X is train_X or (X.shape == train_X.shape and torch.equal(X, train_X)):
+            mean = cache.train_targets - noise_level * cache.alpha
+        else:
+            mean = predict_mean_from_cache(cache=cache, model=noise_model, X=X)
+        noise_diag = (
+            mean if self._noise_indices is None else mean[..., self._noise_indices]
+        )
+        return self._noise_constraint.transform(noise_diag)
+
+    def _get_noise_model_cache(self) -> Tuple[ExactPredictionCache, Tensor]:
+        r"""Get the prediction cache and the effective noise level of the noise GP.
+
+        Both are rebuilt if the parameters, buffers or training data of the
+        noise GP were modified since they were cached (e.g. via
+        `load_state_dict`, by assigning hyperparameters or via
+        `set_train_data`). If the noise GP is frozen, its pinned cache is used.
+        """
+        noise_model = self.noise_model
+        if self._noise_model_cache is not None:
+            state, cache, noise_level = self._noise_model_cache
+            if not noise_model._state_changed(state):
+                return cache, noise_level
+        if noise_model.is_frozen:
+            noise_model._check_frozen()
+            cache = noise_model._prediction_cache
+        else:
+            cache = build_prediction_cache(model=noise_model)
+        with torch.no_grad():
+            prior_variance = noise_model.covar_module(cache.train_inputs, diag=True)
+            noise_level = cache.L.pow(2).sum(dim=-1) - prior_variance
+        self._noise_model_cache = (noise_model._get_state(), cache, noise_level)
+        return cache, noise_level
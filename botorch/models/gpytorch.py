@@ -7,19 +7,50 @@ To implement your own, simply inherit from both the provided classes and a
 GPyTorch Model class such as an ExactGP.
 """
 
+import threading
 from abc import ABC, abstractproperty
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import ExitStack
-from typing import Any, List, Optional
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
+import numpy as np
 import torch
 from gpytorch import settings
 from gpytorch.distributions import MultitaskMultivariateNormal, MultivariateNormal
 from gpytorch.lazy import lazify
+from gpytorch.likelihoods.gaussian_likelihood import FixedNoiseGaussianLikelihood
+from gpytorch.models.exact_gp import ExactGP
 from torch import Tensor
 
-from ..posteriors.gpytorch import GPyTorchPosterior
+from ..exceptions.errors import BotorchError, UnsupportedError
+from ..posteriors.gpytorch import GPyTorchPosterior, IndependentOutputPosterior
+from .inference import InferenceSettings, inference_settings
 from .model import Model
-from .utils import _make_X_full, add_output_dim
+from .prediction_cache import (
+    ExactPredictionCache,
+    build_prediction_cache,
+    extend_prediction_cache,
+    get_variance_root,
+    predict_from_cache,
+)
+from .utils import _make_X_full, add_output_dim, multioutput_to_batch_mode_transform
+
+
+# lock for building the caches of read-only models (module-level so that models
+# remain picklable and deep-copyable)
+_READ_ONLY_LOCK = threading.Lock()
+
+
+class _ModelState(NamedTuple):
+    r"""A snapshot of the state determining the posterior of a model.
+
+    - versions: The `(tensor, (version, data pointer))` pairs of the
+      parameters, buffers and training data of the model.
+    - parameter_values: Copies of the values of the parameters of the model.
+    """
+
+    versions: List[Tuple[Tensor, Tuple[int, int]]]
+    parameter_values: List[Tensor]
 
 
 class GPyTorchModel(Model, ABC):
@@ -27,8 +58,14 @@ class GPyTorchModel(Model, ABC):
 
     The easiest way to use this is to subclass a model from a GPyTorch model
     class (e.g. an `ExactGP`) and this `GPyTorchModel`. See e.g. `SingleTaskGP`.
+
+    The linear algebra used for inference (Cholesky or CG) is configured per
+    model via the `inference_settings` attribute, which is applied when
+    computing posteriors and when fitting the model with `fit_gpytorch_model`.
     """
 
+    inference_settings: InferenceSettings = InferenceSettings()
+
     def posterior(
         self, X: Tensor, observation_noise: bool = False, **kwargs: Any
     ) -> GPyTorchPosterior:
@@ -52,7 +89,7 @@ class GPyTorchModel(Model, ABC):
         detach_test_caches = kwargs.get("detach_test_caches", True)
         with ExitStack() as es:
             es.enter_context(settings.debug(False))
-            es.enter_context(settings.fast_pred_var())
+            es.enter_context(inference_settings(self.inference_settings))
             es.enter_context(settings.detach_test_caches(detach_test_caches))
             mvn = self(X)
             if observation_noise:
@@ -60,6 +97,146 @@ class GPyTorchModel(Model, ABC):
                 mvn = self.likelihood(mvn, X)
             return GPyTorchPosterior(mvn=mvn)
 
+    def predict(
+        self,
+        X: Union[Tensor, np.ndarray, Iterable[Union[Tensor, np.ndarray]]],
+        tile_size: int = 1024,
+        observation_noise: bool = False,
+    ) -> Iterator[Tuple[Tensor, Tensor]]:
+        r"""Compute the marginal posterior means and variances at many points.
+
+        The test points are processed in tiles of (at most) `tile_size` points
+        without tracking gradients. Each point of a tile is evaluated as a
+        separate batch (i.e. with `q = 1`), so that neither the joint
+        covariance of the tile nor the test points beyond the current tile
+        are ever held in memory. This allows predicting at test sets that do
+        not fit into memory, e.g. memory-mapped arrays or generators.
+
+        Args:
+            X: The `n x d` test points, either as a tensor or numpy array (e.g.
+                a `numpy.memmap`), or as an iterable (e.g. a generator) of
+                `b x d` tensors or arrays. Arrays are converted to the dtype and
+                device of the model tile by tile. For models with batched
+                training data, each point is evaluated for all batches.
+            tile_size: The maximum number of points per tile.
+            observation_noise: If True, add observation noise to the posterior.
+
+        Returns:
+            An iterator over tuples of the `b x (batch_shape) x o` posterior
+            means and variances of the tiles, in the order of the test points.
+
+        Example:
+            >>> X = np.memmap("test_X.npy", dtype=np.float64, mode="r", shape=(n, d))
+            >>> for mean, variance in model.predict(X, tile_size=4096):
+            >>>     ...
+        """
+        param = next(self.parameters())
+        tkwargs = {"dtype": param.dtype, "device": param.device}
+        batch_shape = getattr(self, "_input_batch_shape", torch.Size())
+        for X_tile in _iter_tiles(X, tile_size=tile_size):
+            if isinstance(X_tile, np.ndarray):
+                # copy the tile (memory-mapped arrays may be read-only)
+                X_tile = torch.from_numpy(np.array(X_tile))
+            X_tile = X_tile.to(**tkwargs)
+            n, d = X_tile.shape
+            X_tile = X_tile.view(n, *(1 for _ in batch_shape), 1, d).expand(
+                n, *batch_shape, 1, d
+            )
+            with torch.no_grad():
+                posterior = self.posterior(X_tile, observation_noise=observation_noise)
+                mean, variance = posterior.mean, posterior.variance
+            yield mean.squeeze(-2), variance.squeeze(-2)
+
+    def predict_into(
+        self,
+        X: Union[Tensor, np.ndarray, Iterable[Union[Tensor, np.ndarray]]],
+        mean_out: np.ndarray,
+        variance_out: np.ndarray,
+        tile_size: int = 1024,
+        observation_noise: bool = False,
+    ) -> None:
+        r"""Write the marginal posterior means and variances to arrays.
+
+        Computes the predictions tile by tile (see `predict`) and writes each
+        tile to the output arrays, which can be memory-mapped, so that the
+        predictions at all test points are never held in memory at once.
+
+        Args:
+            X: The `n x d` test points (see `predict`).
+            mean_out: A `n x (batch_shape) x o` array for the posterior means.
+            variance_out: A `n x (batch_shape) x o` array for the posterior
+                variances.
+            tile_size: The maximum number of points per tile.
+            observation_noise: If True, add observation noise to the posterior.
+
+        Example:
+            >>> mean = np.memmap("mean", dtype=np.float64, mode="w+", shape=(n, 1))
+            >>> variance = np.memmap("var", dtype=np.float64, mode="w+", shape=(n, 1))
+            >>> model.predict_into(X, mean, variance, tile_size=4096)
+        """
+        if mean_out.shape != variance_out.shape:
+            raise ValueError("mean_out and variance_out must have the same shape.")
+        start = 0
+        for mean, variance in self.predict(
+            X, tile_size=tile_size, observation_noise=observation_noise
+        ):
+            end = start + mean.size(0)
+            if end > mean_out.shape[0]:
+                raise ValueError("The outputs have fewer rows than test points.")
+            mean_out[start:end] = mean.cpu().numpy()
+            variance_out[start:end] = variance.cpu().numpy()
+            start = end
+        if start != mean_out.shape[0]:
+            raise ValueError("The outputs have more rows than test points.")
+
+    def _get_state(self) -> _ModelState:
+        r"""Get a snapshot of the state determining the posterior of the model.
+
+        The snapshot consists of the versions of the parameters and buffers of
+        the model, its training data and fixed noise levels (if any), and of
+        copies of the values of the parameters. The data pointer changes if a
+        tensor is moved (e.g. via `to`), which does not bump its version, and
+        the values of the parameters change without bumping their versions if
+        they are assigned directly (gpytorch's `initialize` copies the values
+        into the `data` of the parameters).
+
+        Returns:
+            The state of the model.
+        """
+        tensors = list(self.parameters()) + list(self.buffers())
+        tensors.extend(self.train_inputs)
+        tensors.append(self.train_targets)
+        if isinstance(self.likelihood, FixedNoiseGaussianLikelihood):
+            tensors.append(self.likelihood.noise_covar.noise)
+        return _ModelState(
+            versions=[(t, (t._version, t.data_ptr())) for t in tensors],
+            parameter_values=[p.detach().clone() for p in self.parameters()],
+        )
+
+    def _state_changed(self, state: _ModelState) -> bool:
+        r"""Check whether the model was modified since taking a snapshot.
+
+        Args:
+            state: A _ModelState as returned by `_get_state`.
+
+        Returns:
+            True if the state of the model differs from `state`.
+        """
+        current = self._get_state()
+        return (
+            len(current.versions) != len(state.versions)
+            or any(
+                t is not t_s or v != v_s
+                for (t, v), (t_s, v_s) in zip(current.versions, state.versions)
+            )
+            or any(
+                not torch.equal(value, value_s)
+                for value, value_s in zip(
+                    current.parameter_values, state.parameter_values
+                )
+            )
+        )
+
 
 class BatchedMultiOutputGPyTorchModel(GPyTorchModel):
     r"""Base class for batched multi-output GPyTorch models with independent outputs.
@@ -71,6 +248,13 @@ class BatchedMultiOutputGPyTorchModel(GPyTorchModel):
     _num_outputs: int
     _input_batch_shape: torch.Size
     _aug_batch_shape: torch.Size
+    _prediction_cache: Optional[ExactPredictionCache] = None
+    _variance_root: Optional[Tensor] = None
+    _frozen_state: Optional[_ModelState] = None
+    _read_only: bool = False
+    # the caches built for evaluating the model in a thread pool, along with the
+    # state of the model they were built from (see `_get_pinned_caches`)
+    _thread_caches: Optional[Tuple[_ModelState, ExactPredictionCache, Tensor]] = None
 
     def _set_dimensions(self, train_X: Tensor, train_Y: Tensor) -> None:
         r"""Store the number of outputs and the batch shape.
@@ -117,42 +301,231 @@ class BatchedMultiOutputGPyTorchModel(GPyTorchModel):
             A `GPyTorchPosterior` object, representing `batch_shape` joint
             distributions over `q` points and the outputs selected by
             `output_indices` each. Includes observation noise if
-            `observation_noise=True`.
+            `observation_noise=True`. For multi-output models, this is an
+            `IndependentOutputPosterior` that keeps the outputs in a batch
+            dimension, so that sampling only requires the `q x q` covariance roots
+            of the selected outputs.
         """
-        self.eval()  # make sure model is in eval mode
+        if self._read_only and not self.is_frozen:
+            with _READ_ONLY_LOCK:
+                # `freeze` marks the model as frozen only after building the caches
+                if not self.is_frozen:
+                    self.freeze()
+        # insert a dimension for the output dimension
+        if self._num_outputs > 1:
+            X, output_dim_idx = add_output_dim(
+                X=X, original_batch_shape=self._input_batch_shape
+            )
         detach_test_caches = kwargs.get("detach_test_caches", True)
-        with ExitStack() as es:
-            es.enter_context(settings.debug(False))
-            es.enter_context(settings.fast_pred_var())
-            es.enter_context(settings.detach_test_caches(detach_test_caches))
-            # insert a dimension for the output dimension
-            if self._num_outputs > 1:
-                X, output_dim_idx = add_output_dim(
-                    X=X, original_batch_shape=self._input_batch_shape
+        if self.is_frozen:
+            self._check_frozen()
+            if detach_test_caches:
+                mvn = predict_from_cache(
+                    cache=self._prediction_cache,
+                    model=self,
+                    X=X,
+                    variance_root=self._variance_root,
                 )
-            mvn = self(X)
-            mean_x = mvn.mean
-            covar_x = mvn.covariance_matrix
-            if self._num_outputs > 1:
-                output_indices = output_indices or range(self._num_outputs)
-                mvns = [
-                    MultivariateNormal(
-                        mean_x.select(dim=output_dim_idx, index=t),
-                        lazify(covar_x.select(dim=output_dim_idx, index=t)),
+            else:
+                # the pinned caches are detached, so gradients w.r.t. the training
+                # data require a (non-pinned) differentiable cache
+                mvn = predict_from_cache(
+                    cache=build_prediction_cache(model=self, detach=False),
+                    model=self,
+                    X=X,
+                )
+            if observation_noise:
+                mvn = self.likelihood(mvn, X)
+        else:
+            self.eval()  # make sure model is in eval mode
+            with ExitStack() as es:
+                es.enter_context(settings.debug(False))
+                es.enter_context(inference_settings(self.inference_settings))
+                es.enter_context(settings.detach_test_caches(detach_test_caches))
+                if self._prediction_cache is not None:
+                    mvn = predict_from_cache(
+                        cache=self._prediction_cache, model=self, X=X
                     )
-                    for t in output_indices
-                ]
-                mvn = MultitaskMultivariateNormal.from_independent_mvns(mvns=mvns)
+                else:
+                    mvn = self(X)
+                if observation_noise:
+                    # TODO: Allow passing in observation noise via kwarg
+                    mvn = self.likelihood(mvn, X)
+        if self._num_outputs > 1:
+            if output_indices is not None:
+                idcs = torch.tensor(output_indices, device=X.device)
+                covar_idcs = (slice(None),) * output_dim_idx + (idcs,)
+                mvn = MultivariateNormal(
+                    mvn.mean.index_select(output_dim_idx, idcs),
+                    mvn.lazy_covariance_matrix[covar_idcs],
+                )
+            return IndependentOutputPosterior(mvn=mvn, output_dim=output_dim_idx)
         return GPyTorchPosterior(mvn=mvn)
 
+    @property
+    def is_frozen(self) -> bool:
+        r"""Whether the model is frozen (see `freeze`)."""
+        return self._frozen_state is not None
+
+    def freeze(self) -> None:
+        r"""Freeze the model for low-latency posterior evaluations.
+
+        Puts the model into eval mode and precomputes the Cholesky factor of the
+        training covariance, `K^-1 (y - m)`, and the inverse Cholesky factor used
+        for computing posterior covariances. While the model is frozen, these
+        caches are pinned: `posterior` computes predictions directly from them
+        (without any gpytorch settings or prediction strategy overhead), and
+        raises a `BotorchError` if any parameter, buffer or the training data of
+        the model was modified since freezing. Call `unfreeze` before modifying
+        the model. If `detach_test_caches=False` is passed to `posterior`, a
+        differentiable (non-pinned) cache is computed on each call instead.
+
+        Example:
+            >>> model = SingleTaskGP(train_X, train_Y)
+            >>> fit_gpytorch_model(ExactMarginalLogLikelihood(model.likelihood, model))
+            >>> model.freeze()
+            >>> posterior = model.posterior(test_X)
+        """
+        if not isinstance(self, ExactGP):
+            raise UnsupportedError("Only exact GPs can be frozen.")
+        self.eval()
+        cache = build_prediction_cache(model=self)
+        with torch.no_grad():
+            self._variance_root = get_variance_root(cache)
+        self._prediction_cache = cache
+        self._frozen_state = self._get_state()
+
+    def unfreeze(self) -> None:
+        r"""Unfreeze a frozen model, allowing it to be modified again.
+
+        This also clears the prediction cache, which is rebuilt by gpytorch on the
+        next posterior call.
+        """
+        self._prediction_cache = None
+        self._variance_root = None
+        self._frozen_state = None
+
+    def set_read_only(self, read_only: bool = True) -> None:
+        r"""Put the model into (or take it out of) thread-safe read-only mode.
+
+        In read-only mode, the model is frozen (see `freeze`) upon the first call
+        to `posterior`, with the caches being built exactly once under a lock.
+        Subsequent `posterior` calls do not mutate the model (or any global
+        gpytorch settings), so that they can be evaluated concurrently from
+        multiple threads. Leaving read-only mode unfreezes the model.
+
+        Args:
+            read_only: If True, enter read-only mode, otherwise leave it.
+
+        Example:
+            >>> model.set_read_only()
+            >>> with ThreadPoolExecutor() as executor:
+            >>>     posteriors = list(executor.map(model.posterior, test_Xs))
+        """
+        if read_only and not isinstance(self, ExactGP):
+            raise UnsupportedError("Only exact GPs support read-only mode.")
+        with _READ_ONLY_LOCK:
+            self._read_only = read_only
+            if not read_only and self.is_frozen:
+                self.unfreeze()
+
+    def _check_frozen(self) -> None:
+        r"""Raise an error if a frozen model was modified since freezing."""
+        if self._state_changed(self._frozen_state):
+            raise BotorchError(
+                "The parameters and training data of a frozen model must not be "
+                "modified. Call `unfreeze` before modifying the model."
+            )
+
+    def condition_on_observations(
+        self, X: Tensor, Y: Tensor, noise: Optional[Tensor] = None
+    ) -> None:
+        r"""Condition the model on new observations (in-place).
+
+        Adds the observations to the training data of the model, keeping the
+        hyperparameters fixed. Instead of recomputing the factorization of the
+        training covariance on the next posterior call, the cached Cholesky
+        factor and `K^-1 (y - m)` are updated with a rank-`k` extension in
+        `O(n^2 k)` operations. The cache is used by `posterior` until the model
+        is put back into train mode (e.g. for refitting the hyperparameters).
+
+        Args:
+            X: A `(batch_shape) x k x d` tensor of new inputs, where
+                `batch_shape` is the batch shape of the training inputs.
+            Y: A `(batch_shape) x k x (o)` tensor of new observations.
+            noise: A `(batch_shape) x k x (o)` tensor of observation noise levels
+                of the new observations. Required for models with fixed noise
+                levels (e.g. `FixedNoiseGP`), and ignored otherwise.
+
+        Example:
+            >>> model = SingleTaskGP(train_X, train_Y)
+            >>> fit_gpytorch_model(ExactMarginalLogLikelihood(model.likelihood, model))
+            >>> model.condition_on_observations(new_X, new_Y)
+            >>> posterior = model.posterior(test_X)
+        """
+        if not isinstance(self, ExactGP):
+            raise UnsupportedError(
+                "condition_on_observations is only supported for exact GPs."
+            )
+        if self.is_frozen:
+            raise BotorchError("Cannot condition a frozen model on observations.")
+        fixed_noise = isinstance(self.likelihood, FixedNoiseGaussianLikelihood)
+        if fixed_noise and noise is None:
+            raise ValueError(
+                "noise must be provided for models with fixed noise levels."
+            )
+        X, Y, noise = multioutput_to_batch_mode_transform(
+            train_X=X,
+            train_Y=Y,
+            num_outputs=self._num_outputs,
+            train_Yvar=noise if fixed_noise else None,
+        )
+        self.eval()
+        if self._prediction_cache is None:
+            self._prediction_cache = build_prediction_cache(model=self)
+        cache = extend_prediction_cache(
+            cache=self._prediction_cache, model=self, X=X, Y=Y, noise=noise
+        )
+        # update the model's training data (this also resets gpytorch's own
+        # prediction caches, which are not used while the cache is set)
+        self.set_train_data(
+            inputs=cache.train_inputs, targets=cache.train_targets, strict=False
+        )
+        if fixed_noise:
+            noise_covar = self.likelihood.noise_covar
+            noise_covar.noise = torch.cat([noise_covar.noise, noise], dim=-1)
+        self._prediction_cache = cache
+
+    def train(self, mode: bool = True) -> "BatchedMultiOutputGPyTorchModel":
+        r"""Set the train mode. Entering train mode clears the prediction cache."""
+        if mode:
+            if self.is_frozen:
+                raise BotorchError("Cannot put a frozen model into train mode.")
+            self._prediction_cache = None
+            self._thread_caches = None
+        return super().train(mode)
+
 
 class ModelListGPyTorchModel(GPyTorchModel, ABC):
     r"""Abstract base class for models based on multi-output GPyTorch models.
 
     This is meant to be used with a gpytorch ModelList wrapper for independent
-    evaluation of submodels.
+    evaluation of submodels. If `_num_threads > 1` and all evaluated submodels
+    are single-output exact GPs (see `BatchedMultiOutputGPyTorchModel`), the
+    submodels are evaluated concurrently in a thread pool (torch releases the
+    GIL in its operations).
+
+    gpytorch stores its settings globally and toggles some of them internally
+    (e.g. when evaluating lazily evaluated kernels), which races across
+    threads. The settings are therefore resolved once in the calling thread,
+    and the worker threads compute the posteriors directly from the prediction
+    caches of the submodels (see `predict_from_cache`), which only read the
+    settings. The caches are built on each call unless the submodels are
+    frozen (see `BatchedMultiOutputGPyTorchModel.freeze`).
     """
 
+    _num_threads: int = 1
+
     @abstractproperty
     def num_outputs(self) -> int:
         r"""The number of outputs of the model."""
@@ -186,26 +559,73 @@ class ModelListGPyTorchModel(GPyTorchModel, ABC):
             A `GPyTorchPosterior` object, representing `batch_shape` joint
             distributions over `q` points and the outputs selected by
             `output_indices` each. Includes measurement noise if
-            `observation_noise=True`.
+            `observation_noise=True`. Gradients w.r.t. `X` are propagated from
+            all submodels, also if they are evaluated in parallel.
         """
         detach_test_caches = kwargs.get("detach_test_caches", True)
+        if output_indices is None:
+            output_indices = list(range(self.num_outputs))
+        args = (X,) if torch.is_tensor(X) else X
+        grad_enabled = torch.is_grad_enabled()
+
+        def evaluate(i: int) -> MultivariateNormal:
+            # sub-models are evaluated with their own inference settings
+            config = getattr(self.models[i], "inference_settings", None)
+            with inference_settings(config or self.inference_settings):
+                mvn = self.models[i](*args)
+                if observation_noise:
+                    # TODO: Allow passing in observation noise via kwarg
+                    mvn = self.likelihood_i(i, mvn, *args)
+            return mvn
+
+        def evaluate_from_cache(
+            i: int,
+            cache: Optional[ExactPredictionCache],
+            variance_root: Optional[Tensor],
+        ) -> MultivariateNormal:
+            model = self.models[i]
+            # grad mode is thread-local, so it needs to be set in worker threads
+            with torch.set_grad_enabled(grad_enabled):
+                if cache is None:
+                    cache = build_prediction_cache(
+                        model=model, detach=detach_test_caches
+                    )
+                mvn = predict_from_cache(
+                    cache=cache, model=model, X=X, variance_root=variance_root
+                )
+                if observation_noise:
+                    mvn = model.likelihood(mvn, X)
+            return mvn
+
         self.eval()  # make sure model is in eval mode
+        num_threads = min(self._num_threads, len(output_indices))
+        parallel = (
+            num_threads > 1
+            and torch.is_tensor(X)
+            and all(_supports_concurrency(self.models[i]) for i in output_indices)
+        )
         with ExitStack() as es:
             es.enter_context(settings.debug(False))
-            es.enter_context(settings.fast_pred_var())
             es.enter_context(settings.detach_test_caches(detach_test_caches))
-            if output_indices is not None:
-                mvns = [self.forward_i(i, X) for i in output_indices]
-                if observation_noise:
-                    mvns = [
-                        self.likelihood_i(i, mvn, X)
-                        for i, mvn in zip(output_indices, mvns)
-                    ]
+            if parallel:
+                # evaluate kernels eagerly, so that gpytorch does not toggle the
+                # global settings in the worker threads
+                es.enter_context(settings.lazily_evaluate_kernels(False))
+                caches, variance_roots = [], []
+                for i in output_indices:
+                    cache, variance_root = _get_pinned_caches(
+                        self.models[i], detach_test_caches=detach_test_caches
+                    )
+                    caches.append(cache)
+                    variance_roots.append(variance_root)
+                with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                    mvns = list(
+                        executor.map(
+                            evaluate_from_cache, output_indices, caches, variance_roots
+                        )
+                    )
             else:
-                mvns = self(*[X for _ in range(self.num_outputs)])
-                if observation_noise:
-                    # TODO: Allow passing in observation noise via kwarg
-                    mvns = self.likelihood(*[(mvn, X) for mvn in mvns])
+                mvns = [evaluate(i) for i in output_indices]
         if len(mvns) == 1:
             return GPyTorchPosterior(mvn=mvns[0])
         else:
@@ -218,9 +638,13 @@ class MultiTaskGPyTorchModel(GPyTorchModel, ABC):
     r"""Abstract base class for multi-task models baed on GPyTorch models.
 
     This class provides the `posterior` method to models that implement a
-    "long-format" multi-task GP in the style of `MultiTaskGP`.
+    "long-format" multi-task exact GP with an ICM kernel in the style of
+    `MultiTaskGP`, i.e. models with a `mean_module`, a data kernel `covar_module`,
+    an `IndexKernel` `task_covar_module`, and a `_split_inputs` method.
     """
 
+    _prediction_cache: Optional[Tuple[_ModelState, ExactPredictionCache]] = None
+
     def posterior(
         self,
         X: Tensor,
@@ -230,6 +654,13 @@ class MultiTaskGPyTorchModel(GPyTorchModel, ABC):
     ) -> GPyTorchPosterior:
         r"""Computes the posterior over model outputs at the provided points.
 
+        Rather than evaluating the model on a copy of `X` for each output task,
+        the data kernel is evaluated once on `X` (and against the training
+        inputs), and combined with the task covariance structurally. The
+        factorization of the training covariance is cached until the model is
+        put back into train mode or its parameters, buffers or training data are
+        modified.
+
         Args:
             X: A `q x d` or `batch_shape x q x d` (batch mode) tensor, where `d` is the
                 dimension of the feature space (not including task indices) and
@@ -256,26 +687,135 @@ class MultiTaskGPyTorchModel(GPyTorchModel, ABC):
         if any(i not in self._output_tasks for i in output_indices):
             raise ValueError("Too many output indices")
 
-        # construct evaluation X
-        X_full = _make_X_full(X=X, output_indices=output_indices, tf=self._task_feature)
-
         self.eval()  # make sure model is in eval mode
         detach_test_caches = kwargs.get("detach_test_caches", True)
-        with ExitStack() as es:
-            es.enter_context(settings.debug(False))
-            es.enter_context(settings.fast_pred_var())
-            es.enter_context(settings.detach_test_caches(detach_test_caches))
-            mvn = self(X_full)
+        if not detach_test_caches:
+            cache = build_prediction_cache(model=self, detach=False)
+        else:
+            if self._prediction_cache is None or self._state_changed(
+                self._prediction_cache[0]
+            ):
+                self._prediction_cache = (
+                    self._get_state(),
+                    build_prediction_cache(model=self),
+                )
+            cache = self._prediction_cache[1]
+        with settings.debug(False):
+            mvn = self._structured_posterior(
+                X=X, output_indices=output_indices, cache=cache
+            )
             if observation_noise:
                 # TODO: Allow passing in observation noise via kwarg
+                X_full = _make_X_full(
+                    X=X, output_indices=output_indices, tf=self._task_feature
+                )
                 mvn = self.likelihood(mvn, X_full)
         # If single-output, return the posterior of a single-output model
         if len(output_indices) == 1:
             return GPyTorchPosterior(mvn=mvn)
         # Otherwise, make a MultitaskMultivariateNormal out of this
         mtmvn = MultitaskMultivariateNormal(
-            mean=mvn.mean.view(*X.shape[:-1], len(output_indices)),
+            mean=mvn.mean.view(*X.shape[:-2], len(output_indices), -1).transpose(
+                -1, -2
+            ),
             covariance_matrix=mvn.lazy_covariance_matrix,
             interleaved=False,
         )
         return GPyTorchPosterior(mvn=mtmvn)
+
+    def train(self, mode: bool = True) -> "MultiTaskGPyTorchModel":
+        r"""Set the train mode. Entering train mode clears the prediction cache."""
+        if mode:
+            self._prediction_cache = None
+        return super().train(mode)
+
+    def _structured_posterior(
+        self, X: Tensor, output_indices: List[int], cache: ExactPredictionCache
+    ) -> MultivariateNormal:
+        r"""Compute the posterior of the ICM model from a single data kernel call.
+
+        With the ICM kernel `k((x, i), (x', j)) = k(x, x') B_ij`, the covariance
+        between the test points for task `i` and the training data is
+        `K(X, X_train) * B[i, train_tasks]`, and the prior covariance of the test
+        points for all tasks is `B_oo x K(X, X)`. Both are computed from a single
+        evaluation of the data kernel.
+
+        Args:
+            X: A `(batch_shape) x q x d` tensor of test points (without task
+                features).
+            output_indices: The `o` tasks to compute the posterior for.
+            cache: The ExactPredictionCache of the model.
+
+        Returns:
+            The `(batch_shape)` MultivariateNormal over the `o * q` test points in
+            task-major order (without observation noise).
+        """
+        x_train, task_idcs = self._split_inputs(cache.train_inputs)
+        B = self.task_covar_module.covar_matrix.evaluate()
+        out_idcs = torch.tensor(output_indices, device=X.device)
+        B_out = B.index_select(-2, out_idcs)
+        B_out_train = B_out.index_select(-1, task_idcs.view(-1))
+        B_oo = B_out.index_select(-1, out_idcs)
+        K_xt = lazify(self.covar_module(X, x_train)).evaluate()
+        K_xx = lazify(self.covar_module(X)).evaluate()
+        # `(batch_shape) x o x q x n` covariance of test and training points
+        K_cross = K_xt.unsqueeze(-3) * B_out_train.unsqueeze(-2)
+        mean = self.mean_module(X).unsqueeze(-2) + K_cross.matmul(
+            cache.alpha.unsqueeze(-1)
+        ).squeeze(-1)
+        K_cross = K_cross.reshape(*K_cross.shape[:-3], -1, K_cross.size(-1))
+        L = cache.L.expand(K_cross.shape[:-2] + cache.L.shape[-2:])
+        V = torch.triangular_solve(K_cross.transpose(-1, -2), L, upper=False)[0]
+        # `(batch_shape) x o x q x o x q` prior covariance `B_oo x K(X, X)`
+        prior_covar = B_oo[..., :, None, :, None] * K_xx[..., None, :, None, :]
+        prior_covar = prior_covar.reshape(*V.shape[:-2], V.size(-1), V.size(-1))
+        covar = prior_covar - V.transpose(-1, -2).matmul(V)
+        return MultivariateNormal(mean.reshape(*V.shape[:-2], -1), lazify(covar))
+
+
+def _iter_tiles(
+    X: Union[Tensor, np.ndarray, Iterable[Union[Tensor, np.ndarray]]], tile_size: int
+) -> Iterator[Union[Tensor, np.ndarray]]:
+    r"""Split a tensor, array, or iterable of tiles into tiles of bounded size."""
+    chunks = [X] if isinstance(X, (Tensor, np.ndarray)) else X
+    for chunk in chunks:
+        for start in range(0, chunk.shape[0], tile_size):
+            yield chunk[start : start + tile_size]
+
+
+def _supports_concurrency(model: Model) -> bool:
+    r"""Whether a model can be evaluated from its prediction cache in a thread."""
+    return (
+        isinstance(model, BatchedMultiOutputGPyTorchModel)
+        and isinstance(model, ExactGP)
+        and model._num_outputs == 1
+        and hasattr(model, "mean_module")
+        and hasattr(model, "covar_module")
+    )
+
+
+def _get_pinned_caches(
+    model: BatchedMultiOutputGPyTorchModel, detach_test_caches: bool
+) -> Tuple[Optional[ExactPredictionCache], Optional[Tensor]]:
+    r"""Get the prediction cache (and variance root) to evaluate a model from.
+
+    Uses the pinned caches of frozen models and the cache of models conditioned
+    on observations. Otherwise, the cache and variance root are built from the
+    training data and stored on the model until it is put into train mode or
+    its state changes (see `_get_state`), so that the `O(n^3)` factorization is
+    not repeated in each `posterior` call. Returns `(None, None)` if the
+    detached caches cannot be used, in which case a differentiable cache needs
+    to be built.
+    """
+    if model.is_frozen:
+        model._check_frozen()
+    if not detach_test_caches:
+        return None, None
+    if model._prediction_cache is not None:
+        return model._prediction_cache, model._variance_root
+    if model._thread_caches is None or model._state_changed(model._thread_caches[0]):
+        with torch.no_grad():
+            cache = build_prediction_cache(model=model)
+            variance_root = get_variance_root(cache)
+        model._thread_caches = (model._get_state(), cache, variance_root)
+    return model._thread_caches[1:]
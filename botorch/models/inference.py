@@ -0,0 +1,91 @@
+#! /usr/bin/env python3
+
+r"""
+Per-model settings for the linear algebra used in GP inference.
+"""
+
+import math
+from contextlib import ExitStack, contextmanager
+from typing import Generator, NamedTuple, Optional
+
+from gpytorch import settings
+
+
+SOLVERS = ("auto", "cholesky", "cg")
+
+
+class InferenceSettings(NamedTuple):
+    r"""Settings for the linear algebra used in GP inference.
+
+    GPyTorch either computes solves and log determinants with the (training)
+    covariance using a dense Cholesky decomposition, or using preconditioned
+    conjugate gradients (CG) and stochastic Lanczos quadrature, which only
+    require matrix-vector multiplications and are faster for large `n`.
+
+    Fields set to None leave the corresponding GPyTorch setting unchanged (i.e.
+    apply GPyTorch's defaults or any settings entered by the caller). By default,
+    only `max_cholesky_size` and `fast_pred_var` are set.
+
+    - solver: "cholesky" (always use a Cholesky decomposition), "cg" (always use
+      CG), or "auto" (use a Cholesky decomposition for covariance matrices of
+      size at most `max_cholesky_size`, and CG otherwise).
+    - max_cholesky_size: The largest size of a covariance matrix for which a
+      Cholesky decomposition is used with the "auto" solver (or if no solver is
+      set). The default is the crossover point of the fitting step on CPU in
+      `scripts/benchmark_inference.py`.
+    - preconditioner_rank: The rank of the pivoted Cholesky preconditioner of
+      CG (0 disables preconditioning).
+    - cg_tolerance: The residual tolerance of CG solves during training.
+    - eval_cg_tolerance: The residual tolerance of CG solves for posteriors.
+    - max_cg_iterations: The maximum number of CG iterations.
+    - fast_pred_var: If True (the default), compute posterior (co)variances
+      using Lanczos variance estimates (LOVE), which are cached across posterior
+      calls. Otherwise, the training covariance is factorized for each batch of
+      test points.
+    """
+
+    solver: Optional[str] = None
+    max_cholesky_size: Optional[int] = 384
+    preconditioner_rank: Optional[int] = None
+    cg_tolerance: Optional[float] = None
+    eval_cg_tolerance: Optional[float] = None
+    max_cg_iterations: Optional[int] = None
+    fast_pred_var: Optional[bool] = True
+
+
+@contextmanager
+def inference_settings(config: InferenceSettings) -> Generator[None, None, None]:
+    r"""Contextmanager applying InferenceSettings via the GPyTorch settings.
+
+    Args:
+        config: The InferenceSettings to apply.
+
+    Returns:
+        Generator
+
+    Example:
+        >>> config = InferenceSettings(solver="cg", preconditioner_rank=20)
+        >>> with inference_settings(config):
+        >>>     mll(model(*model.train_inputs), model.train_targets)
+    """
+    if config.solver is not None and config.solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {config.solver}.")
+    if config.solver == "cholesky":
+        max_cholesky_size = math.inf
+    elif config.solver == "cg":
+        max_cholesky_size = 0
+    else:
+        max_cholesky_size = config.max_cholesky_size
+    values = [
+        (settings.max_cholesky_size, max_cholesky_size),
+        (settings.max_preconditioner_size, config.preconditioner_rank),
+        (settings.cg_tolerance, config.cg_tolerance),
+        (settings.eval_cg_tolerance, config.eval_cg_tolerance),
+        (settings.max_cg_iterations, config.max_cg_iterations),
+        (settings.fast_pred_var, config.fast_pred_var),
+    ]
+    with ExitStack() as es:
+        for setting, value in values:
+            if value is not None:
+                es.enter_context(setting(value))
+        yield
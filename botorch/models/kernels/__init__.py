@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+
+from .cached_matern import CachedDistanceMaternKernel
+from .mixed_matern import MixedMaternKernel
+
+
+__all__ = ["CachedDistanceMaternKernel", "MixedMaternKernel"]
@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+
+r"""
+Matern kernel with a separate smoothness parameter for each batch.
+"""
+
+import math
+from typing import Optional
+
+import torch
+from gpytorch.kernels.kernel import Kernel
+from gpytorch.priors.prior import Prior
+from torch import Tensor
+
+
+SUPPORTED_NU = (0.5, 1.5, 2.5, math.inf)
+
+
+class MixedMaternKernel(Kernel):
+    r"""A batched Matern kernel with a separate smoothness parameter per batch.
+
+    This kernel allows stacking Matern kernels of different smoothness (as well
+    as RBF kernels, which correspond to the limit `nu -> inf`) in the batch
+    dimension of a single kernel. This makes it possible to fit models with
+    different kernel families jointly as a single batched model.
+
+    The smoothness parameters are fixed (they are registered as a buffer, not as
+    a parameter).
+    """
+
+    def __init__(
+        self,
+        nu: Tensor,
+        ard_num_dims: Optional[int] = None,
+        batch_shape: torch.Size = torch.Size([]),
+        lengthscale_prior: Optional[Prior] = None,
+        **kwargs,
+    ) -> None:
+        r"""A batched Matern kernel with a separate smoothness parameter per batch.
+
+        Args:
+            nu: A Tensor of smoothness parameters that is broadcastable to
+                `batch_shape`. Each element must be one of 0.5, 1.5, 2.5 or
+                `math.inf` (RBF kernel).
+            ard_num_dims: The number of lengthscales (one per input dimension
+                for ARD). If omitted, use a single lengthscale.
+            batch_shape: The batch shape of the kernel.
+            lengthscale_prior: A prior on the lengthscale.
+
+        Example:
+            >>> nu = torch.tensor([0.5, 1.5, 2.5, math.inf])
+            >>> covar_module = MixedMaternKernel(nu=nu, batch_shape=torch.Size([4]))
+            >>> covar = covar_module(torch.rand(4, 10, 2))  # 4 x 10 x 10
+        """
+        if not all(v in SUPPORTED_NU for v in nu.view(-1).tolist()):
+            raise ValueError(f"All elements of nu must be in {SUPPORTED_NU}.")
+        super().__init__(
+            has_lengthscale=True,
+            ard_num_dims=ard_num_dims,
+            batch_shape=batch_shape,
+            lengthscale_prior=lengthscale_prior,
+            **kwargs,
+        )
+        self.register_buffer("nu", nu.to(dtype=torch.float))
+
+    def forward(self, x1: Tensor, x2: Tensor, diag: bool = False, **params) -> Tensor:
+        mean = x1.contiguous().view(-1, x1.size(-1)).mean(0)[(None,) * (x1.dim() - 1)]
+        x1_ = (x1 - mean).div(self.lengthscale)
+        x2_ = (x2 - mean).div(self.lengthscale)
+        distance = self.covar_dist(x1_, x2_, diag=diag, **params)
+        # align the smoothness parameters with the batch dimensions of distance
+        nu = self.nu.view(self.nu.shape + torch.Size([1] * (1 if diag else 2)))
+        res = torch.zeros_like(distance)
+        for nu_val in self.nu.unique().tolist():
+            if nu_val == math.inf:
+                component = torch.exp(-0.5 * distance ** 2)
+            else:
+                exp_component = torch.exp(-math.sqrt(nu_val * 2) * distance)
+                if nu_val == 0.5:
+                    constant_component = 1
+                elif nu_val == 1.5:
+                    constant_component = (math.sqrt(3) * distance).add(1)
+                else:
+                    constant_component = (
+                        (math.sqrt(5) * distance).add(1).add(5.0 / 3.0 * distance ** 2)
+                    )
+                component = constant_component * exp_component
+            res = torch.where(nu == nu_val, component, res)
+        return res
@@ -0,0 +1,165 @@
+#! /usr/bin/env python3
+
+r"""
+Structured kernel interpolation (KISS-GP) models for large low-dimensional data.
+"""
+
+from typing import Optional, Tuple
+
+import torch
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.kernels.grid_interpolation_kernel import GridInterpolationKernel
+from gpytorch.kernels.matern_kernel import MaternKernel
+from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.likelihoods.gaussian_likelihood import FixedNoiseGaussianLikelihood
+from gpytorch.likelihoods.likelihood import Likelihood
+from gpytorch.models.exact_prediction_strategies import InterpolatedPredictionStrategy
+from gpytorch.priors.torch_priors import GammaPrior
+from gpytorch.utils.grid import choose_grid_size
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from .gp_regression import SingleTaskGP
+
+
+MIN_GRID_SIZE = 10
+# number of grid cells by which the default grid extends beyond the training data
+GRID_PADDING = 3
+
+
+class SingleTaskKISSGP(SingleTaskGP):
+    r"""A single-task GP using structured kernel interpolation (KISS-GP).
+
+    The kernel between the data points is interpolated (using local cubic
+    interpolation) from the kernel on a regular grid of inducing points
+    spanning `grid_bounds` (Wilson & Nickisch, 2015). The grid covariance is a
+    Kronecker product of one-dimensional Toeplitz matrices, so that kernel
+    matrix-vector multiplications cost `O(n + m log m)` for `m` grid points.
+    The marginal log likelihood is computed using conjugate gradients and
+    stochastic Lanczos quadrature (once `n` exceeds gpytorch's
+    `max_cholesky_size`), so this model is trained with `fit_gpytorch_torch`.
+    Posterior means and (LOVE) variances are computed from caches on the grid,
+    so that each posterior call costs `O(n)` (for interpolating the training
+    inputs) rather than `O(n^2)`.
+
+    The number of grid points grows exponentially in the dimension, so this
+    model is intended for `d <= 4`. The kernel is a scaled product of
+    one-dimensional Matern kernels (with the same priors as `SingleTaskGP`),
+    which is what provides the Kronecker structure. This model only supports
+    non-batched, single-output training data, and all inputs (including the
+    test points of the posterior) must lie within the grid bounds.
+    """
+
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        grid_size: Optional[int] = None,
+        grid_bounds: Optional[Tensor] = None,
+        likelihood: Optional[Likelihood] = None,
+    ) -> None:
+        r"""A single-task GP using structured kernel interpolation (KISS-GP).
+
+        Args:
+            train_X: A `n x d` tensor of training features.
+            train_Y: A `n x (1)` tensor of training observations.
+            grid_size: The number of grid points per dimension. If omitted, use
+                `n^(1/d)` grid points per dimension (and at least 10).
+            grid_bounds: A `2 x d` tensor of lower and upper bounds of the grid.
+                If omitted, the grid spans the range of the training features,
+                padded by `GRID_PADDING` grid cells on either side. Use the
+                bounds of the acquisition function optimization to be able to
+                evaluate the posterior across the whole domain.
+            likelihood: A likelihood. If omitted, use a standard
+                GaussianLikelihood with inferred noise level.
+
+        Example:
+            >>> model = SingleTaskKISSGP(train_X, train_Y, grid_bounds=bounds)
+            >>> mll = ExactMarginalLogLikelihood(model.likelihood, model)
+            >>> fit_gpytorch_model(mll, optimizer=fit_gpytorch_torch)
+        """
+        if train_X.dim() != 2:
+            raise UnsupportedError(
+                "SingleTaskKISSGP requires `n x d`-dim training data."
+            )
+        if train_Y.dim() > 1 and train_Y.shape[-1] > 1:
+            raise UnsupportedError("SingleTaskKISSGP only supports a single output.")
+        super().__init__(train_X=train_X, train_Y=train_Y, likelihood=likelihood)
+        if grid_size is None:
+            grid_size = max(choose_grid_size(train_X), MIN_GRID_SIZE)
+        if grid_bounds is None:
+            lower, upper = train_X.min(dim=0)[0], train_X.max(dim=0)[0]
+            padding = GRID_PADDING * (upper - lower) / (grid_size - 2 * GRID_PADDING)
+            grid_bounds = torch.stack([lower - padding, upper + padding])
+        d = train_X.shape[-1]
+        # gpytorch only uses the interpolated prediction strategy (with caches on
+        # the grid) if the grid kernel is the outermost kernel, so the scale
+        # kernel delegates to the prediction strategy of the grid kernel
+        self.covar_module = _GridScaleKernel(
+            GridInterpolationKernel(
+                MaternKernel(
+                    nu=2.5, ard_num_dims=d, lengthscale_prior=GammaPrior(3.0, 6.0)
+                ),
+                grid_size=grid_size,
+                num_dims=d,
+                grid_bounds=tuple(
+                    zip(grid_bounds[0].tolist(), grid_bounds[1].tolist())
+                ),
+            ),
+            outputscale_prior=GammaPrior(2.0, 0.15),
+        )
+        self.to(train_X)
+
+    def freeze(self) -> None:
+        r"""Not supported, since freezing requires dense `O(n^2)` caches."""
+        raise UnsupportedError("SingleTaskKISSGP models cannot be frozen.")
+
+    def condition_on_observations(
+        self, X: Tensor, Y: Tensor, noise: Optional[Tensor] = None
+    ) -> None:
+        r"""Condition the model on new observations (in-place).
+
+        Adds the observations to the training data of the model, keeping the
+        hyperparameters fixed. The caches on the grid are recomputed in `O(n)`
+        on the next posterior call.
+
+        Args:
+            X: A `k x d` tensor of new inputs (within the grid bounds).
+            Y: A `k x (1)` tensor of new observations.
+            noise: Not supported (models with fixed noise levels cannot be
+                conditioned).
+        """
+        if noise is not None or isinstance(
+            self.likelihood, FixedNoiseGaussianLikelihood
+        ):
+            raise UnsupportedError(
+                "SingleTaskKISSGP does not support conditioning with fixed noise."
+            )
+        grid_bounds = torch.tensor(
+            self.covar_module.base_kernel.grid_bounds, dtype=X.dtype, device=X.device
+        ).t()
+        if (X < grid_bounds[0]).any() or (X > grid_bounds[1]).any():
+            raise ValueError("The new inputs must lie within the grid bounds.")
+        train_X = torch.cat([self.train_inputs[0], X], dim=-2)
+        train_Y = torch.cat([self.train_targets, Y.view(-1)], dim=-1)
+        self.set_train_data(inputs=train_X, targets=train_Y, strict=False)
+
+
+class _GridScaleKernel(ScaleKernel):
+    r"""A ScaleKernel using the prediction strategy of its (grid) base kernel.
+
+    Scaling an interpolated kernel matrix preserves its interpolation
+    structure, so the interpolated prediction strategy of the grid kernel also
+    applies to the scaled kernel.
+    """
+
+    def prediction_strategy(
+        self,
+        train_inputs: Tuple[Tensor, ...],
+        train_prior_dist: MultivariateNormal,
+        train_labels: Tensor,
+        likelihood: Likelihood,
+    ) -> InterpolatedPredictionStrategy:
+        return self.base_kernel.prediction_strategy(
+            train_inputs, train_prior_dist, train_labels, likelihood
+        )
@@ -4,11 +4,21 @@ r"""
 Model List GP Regression models.
 """
 
-from typing import List
+from typing import Any, List, Optional, Tuple
 
+import torch
 from gpytorch.models import IndependentModelList
+from torch import Tensor
 
-from .gpytorch import GPyTorchModel, ModelListGPyTorchModel
+from ..exceptions.errors import UnsupportedError
+from ..posteriors.gpytorch import GPyTorchPosterior
+from .gpytorch import (
+    BatchedMultiOutputGPyTorchModel,
+    GPyTorchModel,
+    ModelListGPyTorchModel,
+    _ModelState,
+)
+from .inference import InferenceSettings
 
 
 class ModelListGP(IndependentModelList, ModelListGPyTorchModel):
@@ -22,18 +32,112 @@ class ModelListGP(IndependentModelList, ModelListGPyTorchModel):
     very flexible and convenient to work with. The sequential evaluation comes
     at a performance cost though - if you are using a block design (i.e. the
     same number of training example for each output, and a similar model
-    structure, you should consider using a batched GP model instead).
+    structure, you should consider using a batched GP model instead). Setting
+    `num_threads > 1` evaluates the sub-models in parallel in `posterior`.
+
+    If all sub-models are single-output `SingleTaskGP`s (or `FixedNoiseGP`s) of
+    the same structure that share their training inputs, `posterior` packs them
+    into a batched multi-output model (see `model_list_to_batched`), so that the
+    kernels of all outputs are evaluated in a single batched kernel call. The
+    batched model is cached until the parameters, the training data or the
+    inference settings of any sub-model change.
     """
 
-    def __init__(self, gp_models: List[GPyTorchModel]) -> None:
+    _batched_model: Optional[
+        Tuple[
+            List[_ModelState],
+            List[InferenceSettings],
+            Optional[BatchedMultiOutputGPyTorchModel],
+        ]
+    ] = None
+
+    def __init__(self, gp_models: List[GPyTorchModel], num_threads: int = 1) -> None:
         r"""A multi-output GP model with independent GPs for the outputs.
 
         Args:
             gp_models: A list of single-output BoTorch models.
+            num_threads: The maximum number of threads used for evaluating the
+                sub-models concurrently in `posterior`. If 1, the sub-models
+                are evaluated sequentially.
 
         Example:
             >>> model1 = SingleTaskGP(train_X1, train_Y1)
             >>> model2 = SingleTaskGP(train_X2, train_Y2)
-            >>> model = ModelListGP([model1, model2])
+            >>> model = ModelListGP([model1, model2], num_threads=2)
         """
+        if num_threads < 1:
+            raise ValueError("num_threads must be positive.")
         super().__init__(*gp_models)
+        self._num_threads = num_threads
+
+    def posterior(
+        self,
+        X: Tensor,
+        output_indices: Optional[List[int]] = None,
+        observation_noise: bool = False,
+        **kwargs: Any,
+    ) -> GPyTorchPosterior:
+        r"""Computes the posterior over model outputs at the provided points.
+
+        Args:
+            X: A `b x q x d`-dim Tensor, where `d` is the dimension of the
+                feature space, `q` is the number of points considered jointly,
+                and `b` is the batch dimension.
+            output_indices: A list of indices, corresponding to the outputs over
+                which to compute the posterior (if the model is multi-output).
+                Can be used to speed up computation if only a subset of the
+                model's outputs are required for optimization. If omitted,
+                computes the posterior over all model outputs.
+            observation_noise: If True, add observation noise to the posterior.
+            detach_test_caches: If True, detach GPyTorch test caches during
+                computation of the posterior. Required for being able to compute
+                derivatives with respect to training inputs at test time (used
+                e.g. by qNoisyExpectedImprovement).
+
+        Returns:
+            A `GPyTorchPosterior` object, representing `batch_shape` joint
+            distributions over `q` points and the outputs selected by
+            `output_indices` each. Includes measurement noise if
+            `observation_noise=True`.
+        """
+        batched_model = None
+        if torch.is_tensor(X) and kwargs.get("detach_test_caches", True):
+            batched_model = self._get_batched_model()
+        if batched_model is not None:
+            return batched_model.posterior(
+                X,
+                output_indices=output_indices,
+                observation_noise=observation_noise,
+                **kwargs,
+            )
+        return super().posterior(
+            X,
+            output_indices=output_indices,
+            observation_noise=observation_noise,
+            **kwargs,
+        )
+
+    def _get_batched_model(self) -> Optional[BatchedMultiOutputGPyTorchModel]:
+        r"""Get the (cached) batched equivalent of the model, if there is one."""
+        if self.num_outputs < 2 or not all(
+            isinstance(m, BatchedMultiOutputGPyTorchModel) for m in self.models
+        ):
+            return None
+        configs = [m.inference_settings for m in self.models]
+        if self._batched_model is not None:
+            cached_states, cached_configs, batched_model = self._batched_model
+            if configs == cached_configs and not any(
+                m._state_changed(state) for m, state in zip(self.models, cached_states)
+            ):
+                return batched_model
+        # avoid a circular import (the converter constructs `ModelListGP`s)
+        from .converter import model_list_to_batched
+
+        try:
+            batched_model = model_list_to_batched(self)
+        except UnsupportedError:
+            batched_model = None
+        # a tuple is not registered as a submodule (and its parameters)
+        states = [m._get_state() for m in self.models]
+        self._batched_model = (states, configs, batched_model)
+        return batched_model
@@ -0,0 +1,319 @@
+#! /usr/bin/env python3
+
+r"""
+Exact GP models with out-of-core (memory-mapped) inference for large datasets.
+"""
+
+import math
+from itertools import chain
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import torch
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.lazy import lazify
+from gpytorch.likelihoods.likelihood import Likelihood
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from ..posteriors.gpytorch import GPyTorchPosterior
+from ..utils.out_of_core import (
+    TiledLowerMatrix,
+    tiled_cholesky_,
+    tiled_logdet,
+    tiled_matrix,
+    tiled_triangular_solve,
+)
+from .gp_regression import SingleTaskGP
+
+
+class OutOfCoreFactorization(NamedTuple):
+    r"""The factorization of the training covariance of an out-of-core GP.
+
+    - L: The lower triangular Cholesky factor of the training covariance
+      (including observation noise), stored in a memory-mapped file.
+    - alpha: The `n`-dim tensor `K^-1 (y - m)`.
+    """
+
+    L: TiledLowerMatrix
+    alpha: Tensor
+
+
+class OutOfCoreSingleTaskGP(SingleTaskGP):
+    r"""A single-task exact GP with out-of-core (memory-mapped) inference.
+
+    Exact inference for `n` training points requires the `n x n` training
+    covariance and its Cholesky factor, which may not fit into memory (e.g.
+    `12.8 GB` for `n = 40000` in double precision). This model builds the
+    training covariance tile by tile into a memory-mapped file and factorizes
+    it in-place with a blocked Cholesky factorization (see
+    `botorch.utils.out_of_core`), so that only `O(n * tile_size)` elements are
+    held in memory at a time. The model and its priors are the same as those
+    of `SingleTaskGP`, and no approximations are made.
+
+    The hyperparameters are fit using the (exact) `OutOfCoreMarginalLogLikelihood`,
+    whose gradient is computed tile by tile. Each evaluation requires
+    `O(n^3)` operations, so a few dozen iterations of `fit_gpytorch_scipy` are
+    typically affordable. Posteriors are computed from the factorization using
+    blocked triangular solves, which read the factor from the file once per
+    posterior call. The factorization is recomputed whenever the
+    hyperparameters or the training data change.
+
+    This model only supports non-batched, single-output training data, and does
+    not support `freeze` and `condition_on_observations` (which require dense
+    caches). Its `inference_settings` are not used.
+    """
+
+    _factorization: Optional[Tuple[Any, OutOfCoreFactorization]] = None
+
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        tile_size: int = 2048,
+        directory: Optional[str] = None,
+        likelihood: Optional[Likelihood] = None,
+    ) -> None:
+        r"""A single-task exact GP with out-of-core (memory-mapped) inference.
+
+        Args:
+            train_X: A `n x d` tensor of training features.
+            train_Y: A `n x (1)` tensor of training observations.
+            tile_size: The size of the (square) tiles of the training covariance.
+                Larger tiles are more efficient, but require more memory.
+            directory: The directory of the memory-mapped files (which require
+                `4 n^2` bytes of disk space in double precision). If omitted,
+                use the default directory for temporary files.
+            likelihood: A likelihood. If omitted, use a standard
+                GaussianLikelihood with inferred noise level.
+
+        Example:
+            >>> model = OutOfCoreSingleTaskGP(train_X, train_Y, directory="/scratch")
+            >>> mll = OutOfCoreMarginalLogLikelihood(model.likelihood, model)
+            >>> fit_gpytorch_model(mll, options={"maxiter": 50})
+            >>> posterior = model.posterior(test_X)
+        """
+        if train_X.dim() != 2:
+            raise UnsupportedError(
+                "OutOfCoreSingleTaskGP requires `n x d`-dim training data."
+            )
+        if train_Y.dim() > 1 and train_Y.shape[-1] > 1:
+            raise UnsupportedError(
+                "OutOfCoreSingleTaskGP only supports a single output."
+            )
+        super().__init__(train_X=train_X, train_Y=train_Y, likelihood=likelihood)
+        self.tile_size = tile_size
+        self.directory = directory
+
+    def factorize(self) -> OutOfCoreFactorization:
+        r"""Compute (and cache) the factorization of the training covariance.
+
+        Returns:
+            The OutOfCoreFactorization of the current training covariance.
+        """
+        train_X = self.train_inputs[0]
+        with torch.no_grad():
+            L = tiled_matrix(
+                tile_fn=self._covar_tile,
+                n=train_X.size(-2),
+                tile_size=self.tile_size,
+                dtype=train_X.dtype,
+                directory=self.directory,
+            )
+            tiled_cholesky_(L, device=train_X.device)
+            residual = (self.train_targets - self.mean_module(train_X)).unsqueeze(-1)
+            alpha = tiled_triangular_solve(
+                L, tiled_triangular_solve(L, residual), transpose=True
+            ).squeeze(-1)
+        factorization = OutOfCoreFactorization(L=L, alpha=alpha)
+        self._factorization = (self._get_state(), factorization)
+        return factorization
+
+    def posterior(
+        self,
+        X: Tensor,
+        output_indices: Optional[List[int]] = None,
+        observation_noise: bool = False,
+        **kwargs: Any,
+    ) -> GPyTorchPosterior:
+        r"""Computes the posterior over model outputs at the provided points.
+
+        Args:
+            X: A `(batch_shape) x q x d`-dim Tensor, where `d` is the dimension of the
+                feature space and `q` is the number of points considered jointly.
+            output_indices: Ignored (the model has a single output).
+            observation_noise: If True, add observation noise to the posterior.
+
+        Returns:
+            A `GPyTorchPosterior` object, representing a batch of `b` joint
+            distributions over `q` points. Includes observation noise if
+            `observation_noise=True`.
+        """
+        self.eval()
+        L, alpha = self._get_factorization()
+        train_X = self.train_inputs[0]
+        K_xt = torch.cat(
+            [
+                lazify(self.covar_module(X, train_X[L.tile_slice(i)])).evaluate()
+                for i in range(L.num_tiles)
+            ],
+            dim=-1,
+        )
+        mean = self.mean_module(X) + (K_xt @ alpha.unsqueeze(-1)).squeeze(-1)
+        # V = L^-1 K_tx, solving for all test points at once
+        V = tiled_triangular_solve(L, K_xt.reshape(-1, L.n).t()).t().view_as(K_xt)
+        covar = lazify(self.covar_module(X)).evaluate() - V @ V.transpose(-1, -2)
+        mvn = MultivariateNormal(mean, lazify(covar))
+        if observation_noise:
+            mvn = self.likelihood(mvn, X)
+        return GPyTorchPosterior(mvn=mvn)
+
+    def freeze(self) -> None:
+        r"""Not supported, since freezing requires dense `O(n^2)` caches."""
+        raise UnsupportedError("OutOfCoreSingleTaskGP models cannot be frozen.")
+
+    def condition_on_observations(
+        self, X: Tensor, Y: Tensor, noise: Optional[Tensor] = None
+    ) -> None:
+        r"""Not supported, since conditioning requires dense `O(n^2)` caches."""
+        raise UnsupportedError(
+            "OutOfCoreSingleTaskGP does not support conditioning on observations."
+        )
+
+    def _covar_tile(self, rows: slice, cols: slice) -> Tensor:
+        r"""Compute a tile of the training covariance (including noise)."""
+        train_X = self.train_inputs[0]
+        if rows == cols:
+            X = train_X[rows]
+            return self.likelihood(self.forward(X), X).covariance_matrix
+        return lazify(self.covar_module(train_X[rows], train_X[cols])).evaluate()
+
+    def _get_state(self) -> Tuple[List[Tensor], List[Tuple[Tensor, int]]]:
+        r"""Get the state the factorization depends on.
+
+        Returns copies of the (small) parameters, since gpytorch modifies them
+        via `.data` (which does not update their versions), and the training
+        data along with their versions.
+        """
+        params = [p.detach().clone() for p in self.parameters()]
+        data = chain(self.train_inputs, [self.train_targets])
+        return params, [(t, t._version) for t in data]
+
+    def _get_factorization(self) -> OutOfCoreFactorization:
+        r"""Get the cached factorization, recomputing it if it is outdated."""
+        if self._factorization is not None:
+            (cached_params, cached_data), factorization = self._factorization
+            params, data = self._get_state()
+            if (
+                len(params) == len(cached_params)
+                and all(
+                    p.shape == p_c.shape and torch.equal(p, p_c)
+                    for p, p_c in zip(params, cached_params)
+                )
+                and all(
+                    t is t_c and v == v_c
+                    for (t, v), (t_c, v_c) in zip(data, cached_data)
+                )
+            ):
+                return factorization
+        return self.factorize()
+
+    def _log_prob_gradient(
+        self, factorization: OutOfCoreFactorization, params: List[Tensor]
+    ) -> List[Tensor]:
+        r"""Compute the gradient of the log marginal likelihood tile by tile.
+
+        Uses `d log p(y) / dK = (alpha alpha^T - K^-1) / 2` and
+        `d log p(y) / dm = alpha`. The columns of `K^-1` are computed one block
+        at a time using two triangular solves each, and the gradient is
+        accumulated by backpropagating through the tiles (on and below the
+        diagonal) of the training covariance one at a time.
+        """
+        L, alpha = factorization
+        grads = [torch.zeros_like(p) for p in params]
+
+        def accumulate(output: Tensor) -> None:
+            tile_grads = torch.autograd.grad(output, params, allow_unused=True)
+            for grad, tile_grad in zip(grads, tile_grads):
+                if tile_grad is not None:
+                    grad.add_(tile_grad)
+
+        train_X = self.train_inputs[0]
+        tkwargs = {"dtype": alpha.dtype, "device": alpha.device}
+        with torch.enable_grad():
+            accumulate((alpha * self.mean_module(train_X)).sum())
+        for j in range(L.num_tiles):
+            cols = L.tile_slice(j)
+            E = torch.zeros(L.n, cols.stop - cols.start, **tkwargs)
+            E[cols] = torch.eye(cols.stop - cols.start, **tkwargs)
+            with torch.no_grad():
+                K_inv_cols = tiled_triangular_solve(
+                    L, tiled_triangular_solve(L, E), transpose=True
+                )
+                W = alpha.unsqueeze(-1) * alpha[cols] - K_inv_cols
+            for i in range(j, L.num_tiles):
+                rows = L.tile_slice(i)
+                # off-diagonal tiles appear twice in the symmetric covariance
+                weight = 0.5 if i == j else 1.0
+                with torch.enable_grad():
+                    accumulate(weight * (W[rows] * self._covar_tile(rows, cols)).sum())
+        return grads
+
+
+class _OutOfCoreLogProb(torch.autograd.Function):
+    r"""The exact log marginal likelihood of an out-of-core GP.
+
+    The gradient is computed tile by tile in the backward pass (rather than
+    backpropagating through the factorization), so that the autograd graph never
+    holds the full training covariance.
+    """
+
+    @staticmethod
+    def forward(ctx, model: OutOfCoreSingleTaskGP, *params: Tensor) -> Tensor:
+        factorization = model.factorize()
+        train_X = model.train_inputs[0]
+        residual = model.train_targets - model.mean_module(train_X)
+        n = residual.size(-1)
+        ctx.model, ctx.factorization, ctx.params = model, factorization, params
+        return -0.5 * (
+            residual @ factorization.alpha
+            + tiled_logdet(factorization.L).to(residual)
+            + n * math.log(2 * math.pi)
+        )
+
+    @staticmethod
+    def backward(ctx, grad_output: Tensor) -> Tuple[Optional[Tensor], ...]:
+        grads = ctx.model._log_prob_gradient(ctx.factorization, ctx.params)
+        return (None,) + tuple(grad_output * grad for grad in grads)
+
+
+class OutOfCoreMarginalLogLikelihood(ExactMarginalLogLikelihood):
+    r"""The exact marginal log likelihood of an `OutOfCoreSingleTaskGP`.
+
+    A drop-in replacement for `ExactMarginalLogLikelihood` (including the log
+    probabilities of the priors, and the scaling by the number of data points)
+    that computes the log marginal likelihood and its gradient from
+    out-of-core factorizations of the training covariance. The model output
+    passed to the forward pass is ignored, so that the training covariance is
+    never evaluated in memory.
+
+    Example:
+        >>> mll = OutOfCoreMarginalLogLikelihood(model.likelihood, model)
+        >>> fit_gpytorch_model(mll)
+    """
+
+    def __init__(self, likelihood: Likelihood, model: OutOfCoreSingleTaskGP) -> None:
+        if not isinstance(model, OutOfCoreSingleTaskGP):
+            raise UnsupportedError(
+                "OutOfCoreMarginalLogLikelihood requires an OutOfCoreSingleTaskGP."
+            )
+        super().__init__(likelihood, model)
+
+    def forward(
+        self, output: MultivariateNormal, target: Tensor, *params: Any
+    ) -> Tensor:
+        model_params = [p for p in self.model.parameters() if p.requires_grad]
+        res = _OutOfCoreLogProb.apply(self.model, *model_params)
+        for _, prior, closure, _ in self.named_priors():
+            res = res + prior.log_prob(closure()).sum()
+        return res / target.size(-1)
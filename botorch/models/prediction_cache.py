@@ -0,0 +1,223 @@
+#! /usr/bin/env python3
+
+r"""
+Caches for exact GP predictions with fixed hyperparameters.
+"""
+
+from contextlib import ExitStack
+from typing import NamedTuple, Optional
+
+import torch
+from gpytorch.distributions.multivariate_normal import MultivariateNormal
+from gpytorch.lazy import lazify
+from gpytorch.models.exact_gp import ExactGP
+from gpytorch.utils.cholesky import psd_safe_cholesky
+from torch import Tensor
+
+from ..utils.cholesky import cholesky_delete, cholesky_extend
+
+
+class ExactPredictionCache(NamedTuple):
+    r"""Cached quantities for exact GP predictions with fixed hyperparameters.
+
+    All quantities are in the (augmented) batch shape of the model, i.e.
+    `(o) x batch_shape`.
+
+    - train_inputs: A `batch_shape x n x d` tensor of training inputs.
+    - train_targets: A `batch_shape x n` tensor of training targets.
+    - L: The `batch_shape x n x n` lower triangular Cholesky factor of the
+      training covariance (including observation noise).
+    - alpha: The `batch_shape x n` tensor `K^-1 (y - m)`.
+    """
+
+    train_inputs: Tensor
+    train_targets: Tensor
+    L: Tensor
+    alpha: Tensor
+
+
+def build_prediction_cache(model: ExactGP, detach: bool = True) -> ExactPredictionCache:
+    r"""Build the prediction cache of an exact GP from its training data.
+
+    The model must implement its prior via a `mean_module` and a `covar_module`
+    (as e.g. `SingleTaskGP` and `FixedNoiseGP` do).
+
+    Args:
+        model: The exact GP model.
+        detach: If True, compute the cache without tracking gradients. If False,
+            the cache is differentiable w.r.t. the training inputs and the
+            hyperparameters of the model.
+
+    Returns:
+        The ExactPredictionCache of the model.
+
+    Example:
+        >>> model = SingleTaskGP(train_X, train_Y)
+        >>> cache = build_prediction_cache(model)
+    """
+    train_inputs, train_targets = model.train_inputs[0], model.train_targets
+    with ExitStack() as es:
+        if detach:
+            es.enter_context(torch.no_grad())
+        prior = model.forward(train_inputs)
+        covar = model.likelihood(prior, train_inputs).covariance_matrix
+        L = psd_safe_cholesky(covar)
+        alpha = torch.cholesky_solve(
+            (train_targets - prior.mean).unsqueeze(-1), L
+        ).squeeze(-1)
+    return ExactPredictionCache(
+        train_inputs=train_inputs, train_targets=train_targets, L=L, alpha=alpha
+    )
+
+
+def extend_prediction_cache(
+    cache: ExactPredictionCache,
+    model: ExactGP,
+    X: Tensor,
+    Y: Tensor,
+    noise: Optional[Tensor] = None,
+) -> ExactPredictionCache:
+    r"""Extend a prediction cache by `k` new observations.
+
+    Uses a rank-`k` extension of the Cholesky factor of the training
+    covariance, which requires `O(n^2 k)` rather than `O((n + k)^3)`
+    operations. The hyperparameters of the model are kept fixed.
+
+    Args:
+        cache: The ExactPredictionCache to extend.
+        model: The exact GP model the cache was built from.
+        X: A `batch_shape x k x d` tensor of new inputs (in the model's
+            augmented batch shape).
+        Y: A `batch_shape x k` tensor of new observations.
+        noise: A `batch_shape x k` tensor of observation noise levels of the new
+            observations. Required for likelihoods with fixed noise levels.
+
+    Returns:
+        The extended ExactPredictionCache.
+    """
+    kwargs = {} if noise is None else {"noise": noise}
+    with torch.no_grad():
+        prior = model.forward(X)
+        K22 = model.likelihood(prior, X, **kwargs).covariance_matrix
+        K12 = model.covar_module(cache.train_inputs, X).evaluate()
+        L = cholesky_extend(cache.L, K12, K22)
+        train_inputs = torch.cat([cache.train_inputs, X], dim=-2)
+        train_targets = torch.cat([cache.train_targets, Y], dim=-1)
+        residual = train_targets - model.mean_module(train_inputs)
+        alpha = torch.cholesky_solve(residual.unsqueeze(-1), L).squeeze(-1)
+    return ExactPredictionCache(
+        train_inputs=train_inputs, train_targets=train_targets, L=L, alpha=alpha
+    )
+
+
+def remove_from_prediction_cache(
+    cache: ExactPredictionCache, model: ExactGP, index: int
+) -> ExactPredictionCache:
+    r"""Remove an observation from a prediction cache.
+
+    Uses a Cholesky downdate of the factor of the training covariance, which
+    requires `O(n^2)` rather than `O(n^3)` operations. The hyperparameters of
+    the model are kept fixed.
+
+    Args:
+        cache: The ExactPredictionCache to remove the observation from.
+        model: The exact GP model the cache was built from.
+        index: The index of the observation to remove (the same index is
+            removed from all batches).
+
+    Returns:
+        The reduced ExactPredictionCache.
+    """
+    n = cache.train_targets.size(-1)
+    keep = torch.tensor(
+        [i for i in range(n) if i != index], device=cache.train_targets.device
+    )
+    with torch.no_grad():
+        L = cholesky_delete(cache.L, index)
+        train_inputs = cache.train_inputs.index_select(-2, keep)
+        train_targets = cache.train_targets.index_select(-1, keep)
+        residual = train_targets - model.mean_module(train_inputs)
+        alpha = torch.cholesky_solve(residual.unsqueeze(-1), L).squeeze(-1)
+    return ExactPredictionCache(
+        train_inputs=train_inputs, train_targets=train_targets, L=L, alpha=alpha
+    )
+
+
+def get_variance_root(cache: ExactPredictionCache) -> Tensor:
+    r"""Compute the inverse `L^-1` of the Cholesky factor of a prediction cache.
+
+    Since `K^-1 = L^-T L^-1`, passing the result to `predict_from_cache` allows
+    computing the posterior covariance using matrix multiplications rather than
+    triangular solves, at a one-time cost of `O(n^3)` operations.
+
+    Args:
+        cache: The ExactPredictionCache of the model.
+
+    Returns:
+        The `batch_shape x n x n` lower triangular inverse of `cache.L`.
+    """
+    L = cache.L
+    eye = torch.eye(L.size(-1), dtype=L.dtype, device=L.device).expand_as(L)
+    return torch.triangular_solve(eye, L, upper=False)[0]
+
+
+def predict_mean_from_cache(
+    cache: ExactPredictionCache, model: ExactGP, X: Tensor
+) -> Tensor:
+    r"""Compute the posterior mean of an exact GP from its cache.
+
+    Only requires the `q x n` cross-covariance (and no triangular solves), so
+    this is considerably cheaper than `predict_from_cache` if the posterior
+    covariance is not needed.
+
+    Args:
+        cache: The ExactPredictionCache of the model.
+        model: The exact GP model.
+        X: A `(new_batch_shape) x batch_shape x q x d` tensor of test points.
+
+    Returns:
+        The `(new_batch_shape) x batch_shape x q` posterior mean.
+    """
+    K_xt = lazify(model.covar_module(X, cache.train_inputs)).evaluate()
+    return model.mean_module(X) + (K_xt @ cache.alpha.unsqueeze(-1)).squeeze(-1)
+
+
+def predict_from_cache(
+    cache: ExactPredictionCache,
+    model: ExactGP,
+    X: Tensor,
+    variance_root: Optional[Tensor] = None,
+) -> MultivariateNormal:
+    r"""Compute the posterior distribution of an exact GP from its cache.
+
+    Args:
+        cache: The ExactPredictionCache of the model.
+        model: The exact GP model.
+        X: A `(new_batch_shape) x batch_shape x q x d` tensor of test points.
+        variance_root: The `batch_shape x n x n` inverse Cholesky factor of the
+            cache as computed by `get_variance_root`. If omitted, the posterior
+            covariance is computed using triangular solves.
+
+    Returns:
+        The `(new_batch_shape) x batch_shape` posterior MultivariateNormal over
+        the `q` test points (without observation noise).
+    """
+    # gpytorch's (global) kernel evaluation settings may be toggled by other
+    # threads, in which case the kernel returns a tensor rather than a LazyTensor
+    K_xt = lazify(model.covar_module(X, cache.train_inputs)).evaluate()
+    K_xx = lazify(model.covar_module(X)).evaluate()
+    mean = model.mean_module(X) + (K_xt @ cache.alpha.unsqueeze(-1)).squeeze(-1)
+    if variance_root is None:
+        batch_shape = K_xt.shape[:-2]
+        L = cache.L.expand(batch_shape + cache.L.shape[-2:])
+        V = torch.triangular_solve(K_xt.transpose(-1, -2), L, upper=False)[0]
+    elif variance_root.dim() == 2:
+        # a single matrix product rather than a batched product with the
+        # broadcast (non-batched) variance root
+        n = K_xt.size(-1)
+        V_t = K_xt.reshape(-1, n) @ variance_root.transpose(-1, -2)
+        V = V_t.view(K_xt.shape[:-1] + torch.Size([n])).transpose(-1, -2)
+    else:
+        V = variance_root @ K_xt.transpose(-1, -2)
+    covar = K_xx - V.transpose(-1, -2) @ V
+    return MultivariateNormal(mean, lazify(covar))
@@ -0,0 +1,152 @@
+#! /usr/bin/env python3
+
+r"""
+Sliding-window GP models with a bounded number of training points.
+"""
+
+from typing import Optional
+
+import torch
+from gpytorch.likelihoods.likelihood import Likelihood
+from torch import Tensor
+
+from ..exceptions.errors import UnsupportedError
+from .gp_regression import SingleTaskGP
+from .prediction_cache import remove_from_prediction_cache
+
+
+class SlidingWindowGP(SingleTaskGP):
+    r"""A single-task exact GP keeping at most `window_size` training points.
+
+    New observations are added via `condition_on_observations` (using rank-`k`
+    extensions of the cached Cholesky factor of the training covariance). If
+    the number of training points exceeds `window_size`, points are evicted
+    using Cholesky downdates rather than refactorizing the training covariance,
+    so that the cost per iteration and the memory requirements stay bounded
+    for long-running loops. The hyperparameters are kept fixed while
+    conditioning, and can be refit on the current window at any time.
+
+    Two eviction strategies are supported:
+
+    - "recency": Evict the oldest points (`O(N^2)` per evicted point).
+    - "loo_variance": Greedily evict the least informative points, i.e. the
+      points with the smallest leave-one-out predictive variance (the points
+      best explained by the remaining ones). This requires the inverse of the
+      training covariance, which is computed once per call of
+      `condition_on_observations` (`O(N^3)`) and downdated in `O(N^2)` per
+      evicted point.
+
+    This model currently only supports non-batched training data.
+    """
+
+    def __init__(
+        self,
+        train_X: Tensor,
+        train_Y: Tensor,
+        window_size: int,
+        eviction: str = "recency",
+        likelihood: Optional[Likelihood] = None,
+    ) -> None:
+        r"""A single-task exact GP keeping at most `window_size` training points.
+
+        Args:
+            train_X: A `n x d` tensor of training features. If `n > window_size`,
+                only the last `window_size` points are used.
+            train_Y: A `n x (o)` tensor of training observations.
+            window_size: The maximum number of training points `N`.
+            eviction: The eviction strategy, either "recency" or "loo_variance".
+            likelihood: A likelihood. If omitted, use a standard
+                GaussianLikelihood with inferred noise level.
+
+        Example:
+            >>> model = SlidingWindowGP(train_X, train_Y, window_size=500)
+            >>> mll = ExactMarginalLogLikelihood(model.likelihood, model)
+            >>> fit_gpytorch_model(mll)
+            >>> model.condition_on_observations(new_X, new_Y)
+        """
+        if train_X.dim() != 2:
+            raise UnsupportedError(
+                "SlidingWindowGP requires `n x d`-dim training data."
+            )
+        if eviction not in ("recency", "loo_variance"):
+            raise ValueError(f"Unknown eviction strategy {eviction}.")
+        super().__init__(
+            train_X=train_X[-window_size:],
+            train_Y=train_Y[-window_size:],
+            likelihood=likelihood,
+        )
+        self.window_size = window_size
+        self.eviction = eviction
+
+    def condition_on_observations(
+        self, X: Tensor, Y: Tensor, noise: Optional[Tensor] = None
+    ) -> None:
+        r"""Condition the model on new observations (in-place).
+
+        Adds the observations to the training data of the model (keeping the
+        hyperparameters fixed) and evicts points according to the eviction
+        strategy so that at most `window_size` training points are kept.
+
+        Args:
+            X: A `k x d` tensor of new inputs.
+            Y: A `k x (o)` tensor of new observations.
+            noise: Ignored (the model infers the noise level).
+        """
+        super().condition_on_observations(X=X, Y=Y, noise=noise)
+        cache = self._prediction_cache
+        num_evict = cache.train_targets.size(-1) - self.window_size
+        if num_evict > 0 and self.eviction == "loo_variance":
+            with torch.no_grad():
+                K_inv = torch.cholesky_inverse(cache.L)
+        for _ in range(max(num_evict, 0)):
+            if self.eviction == "recency":
+                index = 0
+            else:
+                index = _least_informative_index(K_inv)
+                K_inv = _remove_from_inverse(K_inv, index)
+            cache = remove_from_prediction_cache(cache=cache, model=self, index=index)
+        self.set_train_data(
+            inputs=cache.train_inputs, targets=cache.train_targets, strict=False
+        )
+        self._prediction_cache = cache
+
+
+def _least_informative_index(K_inv: Tensor) -> int:
+    r"""Get the index of the point with the smallest leave-one-out variance.
+
+    For multiple outputs, the log leave-one-out variances are summed across
+    outputs.
+
+    Args:
+        K_inv: The `(o) x n x n` inverse of the training covariance.
+
+    Returns:
+        The index of the least informative training point.
+    """
+    # log LOO variance is -log([K^-1]_ii)
+    log_loo_variance = -K_inv.diagonal(dim1=-2, dim2=-1).log()
+    return log_loo_variance.view(-1, K_inv.size(-1)).sum(dim=0).argmin().item()
+
+
+def _remove_from_inverse(K_inv: Tensor, index: int) -> Tensor:
+    r"""Compute the inverse of a matrix with a row and column removed.
+
+    Uses that the inverse of `K` with its `index`-th row and column removed is
+    `A - a a^T / K^-1_jj`, where `A` and `a` are `K^-1` without its `index`-th
+    row and column and the `index`-th column of `K^-1` without its `index`-th
+    row, respectively. This requires `O(n^2)` operations.
+
+    Args:
+        K_inv: The `(o) x n x n` inverse of a matrix `K`.
+        index: The index of the row and column to remove.
+
+    Returns:
+        The `(o) x (n - 1) x (n - 1)` inverse of the reduced matrix.
+    """
+    n = K_inv.size(-1)
+    keep = torch.cat([torch.arange(index), torch.arange(index + 1, n)]).to(
+        device=K_inv.device
+    )
+    a = K_inv[..., index].index_select(-1, keep)
+    A = K_inv.index_select(-2, keep).index_select(-1, keep)
+    return A - a.unsqueeze(-1) * a.unsqueeze(-2) / K_inv[..., index, index, None, None]
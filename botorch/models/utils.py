@@ -9,18 +9,20 @@ from typing import List, Optional, Tuple
 import torch
 from torch import Tensor
 
+from ..exceptions.errors import UnsupportedError
+
 
 def _make_X_full(X: Tensor, output_indices: List[int], tf: int) -> Tensor:
     r"""Helper to construct input tensor with task indices.
 
     Args:
-        X: The raw input tensor (without task information).
+        X: A `(batch_shape) x q x d` raw input tensor (without task information).
         output_indices: The output indices to generate (passed in via `posterior`).
         tf: The task feature index.
 
     Returns:
-        Tensor: The full input tensor for the multi-task model, including task
-            indices.
+        Tensor: The `(batch_shape) x (o * q) x (d + 1)` full input tensor for the
+            multi-task model, including task indices (in task-major order).
     """
     index_shape = X.shape[:-1] + torch.Size([1])
     indexers = (
@@ -29,7 +31,7 @@ def _make_X_full(X: Tensor, output_indices: List[int], tf: int) -> Tensor:
     )
     X_l, X_r = X[..., :tf], X[..., tf:]
     return torch.cat(
-        [torch.cat([X_l, indexer, X_r], dim=-1) for indexer in indexers], dim=0
+        [torch.cat([X_l, indexer, X_r], dim=-1) for indexer in indexers], dim=-2
     )
 
 
@@ -108,3 +110,113 @@ def add_output_dim(X: Tensor, original_batch_shape: torch.Size) -> Tuple[Tensor,
     output_dim_idx = len(X.shape) - (num_original_batch_dims + 2)
     X = X.unsqueeze(output_dim_idx)
     return X, output_dim_idx
+
+
+def group_replicates(train_X: Tensor, tol: float = 0.0) -> Tuple[Tensor, Tensor]:
+    r"""Group replicated training points.
+
+    For `tol=0`, the groups are the sets of identical feature vectors. For
+    `tol > 0`, the feature space is partitioned into a grid of hypercubes with
+    side length `tol`, and the points in the same cell form a group (so that
+    the features of the points in a group are within `tol` of each other in
+    the infinity norm). Both require `O(n log n)` time and `O(n d)` memory.
+    The groups are ordered by the first occurrence of their points.
+
+    Args:
+        train_X: A `n x d` tensor of training features.
+        tol: The side length of the grid cells (or zero for exact replicates).
+
+    Returns:
+        2-element tuple containing
+
+        - A `m`-dim tensor of the index of the first point of each group.
+        - A `n`-dim tensor of the group index of each point.
+
+    Example:
+        >>> train_X = torch.tensor([[0.0], [0.5], [0.0]])
+        >>> first_idcs, group = group_replicates(train_X)
+        >>> group  # tensor([0, 1, 0])
+    """
+    if train_X.dim() != 2:
+        raise UnsupportedError(
+            "Aggregating replicates requires `n x d`-dim training data."
+        )
+    keys = train_X if tol == 0 else torch.floor(train_X / tol)
+    _, inverse = torch.unique(keys, dim=0, return_inverse=True)
+    first_idcs = _get_first_indices(inverse)
+    # order the groups by first occurrence
+    first_idcs, order = first_idcs.sort()
+    rank = torch.empty_like(order)
+    rank[order] = torch.arange(order.numel(), device=train_X.device)
+    return first_idcs, rank[inverse]
+
+
+def _get_first_indices(group: Tensor) -> Tensor:
+    r"""Get the index of the first element of each group.
+
+    Args:
+        group: A `n`-dim tensor of the group index (in `0, ..., m - 1`) of each
+            element, where each group has at least one element.
+
+    Returns:
+        A `m`-dim tensor of the index of the first element of each group.
+    """
+    n = group.numel()
+    # sorting by `(group, index)` puts the first element of each group first
+    _, perm = (group * n + torch.arange(n, device=group.device)).sort()
+    sorted_group = group[perm]
+    starts = (sorted_group[1:] - sorted_group[:-1]).nonzero().view(-1) + 1
+    return perm[torch.cat([starts.new_zeros(1), starts])]
+
+
+def aggregate_replicates(
+    train_X: Tensor, train_Y: Tensor, train_Yvar: Tensor, tol: float = 0.0
+) -> Tuple[Tensor, Tensor, Tensor]:
+    r"""Aggregate replicated observations into their inverse-variance weighted means.
+
+    Groups replicated training points (see `group_replicates`) and replaces the
+    observations of each group by their inverse-variance weighted mean
+    `y_bar = sum_i (y_i / s_i) / sum_i (1 / s_i)` with observation noise
+    `1 / sum_i (1 / s_i)`. For exact replicates (`tol=0`) and Gaussian
+    observation noise with known variances, the posterior of a GP on the
+    aggregated data is identical to that of the GP on the original data, while
+    the cost of exact inference decreases from `O(n^3)` to `O(m^3)`, where `m`
+    is the number of unique points. The features of the first point of each
+    group serve as the features of the aggregated observation.
+
+    Args:
+        train_X: A `n x d` tensor of training features.
+        train_Y: A `n x (o)` tensor of training observations.
+        train_Yvar: A `n x (o)` tensor of (positive) observed measurement noise.
+        tol: The side length of the grid cells used for grouping near-replicates
+            (or zero for exact replicates).
+
+    Returns:
+        3-element tuple containing
+
+        - A `m x d` tensor of unique training features.
+        - A `m x (o)` tensor of aggregated training observations.
+        - A `m x (o)` tensor of observed measurement noise of the aggregated
+          observations.
+
+    Example:
+        >>> train_X = torch.tensor([[0.0], [0.5], [0.0]])
+        >>> train_Y = torch.tensor([1.0, 2.0, 3.0])
+        >>> train_Yvar = torch.full_like(train_Y, 0.1)
+        >>> X, Y, Yvar = aggregate_replicates(train_X, train_Y, train_Yvar)
+        >>> Y  # tensor([2.0, 2.0])
+    """
+    first_idcs, group = group_replicates(train_X=train_X, tol=tol)
+    weights = 1 / train_Yvar
+    sum_weights = torch.zeros(
+        first_idcs.shape + train_Y.shape[1:], dtype=train_Y.dtype, device=train_Y.device
+    )
+    sum_weights = sum_weights.index_add(0, group, weights)
+    sum_weighted_Y = torch.zeros_like(sum_weights).index_add(
+        0, group, weights * train_Y
+    )
+    return (
+        train_X.index_select(0, first_idcs),
+        sum_weighted_Y / sum_weights,
+        1 / sum_weights,
+    )
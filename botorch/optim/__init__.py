@@ -2,10 +2,16 @@
 
 from .initializers import initialize_q_batch, initialize_q_batch_nonneg
 from .numpy_converter import module_to_array, set_params_with_array
-from .optimize import gen_batch_initial_conditions, joint_optimize, sequential_optimize
+from .optimize import (
+    additive_optimize,
+    gen_batch_initial_conditions,
+    joint_optimize,
+    sequential_optimize,
+)
 
 
 __all__ = [
+    "additive_optimize",
     "gen_batch_initial_conditions",
     "initialize_q_batch",
     "initialize_q_batch_nonneg",
@@ -4,19 +4,36 @@ r"""
 Tools for model fitting.
 """
 
+import math
 import time
 from collections import OrderedDict
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from itertools import repeat
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import numpy as np
+import torch
+from gpytorch.constraints.constraints import Interval
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
 from gpytorch.mlls.marginal_log_likelihood import MarginalLogLikelihood
+from gpytorch.mlls.variational_elbo import VariationalELBO
+from gpytorch.utils.cholesky import psd_safe_cholesky
 from scipy.optimize import Bounds, minimize
 from torch import Tensor
 from torch.optim.adam import Adam
 from torch.optim.optimizer import Optimizer
+from torch.utils.data import DataLoader
 
+from ..exceptions.errors import UnsupportedError
+from ..models.gpytorch import BatchedMultiOutputGPyTorchModel
+from ..models.utils import multioutput_to_batch_mode_transform
 from .numpy_converter import TorchAttr, module_to_array, set_params_with_array
-from .utils import _filter_kwargs, _get_extra_mll_args, check_convergence
+from .utils import (
+    _filter_kwargs,
+    _get_batch_mll,
+    _get_extra_mll_args,
+    check_batch_convergence,
+    check_convergence,
+)
 
 
 ParameterBounds = Dict[str, Tuple[Optional[float], Optional[float]]]
@@ -34,11 +51,13 @@ def fit_gpytorch_torch(
     optimizer_cls: Optimizer = Adam,
     options: Optional[Dict[str, Any]] = None,
     track_iterations: bool = True,
+    data_loader: Optional[DataLoader] = None,
 ) -> Tuple[MarginalLogLikelihood, List[OptimizationIteration]]:
     r"""Fit a gpytorch model by maximizing MLL with a torch optimizer.
 
     The model and likelihood in mll must already be in train mode.
-    Note: this method requires that the model has `train_inputs` and `train_targets`.
+    Note: this method requires that the model has `train_inputs` and `train_targets`,
+    unless a `data_loader` is provided.
 
     Args:
         mll: MarginalLogLikelihood to be maximized.
@@ -53,6 +72,13 @@ def fit_gpytorch_torch(
             to specify the maximum number of iterations.
         track_iterations: Track the function values and wall time for each
             iteration.
+        data_loader: A DataLoader yielding minibatches `(X, Y)` of training data
+            (in the format of the model's constructor arguments `train_X` and
+            `train_Y`). If provided, each iteration takes an optimizer step on the
+            next minibatch (cycling over the loader), so that the training data
+            does not need to be processed at once. The minibatches are moved to
+            the dtype and device of the model. Requires a `VariationalELBO`
+            whose `num_data` is the total number of training points.
 
     Returns:
         2-element tuple containing
@@ -68,6 +94,8 @@ def fit_gpytorch_torch(
         >>> fit_gpytorch_torch(mll)
         >>> mll.eval()
     """
+    if data_loader is not None and not isinstance(mll, VariationalELBO):
+        raise UnsupportedError("Minibatch training requires a VariationalELBO.")
     optim_options = {"maxiter": 100, "disp": True, "lr": 0.05}
     optim_options.update(options or {})
     optimizer = optimizer_cls(
@@ -75,16 +103,7 @@ def fit_gpytorch_torch(
         **_filter_kwargs(optimizer_cls, **optim_options),
     )
 
-    # get bounds specified in model (if any)
-    bounds_: ParameterBounds = {}
-    if hasattr(mll, "named_parameters_and_constraints"):
-        for param_name, _, constraint in mll.named_parameters_and_constraints():
-            if constraint is not None and not constraint.enforced:
-                bounds_[param_name] = constraint.lower_bound, constraint.upper_bound
-
-    # update with user-supplied bounds (overwrites if already exists)
-    if bounds is not None:
-        bounds_.update(bounds)
+    bounds_ = _get_parameter_bounds(mll=mll, bounds=bounds)
 
     iterations = []
     t1 = time.time()
@@ -95,9 +114,10 @@ def fit_gpytorch_torch(
     loss_trajectory: List[float] = []
     i = 0
     converged = False
-    train_inputs, train_targets = mll.model.train_inputs, mll.model.train_targets
+    minibatches = _get_minibatches(mll=mll, data_loader=data_loader)
     while not converged:
         optimizer.zero_grad()
+        train_inputs, train_targets = next(minibatches)
         output = mll.model(*train_inputs)
         # we sum here to support batch mode
         args = [output, train_targets] + _get_extra_mll_args(mll)
@@ -127,6 +147,522 @@ def fit_gpytorch_torch(
     return mll, iterations
 
 
+def _get_minibatches(
+    mll: MarginalLogLikelihood, data_loader: Optional[DataLoader] = None
+) -> Iterator[Tuple[Tuple[Tensor, ...], Tensor]]:
+    r"""Generate the training data for each iteration of a torch optimizer.
+
+    Args:
+        mll: The MarginalLogLikelihood to be maximized.
+        data_loader: A DataLoader yielding minibatches `(X, Y)`. If omitted, the
+            full training data of the model is used in each iteration.
+
+    Returns:
+        An infinite iterator of `(train_inputs, train_targets)` tuples in the
+        format of the model's `train_inputs` and `train_targets`. Minibatches
+        are moved to the dtype and device of the model.
+    """
+    model = mll.model
+    if data_loader is None:
+        yield from repeat((model.train_inputs, model.train_targets))
+    param = next(model.parameters())
+    tkwargs = {"dtype": param.dtype, "device": param.device}
+    while True:
+        empty = True
+        for X, Y in data_loader:
+            empty = False
+            X, Y = X.to(**tkwargs), Y.to(**tkwargs)
+            if isinstance(model, BatchedMultiOutputGPyTorchModel):
+                X, Y, _ = multioutput_to_batch_mode_transform(
+                    train_X=X, train_Y=Y, num_outputs=model._num_outputs
+                )
+            yield (X,), Y
+        if empty:
+            raise ValueError("The data_loader did not yield any minibatches.")
+
+
+def fit_gpytorch_torch_batched(
+    mll: MarginalLogLikelihood,
+    bounds: Optional[ParameterBounds] = None,
+    optimizer_cls: Optimizer = Adam,
+    options: Optional[Dict[str, Any]] = None,
+    track_iterations: bool = True,
+) -> Tuple[MarginalLogLikelihood, List[OptimizationIteration]]:
+    r"""Fit a batched gpytorch model with per-batch convergence.
+
+    Each batch element of the model is treated as an independent fitting
+    problem. The MLLs of all batch elements are evaluated jointly (so that
+    kernel evaluations and solves are shared in a single batched call), but
+    convergence is tracked separately for each batch element. Parameters of
+    converged batch elements are frozen while optimization of the remaining
+    batch elements continues. Optimization terminates once all batch elements
+    have converged (see `check_batch_convergence`).
+
+    The model and likelihood in mll must already be in train mode. All model
+    parameters that are not shared across batches must have the model's batch
+    shape as leading dimensions.
+
+    Args:
+        mll: ExactMarginalLogLikelihood to be maximized.
+        bounds: A ParameterBounds dictionary mapping parameter names to tuples
+            of lower and upper bounds. Bounds specified here take precedence
+            over bounds on the same parameters specified in the constraints
+            registered with the module.
+        optimizer_cls: Torch optimizer to use. Must not require a closure.
+        options: options for model fitting. Relevant options will be passed to
+            the `optimizer_cls`. Additionally, options can include: "disp"
+            to specify whether to display model fitting diagnostics, "maxiter"
+            to specify the maximum number of iterations, and "ftol" and
+            "window" to specify the convergence criterion.
+        track_iterations: Track the (summed) function values and wall time for
+            each iteration.
+
+    Returns:
+        2-element tuple containing
+
+        - mll with parameters optimized in-place.
+        - List of OptimizationIteration objects with information on each
+          iteration. If track_iterations is False, this will be an empty list.
+
+    Example:
+        >>> train_X = torch.rand(3, 20, 2)  # three independent problems
+        >>> gp = SingleTaskGP(train_X, train_Y)
+        >>> mll = ExactMarginalLogLikelihood(gp.likelihood, gp)
+        >>> mll.train()
+        >>> fit_gpytorch_torch_batched(mll)
+        >>> mll.eval()
+    """
+    optim_options = {"maxiter": 100, "disp": True, "lr": 0.05}
+    optim_options.update(options or {})
+    optimizer = optimizer_cls(
+        params=[{"params": mll.parameters()}],
+        **_filter_kwargs(optimizer_cls, **optim_options),
+    )
+    bounds_ = _get_parameter_bounds(mll=mll, bounds=bounds)
+    convergence_options = {
+        k: v for k, v in optim_options.items() if k in ("maxiter", "ftol", "window")
+    }
+
+    iterations = []
+    t1 = time.time()
+    loss_trajectory: List[Tensor] = []
+    converged = None
+    i = 0
+    while converged is None or not converged.all():
+        optimizer.zero_grad()
+        batch_loss = -_get_batch_mll(mll)
+        loss = batch_loss.sum()
+        loss.backward()
+        loss_trajectory.append(batch_loss.detach().clone())
+        if converged is None:
+            converged = torch.zeros_like(batch_loss, dtype=torch.bool)
+        if optim_options["disp"] and (
+            (i + 1) % 10 == 0 or i == (optim_options["maxiter"] - 1)
+        ):
+            print(
+                f"Iter {i + 1}/{optim_options['maxiter']}: {loss.item()} "
+                f"({converged.sum().item()}/{converged.numel()} converged)"
+            )
+        if track_iterations:
+            iterations.append(OptimizationIteration(i, loss.item(), time.time() - t1))
+        previous = {
+            name: param.detach().clone() for name, param in mll.named_parameters()
+        }
+        optimizer.step()
+        with torch.no_grad():
+            for pname, param in mll.named_parameters():
+                # keep parameters of converged batch elements fixed
+                if param.shape[: converged.dim()] == converged.shape:
+                    mask = converged.view(
+                        converged.shape
+                        + torch.Size([1] * (param.dim() - converged.dim()))
+                    )
+                    param.data = torch.where(mask, previous[pname], param.data)
+                # project onto bounds
+                if pname in bounds_:
+                    param.data = param.data.clamp(*bounds_[pname])
+        i += 1
+        converged = converged | check_batch_convergence(
+            loss_trajectory=loss_trajectory, options=convergence_options
+        )
+    return mll, iterations
+
+
+def fit_gpytorch_lbfgs_batched(
+    mll: MarginalLogLikelihood,
+    bounds: Optional[ParameterBounds] = None,
+    options: Optional[Dict[str, Any]] = None,
+    track_iterations: bool = True,
+) -> Tuple[MarginalLogLikelihood, List[OptimizationIteration]]:
+    r"""Fit a batched gpytorch model with L-BFGS and per-batch convergence.
+
+    Each batch element of the model (e.g. each output of a multi-output
+    `SingleTaskGP`) is treated as an independent optimization problem with its
+    own L-BFGS curvature history, backtracking (Armijo) line search and
+    convergence flag. The MLLs of all batch elements are still evaluated jointly
+    in a single batched call, so that kernel evaluations and Cholesky
+    factorizations are shared. In contrast to `fit_gpytorch_scipy`, which
+    optimizes the summed MLL over a single parameter vector, an ill-conditioned
+    batch element does not slow down convergence of the others.
+
+    The model and likelihood in mll must already be in train mode, and all
+    parameters must have the model's batch shape as leading dimensions. Bounds
+    are handled by projecting the iterates onto the feasible set.
+
+    Args:
+        mll: ExactMarginalLogLikelihood to be maximized.
+        bounds: A ParameterBounds dictionary mapping parameter names to tuples
+            of lower and upper bounds. Bounds specified here take precedence
+            over bounds on the same parameters specified in the constraints
+            registered with the module.
+        options: options for model fitting. Options can include: "maxiter" (the
+            maximum number of iterations, default: 200), "history_size" (the
+            number of L-BFGS correction pairs, default: 10), "max_ls" (the
+            maximum number of line search steps per iteration, default: 20),
+            "ftol" (the relative tolerance on the change of the objective,
+            default: 1e-9), "gtol" (the tolerance on the largest projected
+            gradient element, default: 1e-5) and "disp".
+        track_iterations: Track the (summed) function values and wall time for
+            each iteration.
+
+    Returns:
+        2-element tuple containing
+
+        - mll with parameters optimized in-place.
+        - List of OptimizationIteration objects with information on each
+          iteration. If track_iterations is False, this will be an empty list.
+
+    Example:
+        >>> gp = SingleTaskGP(train_X, train_Y)  # multi-output train_Y
+        >>> mll = ExactMarginalLogLikelihood(gp.likelihood, gp)
+        >>> mll.train()
+        >>> fit_gpytorch_model(mll, optimizer=fit_gpytorch_lbfgs_batched)
+        >>> mll.eval()
+    """
+    optim_options = {
+        "maxiter": 200,
+        "history_size": 10,
+        "max_ls": 20,
+        "ftol": 1e-9,
+        "gtol": 1e-5,
+        "disp": True,
+    }
+    optim_options.update(options or {})
+    bounds_ = _get_parameter_bounds(mll=mll, bounds=bounds)
+    names, params = zip(*mll.named_parameters())
+
+    def loss_and_grad(x: Tensor) -> Tuple[Tensor, Tensor]:
+        # set parameters from the `b x p` tensor x and evaluate the batch losses
+        with torch.no_grad():
+            for p, x_p in zip(params, x.split(sizes, dim=-1)):
+                p.copy_(x_p.view_as(p))
+        loss = -_get_batch_mll(mll).view(-1)
+        grads = torch.autograd.grad(loss.sum(), params, allow_unused=True)
+        grad = torch.cat(
+            [
+                torch.zeros(num_batch, size, dtype=x.dtype, device=x.device)
+                if g is None
+                else g.reshape(num_batch, size)
+                for g, size in zip(grads, sizes)
+            ],
+            dim=-1,
+        )
+        return loss.detach(), grad
+
+    with torch.no_grad():
+        batch_shape = _get_batch_mll(mll).shape
+    if any(p.shape[: len(batch_shape)] != batch_shape for p in params):
+        raise UnsupportedError(
+            "Batched L-BFGS requires all parameters to have the model's batch "
+            "shape as leading dimensions."
+        )
+    num_batch = batch_shape.numel()
+    sizes = [p[(0,) * len(batch_shape)].numel() for p in params]
+    x = torch.cat([p.detach().reshape(num_batch, -1) for p in params], dim=-1)
+    lower = torch.full_like(x[0], -math.inf)
+    upper = torch.full_like(x[0], math.inf)
+    for lb_p, ub_p, name in zip(lower.split(sizes), upper.split(sizes), names):
+        lb, ub = bounds_.get(name, (None, None))
+        if lb is not None:
+            lb_p.fill_(lb)
+        if ub is not None:
+            ub_p.fill_(ub)
+
+    iterations = []
+    t1 = time.time()
+    loss, grad = loss_and_grad(x)
+    converged = torch.zeros_like(loss, dtype=torch.bool)
+    s_hist: List[Tensor] = []
+    y_hist: List[Tensor] = []
+    rho_hist: List[Tensor] = []
+    gamma = torch.ones_like(loss)
+    for i in range(optim_options["maxiter"]):
+        # two-loop recursion (batched); invalid pairs have rho = 0 and are no-ops
+        q = grad.clone()
+        alphas = []
+        for s, y, rho in zip(reversed(s_hist), reversed(y_hist), reversed(rho_hist)):
+            alpha = rho * (s * q).sum(dim=-1)
+            q.sub_(alpha.unsqueeze(-1) * y)
+            alphas.append(alpha)
+        r = gamma.unsqueeze(-1) * q
+        for s, y, rho, alpha in zip(s_hist, y_hist, rho_hist, reversed(alphas)):
+            beta = rho * (y * r).sum(dim=-1)
+            r.add_((alpha - beta).unsqueeze(-1) * s)
+        direction = -r
+        # fall back to steepest descent if not a descent direction
+        not_descent = (grad * direction).sum(dim=-1) >= 0
+        direction[not_descent] = -grad[not_descent]
+        direction[converged] = 0.0
+        # backtracking line search with per-batch step sizes
+        step = torch.ones_like(loss)
+        if i == 0:
+            step = grad.abs().sum(dim=-1).clamp_min(1.0).reciprocal()
+        accepted = converged.clone()
+        x_new, loss_new, grad_new = x.clone(), loss.clone(), grad.clone()
+        for _ in range(optim_options["max_ls"]):
+            x_trial = torch.max(
+                torch.min(x + step.unsqueeze(-1) * direction, upper), lower
+            )
+            try:
+                loss_trial, grad_trial = loss_and_grad(x_trial)
+            except RuntimeError:
+                # numerical failure (e.g. in the Cholesky factorization) of the
+                # batched evaluation, shrink all pending steps
+                step = torch.where(accepted, step, 0.5 * step)
+                continue
+            decrease = 1e-4 * (grad * (x_trial - x)).sum(dim=-1)
+            sufficient = ~accepted & (loss_trial <= loss + decrease)
+            x_new[sufficient] = x_trial[sufficient]
+            loss_new[sufficient] = loss_trial[sufficient]
+            grad_new[sufficient] = grad_trial[sufficient]
+            accepted |= sufficient
+            if accepted.all():
+                break
+            step = torch.where(accepted, step, 0.5 * step)
+        # update curvature history; pairs violating the curvature condition are
+        # dropped for the respective batch element
+        s, y = x_new - x, grad_new - grad
+        ys = (y * s).sum(dim=-1)
+        valid = ys > 1e-10
+        rho = torch.where(valid, ys.clamp_min(1e-10).reciprocal(), torch.zeros_like(ys))
+        gamma = torch.where(valid, ys / (y * y).sum(dim=-1).clamp_min(1e-10), gamma)
+        s_hist.append(s)
+        y_hist.append(y)
+        rho_hist.append(rho)
+        if len(s_hist) > optim_options["history_size"]:
+            s_hist.pop(0)
+            y_hist.pop(0)
+            rho_hist.pop(0)
+        # check convergence separately for each batch element
+        rel_change = (loss - loss_new) / torch.max(
+            torch.max(loss.abs(), loss_new.abs()), torch.ones_like(loss)
+        )
+        proj_grad = torch.max(torch.min(x_new - grad_new, upper), lower) - x_new
+        converged = (
+            converged
+            | ~accepted
+            | (rel_change <= optim_options["ftol"])
+            | (proj_grad.abs().max(dim=-1)[0] <= optim_options["gtol"])
+        )
+        x, loss, grad = x_new, loss_new, grad_new
+        if optim_options["disp"] and (
+            (i + 1) % 10 == 0 or i == (optim_options["maxiter"] - 1)
+        ):
+            print(
+                f"Iter {i + 1}/{optim_options['maxiter']}: {loss.sum().item()} "
+                f"({converged.sum().item()}/{converged.numel()} converged)"
+            )
+        if track_iterations:
+            iterations.append(
+                OptimizationIteration(i, loss.sum().item(), time.time() - t1)
+            )
+        if converged.all():
+            break
+    # set parameters to the final (accepted) iterates
+    with torch.no_grad():
+        for p, x_p in zip(params, x.split(sizes, dim=-1)):
+            p.copy_(x_p.view_as(p))
+    return mll, iterations
+
+
+def fit_gpytorch_hmc(
+    mll: MarginalLogLikelihood,
+    bounds: Optional[ParameterBounds] = None,
+    options: Optional[Dict[str, Any]] = None,
+    track_iterations: bool = True,
+) -> Tuple[MarginalLogLikelihood, List[OptimizationIteration]]:
+    r"""Sample the hyperparameters of a batched gpytorch model using HMC.
+
+    Runs one Hamiltonian Monte Carlo chain per batch element of the model, so
+    that all chains are advanced jointly in a single batched MLL evaluation per
+    leapfrog step. The step size of each chain is adapted separately during
+    warmup using dual averaging. After sampling, the batch elements of the
+    model hold the final states of the chains, i.e. one approximate sample from
+    the hyperparameter posterior per batch element.
+
+    The model and likelihood in mll must already be in train mode, and all
+    parameters must have the model's batch shape as leading dimensions. Bounds
+    are handled by reflecting the trajectories at the boundaries.
+
+    Args:
+        mll: ExactMarginalLogLikelihood defining the (unnormalized) log
+            posterior density of the hyperparameters.
+        bounds: A ParameterBounds dictionary mapping parameter names to tuples
+            of lower and upper bounds. Bounds specified here take precedence
+            over bounds on the same parameters specified in the constraints
+            registered with the module.
+        options: options for sampling. Options can include: "num_warmup" (the
+            number of warmup transitions, default: 100), "num_iterations" (the
+            number of transitions after warmup, default: 50), "num_leapfrog" (the
+            number of leapfrog steps per transition, default: 8), "step_size"
+            (the initial step size, default: 0.1), "target_accept" (the target
+            acceptance rate for step size adaptation, default: 0.8) and "disp".
+        track_iterations: Track the (mean) potential energy and wall time for
+            each transition.
+
+    Returns:
+        2-element tuple containing
+
+        - mll with parameters set to the final states of the chains.
+        - List of OptimizationIteration objects with information on each
+          transition. If track_iterations is False, this will be an empty list.
+
+    Example:
+        >>> gp = FullyBayesianSingleTaskGP(train_X, train_Y, num_samples=16)
+        >>> mll = ExactMarginalLogLikelihood(gp.likelihood, gp)
+        >>> mll.train()
+        >>> fit_gpytorch_hmc(mll)
+        >>> mll.eval()
+    """
+    hmc_options = {
+        "num_warmup": 100,
+        "num_iterations": 50,
+        "num_leapfrog": 8,
+        "step_size": 0.1,
+        "target_accept": 0.8,
+        "disp": True,
+    }
+    hmc_options.update(options or {})
+    bounds_ = _get_parameter_bounds(mll=mll, bounds=bounds)
+    names, params = zip(*mll.named_parameters())
+    num_data = mll.model.train_targets.size(-1)
+    # the chains move in the space of the raw parameters, so the densities of
+    # the constrained (transformed) parameters require a log-Jacobian term
+    constraints = {
+        name: constraint
+        for name, _, constraint in mll.named_parameters_and_constraints()
+        if constraint is not None and constraint.enforced
+    }
+    transformed = [
+        (p, constraints[name]) for name, p in zip(names, params) if name in constraints
+    ]
+
+    def potential_and_grad() -> Tuple[Tensor, List[Tensor]]:
+        log_prob = _get_batch_mll(mll) * num_data
+        for p, constraint in transformed:
+            log_prob = log_prob + _get_log_jacobian(
+                param=p, constraint=constraint, batch_shape=log_prob.shape
+            )
+        potential = -log_prob
+        grads = torch.autograd.grad(potential.sum(), params, allow_unused=True)
+        grads = [torch.zeros_like(p) if g is None else g for p, g in zip(params, grads)]
+        return potential.detach(), grads
+
+    potential, grads = potential_and_grad()
+    batch_shape = potential.shape
+    if any(p.shape[: len(batch_shape)] != batch_shape for p in params):
+        raise UnsupportedError(
+            "HMC requires all parameters to have the model's batch shape as "
+            "leading dimensions."
+        )
+
+    def expand(t: Tensor, p: Tensor) -> Tensor:
+        # expand a `batch_shape`-dim tensor to the shape of the parameter p
+        return t.view(batch_shape + torch.Size([1] * (p.dim() - len(batch_shape))))
+
+    def kinetic(momenta: List[Tensor]) -> Tensor:
+        return sum(0.5 * m.pow(2).view(*batch_shape, -1).sum(dim=-1) for m in momenta)
+
+    # dual averaging state for step size adaptation (Hoffman & Gelman, 2014)
+    step_size = torch.full_like(potential, hmc_options["step_size"])
+    mu = torch.log(10 * step_size)
+    log_step_size_avg = torch.zeros_like(potential)
+    h_avg = torch.zeros_like(potential)
+    gamma, t0, kappa = 0.05, 10, 0.75
+
+    num_warmup = hmc_options["num_warmup"]
+    num_total = num_warmup + hmc_options["num_iterations"]
+    iterations = []
+    t1 = time.time()
+    for i in range(num_total):
+        theta0 = [p.detach().clone() for p in params]
+        potential0, grads0 = potential, grads
+        momenta = [torch.randn_like(p) for p in params]
+        hamiltonian0 = potential0 + kinetic(momenta)
+        # chains whose trajectory hit a non-PSD training covariance are reset to
+        # their initial state, halted for the rest of the trajectory and rejected
+        diverged = torch.zeros(batch_shape, dtype=torch.bool, device=potential.device)
+        # leapfrog integration
+        for _ in range(hmc_options["num_leapfrog"]):
+            chain_step_size = torch.where(
+                diverged, torch.zeros_like(step_size), step_size
+            )
+            with torch.no_grad():
+                for name, p, m, g in zip(names, params, momenta, grads):
+                    eps = expand(chain_step_size, p)
+                    m.sub_(0.5 * eps * g)
+                    p.add_(eps * m)
+                    if name in bounds_:
+                        _reflect(p, m, *bounds_[name])
+            try:
+                potential, grads = potential_and_grad()
+            except RuntimeError:
+                failed = _get_non_psd_chains(mll=mll, batch_shape=batch_shape)
+                if not failed.any():
+                    raise
+                diverged |= failed
+                with torch.no_grad():
+                    for p, p0 in zip(params, theta0):
+                        p.copy_(torch.where(expand(failed, p), p0, p))
+                potential, grads = potential_and_grad()
+            with torch.no_grad():
+                for p, m, g in zip(params, momenta, grads):
+                    m.sub_(0.5 * expand(chain_step_size, p) * g)
+        # Metropolis correction
+        with torch.no_grad():
+            log_accept = hamiltonian0 - potential - kinetic(momenta)
+            log_accept[torch.isnan(log_accept) | diverged] = -math.inf
+            accept_prob = log_accept.clamp_max(0.0).exp()
+            accept = torch.rand_like(accept_prob) < accept_prob
+            for p, p0 in zip(params, theta0):
+                p.data = torch.where(expand(accept, p), p.data, p0)
+            potential = torch.where(accept, potential, potential0)
+            grads = [
+                torch.where(expand(accept, g), g, g0) for g, g0 in zip(grads, grads0)
+            ]
+            if i < num_warmup:
+                m = i + 1
+                h_avg = (1 - 1 / (m + t0)) * h_avg + (
+                    hmc_options["target_accept"] - accept_prob
+                ) / (m + t0)
+                log_step_size = mu - math.sqrt(m) / gamma * h_avg
+                eta = m ** -kappa
+                log_step_size_avg = eta * log_step_size + (1 - eta) * log_step_size_avg
+                step_size = log_step_size.exp()
+                if i == num_warmup - 1:
+                    step_size = log_step_size_avg.exp()
+        if hmc_options["disp"] and ((i + 1) % 10 == 0 or i == num_total - 1):
+            print(
+                f"Iter {i + 1}/{num_total}: {potential.mean().item()} "
+                f"(acceptance rate: {accept.float().mean().item()})"
+            )
+        if track_iterations:
+            iterations.append(
+                OptimizationIteration(i, potential.mean().item(), time.time() - t1)
+            )
+    return mll, iterations
+
+
 def fit_gpytorch_scipy(
     mll: MarginalLogLikelihood,
     bounds: Optional[ParameterBounds] = None,
@@ -233,3 +769,99 @@ def _scipy_objective_and_grad(
             grad.append(t.detach().view(-1).cpu().double().clone().numpy())
     mll.zero_grad()
     return loss.item(), np.concatenate(grad)
+
+
+def _get_parameter_bounds(
+    mll: MarginalLogLikelihood, bounds: Optional[ParameterBounds] = None
+) -> ParameterBounds:
+    r"""Collect the bounds of the parameters of an MLL module.
+
+    Args:
+        mll: The MarginalLogLikelihood module.
+        bounds: A ParameterBounds dictionary of user-supplied bounds. These take
+            precedence over the bounds from constraints registered with the module.
+
+    Returns:
+        A ParameterBounds dictionary containing the bounds for all parameters
+        with non-enforced constraints and all user-supplied bounds.
+    """
+    # get bounds specified in model (if any)
+    bounds_: ParameterBounds = {}
+    if hasattr(mll, "named_parameters_and_constraints"):
+        for param_name, _, constraint in mll.named_parameters_and_constraints():
+            if constraint is not None and not constraint.enforced:
+                bounds_[param_name] = constraint.lower_bound, constraint.upper_bound
+
+    # update with user-supplied bounds (overwrites if already exists)
+    if bounds is not None:
+        bounds_.update(bounds)
+    return bounds_
+
+
+def _get_log_jacobian(
+    param: Tensor, constraint: Interval, batch_shape: torch.Size
+) -> Tensor:
+    r"""Compute the log-Jacobian of the transform of a constrained parameter.
+
+    Args:
+        param: The raw (unconstrained) parameter.
+        constraint: The (enforced) constraint of the parameter, whose transform
+            is applied elementwise.
+        batch_shape: The batch shape of the model.
+
+    Returns:
+        A `batch_shape`-dim tensor of the log absolute determinants of the
+        Jacobians of the transform (differentiable w.r.t. `param`).
+    """
+    with torch.enable_grad():
+        value = constraint.transform(param)
+        derivative = torch.autograd.grad(value.sum(), param, create_graph=True)[0]
+    return derivative.abs().log().view(*batch_shape, -1).sum(dim=-1)
+
+
+def _get_non_psd_chains(
+    mll: ExactMarginalLogLikelihood, batch_shape: torch.Size
+) -> Tensor:
+    r"""Determine the batch elements with a non-PSD training covariance.
+
+    Args:
+        mll: The ExactMarginalLogLikelihood of a batched model in train mode.
+        batch_shape: The batch shape of the model.
+
+    Returns:
+        A `batch_shape`-dim boolean tensor indicating the batch elements for
+        which the Cholesky factorization of the training covariance fails.
+    """
+    model = mll.model
+    train_inputs = model.train_inputs
+    with torch.no_grad():
+        covar = mll.likelihood(model(*train_inputs), *train_inputs).covariance_matrix
+    covar = covar.view(-1, *covar.shape[-2:])
+    failed = torch.zeros(covar.size(0), dtype=torch.bool, device=covar.device)
+    for j, covar_j in enumerate(covar):
+        try:
+            psd_safe_cholesky(covar_j)
+        except RuntimeError:
+            failed[j] = True
+    return failed.view(batch_shape)
+
+
+def _reflect(
+    param: Tensor, momentum: Tensor, lower: Optional[float], upper: Optional[float]
+) -> None:
+    r"""Reflect a parameter (and its momentum) at its bounds in-place.
+
+    Args:
+        param: The parameter tensor.
+        momentum: The momentum tensor associated with the parameter.
+        lower: The lower bound of the parameter (or None).
+        upper: The upper bound of the parameter (or None).
+    """
+    if lower is not None:
+        below = param < lower
+        param[below] = 2 * lower - param[below]
+        momentum[below] = -momentum[below]
+    if upper is not None:
+        above = param > upper
+        param[above] = 2 * upper - param[above]
+        momentum[above] = -momentum[above]
@@ -14,6 +14,8 @@ from gpytorch.mlls.sum_marginal_log_likelihood import SumMarginalLogLikelihood
 from gpytorch.mlls.variational_elbo import VariationalELBO
 from torch import Tensor
 
+from ..exceptions.errors import UnsupportedError
+
 
 def check_convergence(
     loss_trajectory: List[float],
@@ -42,6 +44,38 @@ def check_convergence(
         return False
 
 
+def check_batch_convergence(
+    loss_trajectory: List[Tensor], options: Dict[str, Union[float, str]]
+) -> Tensor:
+    r"""Check convergence of each batch element of a batched optimization problem.
+
+    A batch element is considered converged if the relative decrease of its loss
+    over the last `window` iterations falls below `ftol`, or if the maximum
+    number of iterations has been reached.
+
+    Args:
+        loss_trajectory: A list containing the `batch_shape`-dim Tensor of
+            losses at each iteration.
+        options: dictionary of options. Supported are "maxiter" (default: 50),
+            "ftol" (default: 1e-5) and "window" (default: 10).
+
+    Returns:
+        A `batch_shape`-dim boolean Tensor indicating which batch elements have
+        converged.
+    """
+    maxiter: int = options.get("maxiter", 50)
+    ftol: float = options.get("ftol", 1e-5)
+    window: int = options.get("window", 10)
+    current = loss_trajectory[-1]
+    if len(loss_trajectory) >= maxiter:
+        return torch.ones_like(current, dtype=torch.bool)
+    if len(loss_trajectory) <= window:
+        return torch.zeros_like(current, dtype=torch.bool)
+    previous = loss_trajectory[-window - 1]
+    rel_decrease = (previous - current) / current.abs().clamp_min(1.0)
+    return rel_decrease < ftol
+
+
 def columnwise_clamp(
     X: Tensor,
     lower: Optional[Union[float, Tensor]] = None,
@@ -171,6 +205,44 @@ def _get_extra_mll_args(
         raise ValueError("Do not know how to optimize MLL type.")
 
 
+def _get_batch_mll(mll: MarginalLogLikelihood) -> Tensor:
+    r"""Evaluate the marginal log likelihood separately for each model batch.
+
+    GPyTorch's `ExactMarginalLogLikelihood` adds the log prior densities of all
+    batch elements to the MLL of each batch element. Here, each prior term is
+    only reduced over its non-batch dimensions, so that the batch elements of
+    the result are fully decoupled objectives.
+
+    Args:
+        mll: An ExactMarginalLogLikelihood module. The model must be in train
+            mode.
+
+    Returns:
+        A `batch_shape`-dim Tensor containing the marginal log likelihood of
+        each batch element (normalized by the number of training points).
+    """
+    if not isinstance(mll, ExactMarginalLogLikelihood):
+        raise UnsupportedError(
+            "Batch MLLs are only supported for ExactMarginalLogLikelihood."
+        )
+    model = mll.model
+    train_inputs, train_targets = model.train_inputs, model.train_targets
+    output = mll.likelihood(model(*train_inputs), *train_inputs)
+    res = output.log_prob(train_targets)
+    for added_loss_term in model.added_loss_terms():
+        res = res + added_loss_term.loss()
+    batch_shape = res.shape
+    for _, prior, closure, _ in mll.named_priors():
+        log_prob = prior.log_prob(closure())
+        if log_prob.shape[: len(batch_shape)] == batch_shape:
+            log_prob = log_prob.view(*batch_shape, -1).sum(dim=-1)
+        else:
+            # parameter shared across batches
+            log_prob = log_prob.sum()
+        res = res + log_prob
+    return res.div(train_targets.size(-1))
+
+
 def _filter_kwargs(function: Callable, **kwargs: Any) -> Any:
     r"""Filter out kwargs that are not applicable for a given function.
     Return a copy of given kwargs dict with only the required kwargs."""
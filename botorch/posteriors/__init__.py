@@ -1,7 +1,13 @@
 #! /usr/bin/env python3
 
-from .gpytorch import GPyTorchPosterior
+from .fully_bayesian import FullyBayesianPosterior
+from .gpytorch import GPyTorchPosterior, IndependentOutputPosterior
 from .posterior import Posterior
 
 
-__all__ = ["GPyTorchPosterior", "Posterior"]
+__all__ = [
+    "FullyBayesianPosterior",
+    "GPyTorchPosterior",
+    "IndependentOutputPosterior",
+    "Posterior",
+]
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+
+r"""
+Posterior Module to be used with fully Bayesian GPyTorch models.
+"""
+
+from typing import Optional
+
+import gpytorch
+import torch
+from gpytorch.distributions import MultivariateNormal
+from torch import Tensor
+
+from .gpytorch import GPyTorchPosterior
+
+
+class FullyBayesianPosterior(GPyTorchPosterior):
+    r"""A posterior given by an equally weighted mixture of Gaussian posteriors.
+
+    The mixture components correspond to the hyperparameter samples of a fully
+    Bayesian model and live in the last batch dimension of the underlying
+    multivariate Normal. This dimension is marginalized out, i.e. the event
+    shape of this posterior does not include it.
+    """
+
+    def __init__(self, mvn: MultivariateNormal) -> None:
+        r"""A posterior given by an equally weighted mixture of Gaussian posteriors.
+
+        Args:
+            mvn: A GPyTorch MultivariateNormal with batch shape
+                `batch_shape x num_samples`, where the last batch dimension
+                indexes the mixture components.
+        """
+        super().__init__(mvn=mvn)
+        self.num_samples = mvn.batch_shape[-1]
+
+    @property
+    def event_shape(self) -> torch.Size:
+        r"""The event shape (i.e. the shape of a single sample) of the posterior."""
+        return self.mvn.batch_shape[:-1] + self.mvn.event_shape + torch.Size([1])
+
+    def rsample(
+        self,
+        sample_shape: Optional[torch.Size] = None,
+        base_samples: Optional[Tensor] = None,
+    ) -> Tensor:
+        r"""Sample from the posterior (with gradients).
+
+        The `i`-th sample (in the flattened `sample_shape`) is drawn from the
+        mixture component `i mod num_samples`, which stratifies the samples
+        across the mixture components and keeps the samples deterministic given
+        the `base_samples`. If the number of samples is not a multiple of
+        `num_samples`, the first components are selected once more than the
+        remaining ones.
+
+        Args:
+            sample_shape: A `torch.Size` object specifying the sample shape. To
+                draw `n` samples, set to `torch.Size([n])`. To draw `b` batches
+                of `n` samples each, set to `torch.Size([b, n])`.
+            base_samples: An (optional) Tensor of `N(0, I)` base samples of
+                appropriate dimension, typically obtained from a `Sampler`.
+                This is used for deterministic optimization.
+
+        Returns:
+            A `sample_shape x event_shape`-dim Tensor of samples from the posterior.
+        """
+        if sample_shape is None:
+            sample_shape = torch.Size([1])
+        num_mc = sample_shape.numel()
+        if base_samples is None:
+            base_samples = torch.randn(
+                sample_shape + self.event_shape, device=self.device, dtype=self.dtype
+            )
+        elif base_samples.shape[: len(sample_shape)] != sample_shape:
+            raise RuntimeError("sample_shape disagrees with shape of base_samples.")
+        # use the same base samples for all mixture components
+        base_samples = base_samples.expand(sample_shape + self.event_shape)
+        base_samples = base_samples.squeeze(-1).unsqueeze(-2)
+        base_samples = base_samples.expand(sample_shape + self.mvn.loc.shape)
+        with gpytorch.settings.fast_computations(covar_root_decomposition=False):
+            samples = self.mvn.rsample(
+                sample_shape=sample_shape, base_samples=base_samples
+            )
+        # select mixture component `i mod num_samples` for the `i`-th sample
+        component = torch.arange(num_mc, device=self.device) % self.num_samples
+        component = component.view(
+            sample_shape + torch.Size([1] * len(self.event_shape))
+        )
+        component = component.expand(*samples.shape[:-2], 1, samples.shape[-1])
+        samples = samples.gather(dim=-2, index=component).squeeze(-2)
+        return samples.unsqueeze(-1)
+
+    @property
+    def mean(self) -> Tensor:
+        r"""The posterior mean."""
+        return self.mvn.mean.mean(dim=-2).unsqueeze(-1)
+
+    @property
+    def variance(self) -> Tensor:
+        r"""The posterior variance."""
+        mean = self.mvn.mean
+        mixture_mean = mean.mean(dim=-2, keepdim=True)
+        variance = (self.mvn.variance + (mean - mixture_mean).pow(2)).mean(dim=-2)
+        return variance.unsqueeze(-1)
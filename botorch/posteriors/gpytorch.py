@@ -97,3 +97,114 @@ class GPyTorchPosterior(Posterior):
         if not self._is_mt:
             variance = variance.unsqueeze(-1)
         return variance
+
+
+class IndependentOutputPosterior(GPyTorchPosterior):
+    r"""A posterior over independent outputs represented by a batched MVN.
+
+    Rather than representing the joint distribution over `q` points and `o`
+    independent outputs as a `MultitaskMultivariateNormal` with a block-diagonal
+    `(q * o) x (q * o)` covariance, this posterior keeps a single multivariate
+    Normal with the outputs in one of its batch dimensions. Sampling thus only
+    requires the `o` (batched) `q x q` covariance roots. The equivalent
+    `MultitaskMultivariateNormal` is constructed lazily when accessing `mvn`.
+    """
+
+    def __init__(self, mvn: MultivariateNormal, output_dim: int) -> None:
+        r"""A posterior over independent outputs represented by a batched MVN.
+
+        Args:
+            mvn: A GPyTorch MultivariateNormal with `o` outputs in the batch
+                dimension `output_dim`, i.e. with a mean of shape
+                `batch_shape_1 x o x batch_shape_2 x q`.
+            output_dim: The (non-negative) index of the output dimension in the
+                shape of the mean of `mvn`.
+        """
+        super().__init__(mvn=mvn)
+        self.output_dim = output_dim
+        self._is_mt = True
+
+    @property
+    def mvn(self) -> MultitaskMultivariateNormal:
+        r"""The equivalent MultitaskMultivariateNormal (constructed lazily)."""
+        if self._mvn is None:
+            mvn, dim = self.batched_mvn, self.output_dim
+            mean, covar = mvn.mean, mvn.lazy_covariance_matrix
+            mvns = [
+                MultivariateNormal(
+                    mean.select(dim, t), covar[(slice(None),) * dim + (t,)]
+                )
+                for t in range(mean.shape[dim])
+            ]
+            self._mvn = MultitaskMultivariateNormal.from_independent_mvns(mvns=mvns)
+        return self._mvn
+
+    @mvn.setter
+    def mvn(self, mvn: MultivariateNormal) -> None:
+        r"""Set the batched MVN (with the outputs in batch dimension `output_dim`)."""
+        self.batched_mvn = mvn
+        self._mvn: Optional[MultitaskMultivariateNormal] = None
+
+    @property
+    def device(self) -> torch.device:
+        r"""The torch device of the posterior."""
+        return self.batched_mvn.loc.device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        r"""The torch dtype of the posterior."""
+        return self.batched_mvn.loc.dtype
+
+    @property
+    def event_shape(self) -> torch.Size:
+        r"""The event shape (i.e. the shape of a single sample) of the posterior."""
+        shape, dim = self.batched_mvn.loc.shape, self.output_dim
+        return shape[:dim] + shape[dim + 1 :] + shape[dim : dim + 1]
+
+    def rsample(
+        self,
+        sample_shape: Optional[torch.Size] = None,
+        base_samples: Optional[Tensor] = None,
+    ) -> Tensor:
+        r"""Sample from the posterior (with gradients).
+
+        Args:
+            sample_shape: A `torch.Size` object specifying the sample shape. To
+                draw `n` samples, set to `torch.Size([n])`. To draw `b` batches
+                of `n` samples each, set to `torch.Size([b, n])`.
+            base_samples: An (optional) Tensor of `N(0, I)` base samples of
+                appropriate dimension, typically obtained from a `Sampler`.
+                This is used for deterministic optimization.
+
+        Returns:
+            A `sample_shape x event_shape`-dim Tensor of samples from the posterior.
+        """
+        if sample_shape is None:
+            sample_shape = torch.Size([1])
+        dim = len(sample_shape) + self.output_dim
+        if base_samples is not None:
+            if base_samples.shape[: len(sample_shape)] != sample_shape:
+                raise RuntimeError("sample_shape disagrees with shape of base_samples.")
+            # get base_samples to the correct shape and move the output dimension
+            base_samples = base_samples.expand(sample_shape + self.event_shape)
+            base_samples = base_samples.unsqueeze(dim).transpose(dim, -1).squeeze(-1)
+        with gpytorch.settings.fast_computations(covar_root_decomposition=False):
+            samples = self.batched_mvn.rsample(
+                sample_shape=sample_shape, base_samples=base_samples
+            )
+        return _move_dim_last(samples, dim=dim)
+
+    @property
+    def mean(self) -> Tensor:
+        r"""The posterior mean."""
+        return _move_dim_last(self.batched_mvn.mean, dim=self.output_dim)
+
+    @property
+    def variance(self) -> Tensor:
+        r"""The posterior variance."""
+        return _move_dim_last(self.batched_mvn.variance, dim=self.output_dim)
+
+
+def _move_dim_last(X: Tensor, dim: int) -> Tensor:
+    r"""Move the (non-negative) dimension `dim` of X to the last dimension."""
+    return X.unsqueeze(-1).transpose(dim, -1).squeeze(dim)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+r"""
+Utilities for updating Cholesky factorizations.
+"""
+
+import torch
+from gpytorch.utils.cholesky import psd_safe_cholesky
+from torch import Tensor
+
+
+def cholesky_extend(L: Tensor, K12: Tensor, K22: Tensor) -> Tensor:
+    r"""Extend a Cholesky factorization by `k` additional rows and columns.
+
+    Given the lower triangular Cholesky factor `L` of a `n x n` matrix `K11`,
+    computes the Cholesky factor of the `(n + k) x (n + k)` matrix
+    `[[K11, K12], [K12^T, K22]]` in `O(n^2 k)` (rather than `O((n + k)^3)`)
+    operations.
+
+    Args:
+        L: A `batch_shape x n x n` lower triangular Cholesky factor of `K11`.
+        K12: A `batch_shape x n x k` tensor of cross-covariances.
+        K22: A `batch_shape x k x k` covariance matrix of the new rows.
+
+    Returns:
+        The `batch_shape x (n + k) x (n + k)` lower triangular Cholesky factor of
+        the extended matrix.
+
+    Example:
+        >>> K = X @ X.t() + torch.eye(5)
+        >>> L = torch.cholesky(K[:3, :3])
+        >>> L_ext = cholesky_extend(L, K[:3, 3:], K[3:, 3:])  # cholesky(K)
+    """
+    batch_shape = (L[..., 0, 0] + K12[..., 0, 0] + K22[..., 0, 0]).shape
+    L = L.expand(batch_shape + L.shape[-2:])
+    K12 = K12.expand(batch_shape + K12.shape[-2:])
+    K22 = K22.expand(batch_shape + K22.shape[-2:])
+    # S = L^-1 K12, such that the Schur complement is K22 - S^T S
+    S = torch.triangular_solve(K12, L, upper=False)[0]
+    L22 = psd_safe_cholesky(K22 - S.transpose(-1, -2) @ S)
+    top = torch.cat([L, torch.zeros_like(K12)], dim=-1)
+    bottom = torch.cat([S.transpose(-1, -2), L22], dim=-1)
+    return torch.cat([top, bottom], dim=-2)
+
+
+def cholesky_update(L: Tensor, x: Tensor) -> Tensor:
+    r"""Rank-one update of a Cholesky factorization.
+
+    Given the lower triangular Cholesky factor `L` of a matrix `K`, computes the
+    Cholesky factor of `K + x x^T` in `O(n^2)` operations.
+
+    The update applies a sequence of Givens rotations, each of which depends on
+    the previous one, so it cannot be vectorized across columns: it performs `n`
+    (Python-level) iterations of `O(n)` operations each, which are vectorized
+    across rows and batches only. For small `n`, or on GPUs where the per-kernel
+    launch overhead dominates, refactorizing `L L^T + x x^T` (`O(n^3)`
+    operations in a single call) may be faster.
+
+    Args:
+        L: A `batch_shape x n x n` lower triangular Cholesky factor of `K`.
+        x: A `batch_shape x n` tensor.
+
+    Returns:
+        The `batch_shape x n x n` lower triangular Cholesky factor of `K + x x^T`.
+
+    Example:
+        >>> L = torch.cholesky(K)
+        >>> L_up = cholesky_update(L, x)  # cholesky(K + x.ger(x))
+    """
+    L, x = L.clone(), x.clone()
+    for k in range(L.size(-1)):
+        L_kk, x_k = L[..., k, k], x[..., k]
+        r = (L_kk.pow(2) + x_k.pow(2)).sqrt()
+        c, s = (r / L_kk).unsqueeze(-1), (x_k / L_kk).unsqueeze(-1)
+        L[..., k, k] = r
+        L[..., k + 1 :, k] = (L[..., k + 1 :, k] + s * x[..., k + 1 :]) / c
+        x[..., k + 1 :] = c * x[..., k + 1 :] - s * L[..., k + 1 :, k]
+    return L
+
+
+def cholesky_delete(L: Tensor, index: int) -> Tensor:
+    r"""Remove a row and column from a Cholesky factorization.
+
+    Given the lower triangular Cholesky factor `L` of a `n x n` matrix `K`,
+    computes the Cholesky factor of `K` with its `index`-th row and column
+    removed in `O(n^2)` operations, using a rank-one update of the trailing
+    block of the factor (see `cholesky_update` for its cost in practice).
+
+    Args:
+        L: A `batch_shape x n x n` lower triangular Cholesky factor of `K`.
+        index: The index of the row and column to remove.
+
+    Returns:
+        The `batch_shape x (n - 1) x (n - 1)` lower triangular Cholesky factor of
+        the reduced matrix.
+
+    Example:
+        >>> L = torch.cholesky(K)
+        >>> L_del = cholesky_delete(L, 0)  # cholesky(K[1:, 1:])
+    """
+    n = L.size(-1)
+    keep = torch.tensor([i for i in range(n) if i != index], device=L.device)
+    L_new = L.index_select(-2, keep).index_select(-1, keep)
+    if index < n - 1:
+        L_new[..., index:, index:] = cholesky_update(
+            L[..., index + 1 :, index + 1 :], L[..., index + 1 :, index]
+        )
+    return L_new
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+r"""
+Out-of-core (memory-mapped) tiled Cholesky factorizations.
+"""
+
+import math
+import os
+import tempfile
+import weakref
+from typing import Callable, List, Optional
+
+import numpy as np
+import torch
+from gpytorch.utils.cholesky import psd_safe_cholesky
+from torch import Tensor
+
+
+class TiledLowerMatrix:
+    r"""A lower triangular (or symmetric) matrix stored in a memory-mapped file.
+
+    The matrix is split into square tiles of size `tile_size`, and only the tiles
+    on and below the diagonal are stored, each one contiguously (so that reading
+    and writing a tile is a single sequential file access). If `n` is not a
+    multiple of `tile_size`, the trailing diagonal tile is padded with an
+    identity (which does not change Cholesky factors, solves or log
+    determinants). The file is deleted when the matrix is garbage collected.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        tile_size: int,
+        dtype: torch.dtype = torch.double,
+        directory: Optional[str] = None,
+    ) -> None:
+        r"""A lower triangular (or symmetric) matrix stored in a memory-mapped file.
+
+        Args:
+            n: The size of the `n x n` matrix.
+            tile_size: The size of the (square) tiles.
+            dtype: The dtype of the matrix.
+            directory: The directory of the memory-mapped file. If omitted, use
+                the default directory for temporary files.
+
+        Example:
+            >>> A = TiledLowerMatrix(n=40000, tile_size=2048, directory="/scratch")
+        """
+        self.n = n
+        self.tile_size = tile_size
+        self.num_tiles = math.ceil(n / tile_size)
+        self.dtype = dtype
+        fd, self.filename = tempfile.mkstemp(suffix=".tiles", dir=directory)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, os.remove, self.filename)
+        num_stored = self.num_tiles * (self.num_tiles + 1) // 2
+        self.data = np.memmap(
+            self.filename,
+            dtype=torch.empty(0, dtype=dtype).numpy().dtype,
+            mode="w+",
+            shape=(num_stored, tile_size, tile_size),
+        )
+        pad = self.num_tiles * tile_size - n
+        if pad > 0:
+            idcs = np.arange(tile_size - pad, tile_size)
+            self.data[-1, idcs, idcs] = 1
+
+    def tile_slice(self, i: int) -> slice:
+        r"""The (unpadded) rows of the matrix covered by the `i`-th row of tiles."""
+        return slice(i * self.tile_size, min((i + 1) * self.tile_size, self.n))
+
+    def get_tile(self, i: int, j: int) -> Tensor:
+        r"""Get the (padded) tile `(i, j)`, `j <= i`, as a memory-mapped tensor."""
+        return torch.from_numpy(self.data[self._index(i, j)])
+
+    def set_tile(self, i: int, j: int, value: Tensor) -> None:
+        r"""Write the (unpadded) tile `(i, j)`, `j <= i`, to the file."""
+        rows, cols = value.shape
+        self.data[self._index(i, j), :rows, :cols] = value.detach().cpu().numpy()
+
+    def _index(self, i: int, j: int) -> int:
+        if j > i:
+            raise IndexError("Only tiles on or below the diagonal are stored.")
+        return i * (i + 1) // 2 + j
+
+
+def tiled_matrix(
+    tile_fn: Callable[[slice, slice], Tensor],
+    n: int,
+    tile_size: int,
+    dtype: torch.dtype = torch.double,
+    directory: Optional[str] = None,
+) -> TiledLowerMatrix:
+    r"""Build the lower tiles of a symmetric matrix in a memory-mapped file.
+
+    Only a single tile is held in memory at a time.
+
+    Args:
+        tile_fn: A callable mapping slices of rows and columns to the
+            corresponding block of the matrix. Called for the tiles on and below
+            the diagonal.
+        n: The size of the `n x n` matrix.
+        tile_size: The size of the (square) tiles.
+        dtype: The dtype of the matrix.
+        directory: The directory of the memory-mapped file.
+
+    Returns:
+        The TiledLowerMatrix.
+
+    Example:
+        >>> A = tiled_matrix(lambda r, c: K[r, c], n=K.size(-1), tile_size=512)
+    """
+    A = TiledLowerMatrix(n=n, tile_size=tile_size, dtype=dtype, directory=directory)
+    for i in range(A.num_tiles):
+        for j in range(i + 1):
+            A.set_tile(i, j, tile_fn(A.tile_slice(i), A.tile_slice(j)))
+    return A
+
+
+def tiled_cholesky_(
+    A: TiledLowerMatrix, device: Optional[torch.device] = None
+) -> TiledLowerMatrix:
+    r"""Compute the Cholesky factorization of a tiled matrix in-place.
+
+    Uses a blocked (row-oriented) Cholesky factorization, in which the `i`-th row
+    of tiles of the factor is computed from the previously computed rows, so
+    that only a single row of tiles (`n x tile_size` elements) and one
+    additional tile are held in memory at a time. This requires
+    `O(n^3 / tile_size)` elements to be read from the file.
+
+    Args:
+        A: The TiledLowerMatrix holding the lower tiles of a positive definite
+            matrix. Overwritten by its lower triangular Cholesky factor.
+        device: The device used for the computations.
+
+    Returns:
+        The lower triangular Cholesky factor (i.e. `A`).
+
+    Example:
+        >>> L = tiled_cholesky_(tiled_matrix(tile_fn, n=40000, tile_size=2048))
+    """
+    for i in range(A.num_tiles):
+        row = [A.get_tile(i, k).to(device=device) for k in range(i)]
+        D = A.get_tile(i, i).to(device=device).tril()
+        D = D + D.tril(-1).t()
+        for L_ik in row:
+            D = D - L_ik @ L_ik.t()
+        L_ii = psd_safe_cholesky(D)
+        A.set_tile(i, i, L_ii)
+        for j in range(i + 1, A.num_tiles):
+            S = A.get_tile(j, i).to(device=device)
+            for k, L_ik in enumerate(row):
+                S = S - A.get_tile(j, k).to(device=device) @ L_ik.t()
+            # L_ji = S L_ii^-T
+            L_ji = torch.triangular_solve(S.t(), L_ii, upper=False)[0].t()
+            A.set_tile(j, i, L_ji)
+    return A
+
+
+def tiled_triangular_solve(
+    L: TiledLowerMatrix, B: Tensor, transpose: bool = False
+) -> Tensor:
+    r"""Solve a triangular system with a tiled Cholesky factor.
+
+    Uses blocked forward (or backward) substitution, reading each tile of the
+    factor once. The computations are performed on the device of `B`, and are
+    differentiable w.r.t. `B`.
+
+    Args:
+        L: The lower triangular TiledLowerMatrix (see `tiled_cholesky_`).
+        B: A `n x k` tensor of right hand sides.
+        transpose: If True, solve `L^T X = B`, otherwise solve `L X = B`.
+
+    Returns:
+        The `n x k` solution `X`.
+
+    Example:
+        >>> L = tiled_cholesky_(tiled_matrix(tile_fn, n=n, tile_size=1024))
+        >>> K_inv_B = tiled_triangular_solve(
+        >>>     L, tiled_triangular_solve(L, B), transpose=True
+        >>> )
+    """
+    pad = L.num_tiles * L.tile_size - L.n
+    B = torch.cat([B, torch.zeros(pad, B.size(-1), dtype=B.dtype, device=B.device)])
+    tkwargs = {"dtype": B.dtype, "device": B.device}
+    b = L.tile_size
+    X: List[Optional[Tensor]] = [None] * L.num_tiles
+    order = range(L.num_tiles)
+    for i in reversed(order) if transpose else order:
+        rhs = B[i * b : (i + 1) * b]
+        if transpose:
+            for k in range(i + 1, L.num_tiles):
+                rhs = rhs - L.get_tile(k, i).to(**tkwargs).t() @ X[k]
+        else:
+            for k in range(i):
+                rhs = rhs - L.get_tile(i, k).to(**tkwargs) @ X[k]
+        X[i] = torch.triangular_solve(
+            rhs, L.get_tile(i, i).to(**tkwargs), upper=False, transpose=transpose
+        )[0]
+    return torch.cat(X)[: L.n]
+
+
+def tiled_logdet(L: TiledLowerMatrix) -> Tensor:
+    r"""Compute the log determinant of `L L^T` for a tiled Cholesky factor `L`.
+
+    Args:
+        L: The lower triangular TiledLowerMatrix (see `tiled_cholesky_`).
+
+    Returns:
+        The log determinant of `L L^T` (a scalar tensor).
+    """
+    return 2 * sum(L.get_tile(i, i).diagonal().log().sum() for i in range(L.num_tiles))
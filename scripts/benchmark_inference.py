@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+r"""
+Benchmark the Cholesky and CG inference engines of a SingleTaskGP.
+
+For each number of training points `n`, reports the wall time (in ms) of
+evaluating the marginal log likelihood and its gradient (as done in each
+iteration of model fitting), and of computing the posterior mean and variance
+at a batch of test points (as done in acquisition function optimization),
+using each solver of `InferenceSettings`. The crossover point determines the
+default `max_cholesky_size` of the "auto" solver.
+"""
+
+import argparse
+import time
+
+import torch
+from botorch.models import SingleTaskGP
+from botorch.models.inference import InferenceSettings, inference_settings
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+
+
+def _time(fn, repeats):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+def benchmark(n, d, q, batch_size, repeats, device, dtype):
+    tkwargs = {"device": device, "dtype": dtype}
+    train_X = torch.rand(n, d, **tkwargs)
+    train_Y = torch.sin(6 * train_X).sum(dim=-1) + 0.1 * torch.randn(n, **tkwargs)
+    test_X = torch.rand(batch_size, q, d, **tkwargs)
+    results = {}
+    for solver in ("cholesky", "cg"):
+        model = SingleTaskGP(train_X, train_Y).to(**tkwargs)
+        model.inference_settings = InferenceSettings(solver=solver)
+        mll = ExactMarginalLogLikelihood(model.likelihood, model)
+
+        def fit_step():
+            mll.train()
+            mll.zero_grad()
+            with inference_settings(model.inference_settings):
+                output = model(*model.train_inputs)
+                loss = -mll(output, model.train_targets)
+            loss.backward()
+
+        def posterior():
+            # recompute the test caches (as after each model refit)
+            model.train()
+            model.eval()
+            posterior = model.posterior(test_X)
+            posterior.mean, posterior.variance
+
+        results[solver] = (_time(fit_step, repeats), _time(posterior, repeats))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GP inference engines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("-d", type=int, default=4, help="Input dimension.")
+    parser.add_argument("-q", type=int, default=1, help="Points per test batch.")
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cuda", action="store_true")
+    parser.add_argument("--double", action="store_true")
+    args = parser.parse_args()
+    device = torch.device("cuda" if args.cuda else "cpu")
+    dtype = torch.double if args.double else torch.float
+    row = "{:>6} {:>10} {:>10} {:>10} {:>10}"
+    print(row.format("n", "fit chol", "fit cg", "post chol", "post cg"))
+    for n in args.sizes:
+        res = benchmark(
+            n=n,
+            d=args.d,
+            q=args.q,
+            batch_size=args.batch_size,
+            repeats=args.repeats,
+            device=device,
+            dtype=dtype,
+        )
+        (fit_chol, post_chol), (fit_cg, post_cg) = res["cholesky"], res["cg"]
+        times = (f"{t:.1f}" for t in (fit_chol, fit_cg, post_chol, post_cg))
+        print(row.format(n, *times))
@@ -0,0 +1 @@
+#! /usr/bin/env python3
@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.models.gp_regression import FixedNoiseGP, SingleTaskGP
+from botorch.models.kernels import CachedDistanceMaternKernel
+from gpytorch.kernels import MaternKernel
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+
+
+class TestCachedDistanceMaternKernel(unittest.TestCase):
+    def test_cached_distance_matern_kernel(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for dtype in (torch.float, torch.double):
+            tkwargs = {"device": device, "dtype": dtype}
+            for nu in (0.5, 1.5, 2.5):
+                for ard_num_dims in (None, 2):
+                    # kernel batch shape `o x b`, inputs of batch shape `b`
+                    batch_shape = torch.Size([3, 2])
+                    kernel = CachedDistanceMaternKernel(
+                        nu=nu, ard_num_dims=ard_num_dims, batch_shape=batch_shape
+                    ).to(**tkwargs)
+                    expected_kernel = MaternKernel(
+                        nu=nu, ard_num_dims=ard_num_dims, batch_shape=batch_shape
+                    ).to(**tkwargs)
+                    with torch.no_grad():
+                        raw_lengthscale = torch.rand_like(kernel.raw_lengthscale)
+                        kernel.raw_lengthscale.copy_(raw_lengthscale)
+                        expected_kernel.raw_lengthscale.copy_(raw_lengthscale)
+                    X = torch.rand(2, 5, 2, **tkwargs)
+                    kernel.cache_inputs(X)
+                    self.assertIsNone(kernel._cached_sq_diffs)
+                    X_expanded = X.expand(3, 2, 5, 2)
+                    covar = kernel(X_expanded).evaluate()
+                    self.assertEqual(kernel._cached_sq_diffs.shape, (2, 5, 5, 2))
+                    expected = expected_kernel(X_expanded).evaluate()
+                    self.assertTrue(torch.allclose(covar, expected, atol=1e-6))
+                    # gradients w.r.t. the lengthscales match
+                    grad = torch.autograd.grad(covar.sum(), kernel.raw_lengthscale)
+                    expected_grad = torch.autograd.grad(
+                        expected.sum(), expected_kernel.raw_lengthscale
+                    )
+                    self.assertTrue(
+                        torch.allclose(grad[0], expected_grad[0], atol=1e-4)
+                    )
+                    # other inputs fall back to the standard computation
+                    kernel._cached_sq_diffs = None
+                    X_test = torch.rand(3, 2, 4, 2, **tkwargs)
+                    covar = kernel(X_test, X_expanded).evaluate()
+                    self.assertTrue(
+                        torch.allclose(
+                            covar,
+                            expected_kernel(X_test, X_expanded).evaluate(),
+                            atol=1e-6,
+                        )
+                    )
+                    diag = kernel(X_expanded, diag=True)
+                    self.assertEqual(diag.shape, torch.Size([3, 2, 5]))
+                    self.assertIsNone(kernel._cached_sq_diffs)
+
+    def test_cached_distance_matern_kernel_cuda(self):
+        if torch.cuda.is_available():
+            self.test_cached_distance_matern_kernel(cuda=True)
+
+    def test_cache_distances_models(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for dtype in (torch.float, torch.double):
+            tkwargs = {"device": device, "dtype": dtype}
+            train_X = torch.rand(10, 2, **tkwargs)
+            train_Y = torch.stack(
+                [torch.sin(train_X.sum(dim=-1)), torch.cos(train_X.sum(dim=-1))], dim=-1
+            )
+            train_Yvar = torch.full_like(train_Y, 0.01)
+            for model_cls, args in (
+                (SingleTaskGP, (train_X, train_Y)),
+                (FixedNoiseGP, (train_X, train_Y, train_Yvar)),
+            ):
+                model = model_cls(*args, cache_distances=True)
+                self.assertIsInstance(
+                    model.covar_module.base_kernel, CachedDistanceMaternKernel
+                )
+                expected_model = model_cls(*args)
+                self.assertNotIsInstance(
+                    expected_model.covar_module.base_kernel, CachedDistanceMaternKernel
+                )
+                mlls = []
+                for m in (model, expected_model):
+                    mll = ExactMarginalLogLikelihood(m.likelihood, m)
+                    mll.train()
+                    output = m(*m.train_inputs)
+                    mlls.append(mll(output, m.train_targets))
+                self.assertIsNotNone(model.covar_module.base_kernel._cached_sq_diffs)
+                self.assertTrue(torch.allclose(*mlls, atol=1e-5))
+
+    def test_cache_distances_models_cuda(self):
+        if torch.cuda.is_available():
+            self.test_cache_distances_models(cuda=True)
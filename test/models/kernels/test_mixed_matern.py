@@ -0,0 +1,48 @@
+#! /usr/bin/env python3
+
+import math
+import unittest
+
+import torch
+from botorch.models.kernels import MixedMaternKernel
+from gpytorch.kernels import MaternKernel, RBFKernel
+
+
+class TestMixedMaternKernel(unittest.TestCase):
+    def test_mixed_matern_kernel(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for dtype in (torch.float, torch.double):
+            tkwargs = {"device": device, "dtype": dtype}
+            nu = torch.tensor([0.5, 1.5, 2.5, math.inf], device=device)
+            kernel = MixedMaternKernel(
+                nu=nu, ard_num_dims=2, batch_shape=torch.Size([4])
+            ).to(**tkwargs)
+            self.assertEqual(kernel.lengthscale.shape, torch.Size([4, 1, 2]))
+            X = torch.rand(4, 5, 2, **tkwargs)
+            covar = kernel(X).evaluate()
+            self.assertEqual(covar.shape, torch.Size([4, 5, 5]))
+            # compare against the individual kernels
+            for i, nu_val in enumerate((0.5, 1.5, 2.5)):
+                expected = MaternKernel(nu=nu_val, ard_num_dims=2).to(**tkwargs)
+                self.assertTrue(
+                    torch.allclose(covar[i], expected(X[i]).evaluate(), atol=1e-6)
+                )
+            expected = RBFKernel(ard_num_dims=2).to(**tkwargs)
+            self.assertTrue(
+                torch.allclose(covar[3], expected(X[3]).evaluate(), atol=1e-6)
+            )
+            # test diag
+            diag = kernel(X, diag=True)
+            self.assertTrue(torch.allclose(diag, torch.ones(4, 5, **tkwargs)))
+            # test broadcasting with extra batch dimensions
+            X1 = torch.rand(3, 4, 2, 2, **tkwargs)
+            covar = kernel(X1, X).evaluate()
+            self.assertEqual(covar.shape, torch.Size([3, 4, 2, 5]))
+
+    def test_mixed_matern_kernel_cuda(self):
+        if torch.cuda.is_available():
+            self.test_mixed_matern_kernel(cuda=True)
+
+    def test_mixed_matern_kernel_invalid_nu(self):
+        with self.assertRaises(ValueError):
+            MixedMaternKernel(nu=torch.tensor([0.5, 1.0]), batch_shape=torch.Size([2]))
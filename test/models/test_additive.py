@@ -0,0 +1,96 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.acquisition.analytic import UpperConfidenceBound
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import AdditiveSingleTaskGP, InferenceSettings
+from botorch.models.additive import AdditiveComponentModel
+from botorch.optim.optimize import additive_optimize
+from botorch.posteriors import GPyTorchPosterior
+from gpytorch.kernels.kernel import AdditiveKernel
+
+
+def _get_data(n, **tkwargs):
+    train_X = torch.rand(n, 4, **tkwargs)
+    train_Y = torch.sin(6 * train_X[:, :2]).sum(dim=-1) + train_X[:, 2:].sum(dim=-1)
+    return train_X, train_Y.unsqueeze(-1)
+
+
+class TestAdditiveSingleTaskGP(unittest.TestCase):
+    def test_additive_single_task_gp(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda" if cuda else "cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X, train_Y = _get_data(20, **tkwargs)
+            # default groups
+            model = AdditiveSingleTaskGP(train_X, train_Y)
+            self.assertEqual(model.groups, [[0], [1], [2], [3]])
+            self.assertIsInstance(model.covar_module, AdditiveKernel)
+            self.assertEqual(len(model.covar_module.kernels), 4)
+            groups = [[0, 1], [3, 2]]
+            model = AdditiveSingleTaskGP(train_X, train_Y, groups=groups)
+            model.inference_settings = InferenceSettings(
+                solver="cholesky", fast_pred_var=False
+            )
+            for group, kernel in zip(groups, model.covar_module.kernels):
+                self.assertEqual(kernel.active_dims.tolist(), group)
+                self.assertEqual(
+                    kernel.base_kernel.lengthscale.shape, torch.Size([1, len(group)])
+                )
+            # the component posteriors decompose the posterior mean
+            test_X = torch.rand(3, 2, 4, **tkwargs)
+            posterior = model.posterior(test_X)
+            components = model.get_components()
+            self.assertEqual(len(components), 2)
+            component_means = []
+            for component, group in zip(components, groups):
+                self.assertIsInstance(component, AdditiveComponentModel)
+                self.assertEqual(component.group, group)
+                component_posterior = component.posterior(test_X[..., group])
+                self.assertIsInstance(component_posterior, GPyTorchPosterior)
+                self.assertEqual(component_posterior.mean.shape, torch.Size([3, 2, 1]))
+                self.assertTrue((component_posterior.variance > 0).all())
+                component_means.append(component_posterior.mean)
+            self.assertTrue(
+                torch.allclose(
+                    posterior.mean,
+                    model.mean_module.constant + sum(component_means),
+                    atol=1e-4,
+                )
+            )
+            # component posteriors of a frozen model use its caches
+            model.freeze()
+            frozen_components = model.get_components()
+            self.assertIs(frozen_components[0]._cache, model._prediction_cache)
+            model.unfreeze()
+            # acquisition functions on components can be optimized per group
+            bounds = torch.stack([torch.zeros(4, **tkwargs), torch.ones(4, **tkwargs)])
+            UCBs = [UpperConfidenceBound(c, beta=0.2) for c in components]
+            candidate = additive_optimize(
+                acq_functions=UCBs,
+                groups=groups,
+                bounds=bounds,
+                num_restarts=2,
+                raw_samples=8,
+                options={"maxiter": 5},
+            )
+            self.assertEqual(candidate.shape, torch.Size([1, 4]))
+            self.assertTrue((candidate >= 0).all() and (candidate <= 1).all())
+            # test errors
+            with self.assertRaises(UnsupportedError):
+                components[0].posterior(test_X[..., groups[0]], observation_noise=True)
+            with self.assertRaises(UnsupportedError):
+                AdditiveSingleTaskGP(train_X.expand(2, 20, 4), train_Y)
+            with self.assertRaises(UnsupportedError):
+                AdditiveSingleTaskGP(train_X, train_Y.repeat(1, 2))
+            for bad_groups in ([[0, 1], [1, 2, 3]], [[0, 1], [2]], [[0, 1, 2, 3], []]):
+                with self.assertRaises(ValueError):
+                    AdditiveSingleTaskGP(train_X, train_Y, groups=bad_groups)
+
+    def test_additive_single_task_gp_cuda(self):
+        if torch.cuda.is_available():
+            self.test_additive_single_task_gp(cuda=True)
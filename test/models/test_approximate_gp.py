@@ -0,0 +1,128 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.acquisition.monte_carlo import qExpectedImprovement
+from botorch.acquisition.objective import LinearMCObjective
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import SingleTaskVariationalGP
+from botorch.optim.fit import fit_gpytorch_torch
+from botorch.posteriors import GPyTorchPosterior, IndependentOutputPosterior
+from gpytorch.likelihoods.gaussian_likelihood import GaussianLikelihood
+from gpytorch.mlls.variational_elbo import VariationalELBO
+from torch.utils.data import DataLoader, TensorDataset
+
+
+def _get_data(n, num_outputs, **tkwargs):
+    train_X = torch.rand(n, 2, **tkwargs)
+    train_Y = torch.sin(6 * train_X.sum(dim=-1, keepdim=True))
+    train_Y = train_Y.repeat(1, num_outputs) + 0.1 * torch.randn(
+        n, num_outputs, **tkwargs
+    )
+    return train_X, train_Y.squeeze(-1) if num_outputs == 1 else train_Y
+
+
+class TestSingleTaskVariationalGP(unittest.TestCase):
+    def test_single_task_variational_gp(self, cuda=False):
+        for num_outputs in (1, 2):
+            for double in (False, True):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double if double else torch.float,
+                }
+                train_X, train_Y = _get_data(50, num_outputs, **tkwargs)
+                model = SingleTaskVariationalGP(train_X, train_Y, num_inducing=10)
+                self.assertIsInstance(model.likelihood, GaussianLikelihood)
+                self.assertEqual(model._num_outputs, num_outputs)
+                aug_batch_shape = torch.Size([2] if num_outputs == 2 else [])
+                inducing_points = model.variational_strategy.inducing_points
+                self.assertEqual(inducing_points.shape, aug_batch_shape + (10, 2))
+                self.assertEqual(inducing_points.dtype, tkwargs["dtype"])
+                # full-batch training
+                mll = VariationalELBO(model.likelihood, model, num_data=50)
+                mll.train()
+                _, iterations = fit_gpytorch_torch(
+                    mll, options={"maxiter": 5, "disp": False}
+                )
+                self.assertEqual(len(iterations), 5)
+                # minibatch training
+                loader = DataLoader(TensorDataset(train_X, train_Y), batch_size=16)
+                _, iterations = fit_gpytorch_torch(
+                    mll, options={"maxiter": 5, "disp": False}, data_loader=loader
+                )
+                self.assertEqual(len(iterations), 5)
+                # minibatches are moved to the dtype of the model
+                other_dtype = torch.float if double else torch.double
+                loader = DataLoader(
+                    TensorDataset(train_X.to(other_dtype), train_Y.to(other_dtype)),
+                    batch_size=16,
+                )
+                _, iterations = fit_gpytorch_torch(
+                    mll, options={"maxiter": 2, "disp": False}, data_loader=loader
+                )
+                self.assertEqual(len(iterations), 2)
+                # empty data loaders raise an error
+                loader = DataLoader(TensorDataset(train_X[:0], train_Y[:0]))
+                with self.assertRaises(ValueError):
+                    fit_gpytorch_torch(
+                        mll, options={"maxiter": 2, "disp": False}, data_loader=loader
+                    )
+                mll.eval()
+                # test posterior
+                for batch_shape in (torch.Size(), torch.Size([3])):
+                    X = torch.rand(batch_shape + torch.Size([4, 2]), **tkwargs)
+                    posterior = model.posterior(X)
+                    if num_outputs > 1:
+                        self.assertIsInstance(posterior, IndependentOutputPosterior)
+                    else:
+                        self.assertIsInstance(posterior, GPyTorchPosterior)
+                    expected_shape = batch_shape + torch.Size([4, num_outputs])
+                    self.assertEqual(posterior.mean.shape, expected_shape)
+                    self.assertEqual(posterior.variance.shape, expected_shape)
+                    self.assertTrue((posterior.variance > 0).all())
+                    samples = posterior.rsample(sample_shape=torch.Size([5]))
+                    self.assertEqual(samples.shape, torch.Size([5]) + expected_shape)
+                    posterior = model.posterior(X, observation_noise=True)
+                    self.assertEqual(posterior.mean.shape, expected_shape)
+                # test acquisition function gradients
+                X = torch.rand(3, 1, 2, **tkwargs, requires_grad=True)
+                objective = LinearMCObjective(torch.ones(num_outputs, **tkwargs))
+                acqf = qExpectedImprovement(model, best_f=0.0, objective=objective)
+                acqf(X).sum().backward()
+                self.assertEqual(X.grad.shape, X.shape)
+                # test custom inducing points
+                model = SingleTaskVariationalGP(
+                    train_X, train_Y, inducing_points=train_X[:5]
+                )
+                inducing_points = model.variational_strategy.inducing_points
+                self.assertEqual(inducing_points.shape, aug_batch_shape + (5, 2))
+                self.assertTrue(
+                    torch.equal(inducing_points, train_X[:5].expand_as(inducing_points))
+                )
+                # test error on batched training data
+                with self.assertRaises(UnsupportedError):
+                    SingleTaskVariationalGP(train_X.expand(2, 50, 2), train_Y)
+
+    def test_single_task_variational_gp_cuda(self):
+        if torch.cuda.is_available():
+            self.test_single_task_variational_gp(cuda=True)
+
+    def test_fit_single_task_variational_gp(self):
+        torch.manual_seed(0)
+        train_X, train_Y = _get_data(500, 1, dtype=torch.double)
+        model = SingleTaskVariationalGP(train_X, train_Y, num_inducing=32)
+        mll = VariationalELBO(model.likelihood, model, num_data=500)
+        loader = DataLoader(
+            TensorDataset(train_X, train_Y), batch_size=100, shuffle=True
+        )
+        mll.train()
+        fit_gpytorch_torch(
+            mll, options={"maxiter": 300, "disp": False, "lr": 0.01}, data_loader=loader
+        )
+        mll.eval()
+        test_X = torch.rand(20, 2, dtype=torch.double)
+        with torch.no_grad():
+            mean = model.posterior(test_X).mean.view(-1)
+        expected = torch.sin(6 * test_X.sum(dim=-1))
+        self.assertLess((mean - expected).abs().mean().item(), 0.2)
@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import (
+    FixedNoiseGP,
+    HeteroskedasticSingleTaskGP,
+    InferenceSettings,
+    SingleTaskGP,
+)
+from botorch.models.converter import batched_to_model_list, model_list_to_batched
+from botorch.models.model_list_gp_regression import ModelListGP
+from botorch.posteriors.gpytorch import IndependentOutputPosterior
+from gpytorch.priors import GammaPrior
+
+
+def _perturb(model):
+    with torch.no_grad():
+        for param in model.parameters():
+            param.add_(0.5 * torch.rand_like(param))
+    return model
+
+
+class TestConverter(unittest.TestCase):
+    def test_model_list_to_batched(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X = torch.rand(10, 2, **tkwargs)
+            train_Y1, train_Y2 = torch.sin(train_X).unbind(dim=-1)
+            train_Yvar = torch.full_like(train_Y1, 0.1)
+            test_X = torch.rand(3, 4, 2, **tkwargs)
+            for model_cls in (SingleTaskGP, FixedNoiseGP):
+                kwargs = {} if model_cls is SingleTaskGP else {"train_Yvar": train_Yvar}
+                gp1 = _perturb(model_cls(train_X, train_Y1, **kwargs))
+                gp2 = _perturb(model_cls(train_X, train_Y2, **kwargs))
+                # evaluating a sub-model adds stateless modules to its kernel
+                gp1.posterior(test_X)
+                list_gp = ModelListGP([gp1, gp2])
+                batch_gp = model_list_to_batched(list_gp)
+                self.assertIsInstance(batch_gp, model_cls)
+                self.assertEqual(batch_gp._num_outputs, 2)
+                posterior = batch_gp.posterior(test_X)
+                for i, gp in enumerate((gp1, gp2)):
+                    expected = gp.posterior(test_X)
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.mean[..., i : i + 1], expected.mean, atol=1e-4
+                        )
+                    )
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.variance[..., i : i + 1],
+                            expected.variance,
+                            atol=1e-4,
+                        )
+                    )
+                # test unpacking the hyperparameters
+                list_gp_2 = batched_to_model_list(batch_gp)
+                self.assertIsInstance(list_gp_2, ModelListGP)
+                for gp, gp_2 in zip(list_gp.models, list_gp_2.models):
+                    self.assertIsInstance(gp_2, model_cls)
+                    for (n, p), (n_2, p_2) in zip(
+                        gp.state_dict().items(), gp_2.state_dict().items()
+                    ):
+                        self.assertEqual(n, n_2)
+                        self.assertTrue(torch.equal(p, p_2))
+                    self.assertTrue(torch.equal(gp.train_targets, gp_2.train_targets))
+                if model_cls is FixedNoiseGP:
+                    self.assertTrue(
+                        torch.equal(
+                            list_gp_2.models[1].likelihood.noise_covar.noise, train_Yvar
+                        )
+                    )
+            # a single-output batched model is wrapped as is
+            self.assertIs(batched_to_model_list(gp1).models[0], gp1)
+
+    def test_model_list_to_batched_cuda(self):
+        if torch.cuda.is_available():
+            self.test_model_list_to_batched(cuda=True)
+
+    def test_converter_errors(self):
+        train_X = torch.rand(10, 2)
+        train_Y = torch.rand(10)
+        gp = SingleTaskGP(train_X, train_Y)
+        # different model classes
+        fixed_gp = FixedNoiseGP(train_X, train_Y, torch.full_like(train_Y, 0.1))
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([gp, fixed_gp]))
+        # unsupported model class
+        het_gp = HeteroskedasticSingleTaskGP(
+            train_X, train_Y, torch.full_like(train_Y, 0.1)
+        )
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([het_gp, het_gp]))
+        with self.assertRaises(UnsupportedError):
+            batched_to_model_list(het_gp)
+        # different training inputs
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(
+                ModelListGP([gp, SingleTaskGP(torch.rand(10, 2), train_Y)])
+            )
+        # multi-output sub-models
+        mo_gp = SingleTaskGP(train_X, torch.rand(10, 2))
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([mo_gp, mo_gp]))
+        # non-default model structure
+        cached_gp = SingleTaskGP(train_X, train_Y, cache_distances=True)
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([cached_gp, cached_gp]))
+        # different (non-batched) prior parameters
+        gp2 = SingleTaskGP(train_X, train_Y)
+        gp2.covar_module.outputscale_prior = GammaPrior(3.0, 0.15)
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([gp, gp2]))
+        # different inference settings
+        cg_gp = SingleTaskGP(train_X, train_Y)
+        cg_gp.inference_settings = InferenceSettings(solver="cg")
+        with self.assertRaises(UnsupportedError):
+            model_list_to_batched(ModelListGP([gp, cg_gp]))
+
+
+class TestModelListGPBatchedPosterior(unittest.TestCase):
+    def test_batched_posterior(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        train_X = torch.rand(10, 2, **tkwargs)
+        train_Y1, train_Y2 = torch.sin(train_X).unbind(dim=-1)
+        gp1 = _perturb(SingleTaskGP(train_X, train_Y1))
+        gp2 = _perturb(SingleTaskGP(train_X, train_Y2))
+        model = ModelListGP([gp1, gp2])
+        test_X = torch.rand(4, 2, **tkwargs)
+        posterior = model.posterior(test_X, observation_noise=True)
+        self.assertIsInstance(posterior, IndependentOutputPosterior)
+        for i, gp in enumerate((gp1, gp2)):
+            expected = gp.posterior(test_X, observation_noise=True)
+            self.assertTrue(
+                torch.allclose(posterior.mean[..., i : i + 1], expected.mean)
+            )
+            self.assertTrue(
+                torch.allclose(posterior.variance[..., i : i + 1], expected.variance)
+            )
+            # the posterior includes the observation noise of the sub-model
+            noiseless = gp.posterior(test_X)
+            self.assertTrue(
+                torch.allclose(
+                    expected.variance, noiseless.variance + gp.likelihood.noise
+                )
+            )
+        # the batched model is cached
+        batched_model = model._batched_model[-1]
+        posterior = model.posterior(test_X, output_indices=[1])
+        self.assertIs(model._batched_model[-1], batched_model)
+        self.assertTrue(torch.allclose(posterior.mean, gp2.posterior(test_X).mean))
+        # the batched model is rebuilt if the sub-models are modified (e.g. refit)
+        gp2.train()
+        _perturb(gp2)
+        posterior = model.posterior(test_X)
+        self.assertIsNot(model._batched_model[-1], batched_model)
+        self.assertTrue(
+            torch.allclose(posterior.mean[..., 1:], gp2.posterior(test_X).mean)
+        )
+        # the batched model is rebuilt if a hyperparameter is assigned (which
+        # does not bump the version of the parameter)
+        batched_model = model._batched_model[-1]
+        gp1.covar_module.outputscale = 5.0
+        gp2.likelihood.noise = 0.5
+        posterior = model.posterior(test_X)
+        self.assertIsNot(model._batched_model[-1], batched_model)
+        for i, gp in enumerate((gp1, gp2)):
+            # clear the gpytorch test caches of the sub-model
+            gp.train()
+            expected = gp.posterior(test_X)
+            self.assertTrue(
+                torch.allclose(posterior.mean[..., i : i + 1], expected.mean)
+            )
+            self.assertTrue(
+                torch.allclose(posterior.variance[..., i : i + 1], expected.variance)
+            )
+        # the batched model is rebuilt if the inference settings change, and is
+        # not used if the sub-models have different inference settings
+        gp1.inference_settings = InferenceSettings(solver="cholesky")
+        posterior = model.posterior(test_X)
+        self.assertNotIsInstance(posterior, IndependentOutputPosterior)
+        gp2.inference_settings = InferenceSettings(solver="cholesky")
+        posterior = model.posterior(test_X)
+        self.assertIsInstance(posterior, IndependentOutputPosterior)
+        self.assertEqual(model._batched_model[-1].inference_settings.solver, "cholesky")
+        # the batched model is not registered as a submodule
+        self.assertEqual(
+            len(list(model.parameters())),
+            len(list(gp1.parameters())) + len(list(gp2.parameters())),
+        )
+        # the batched model is not used if gradients w.r.t. the training data are
+        # required or for incompatible sub-models
+        posterior = model.posterior(test_X, detach_test_caches=False)
+        self.assertNotIsInstance(posterior, IndependentOutputPosterior)
+        gp2.set_train_data(inputs=torch.rand(10, 2, **tkwargs), strict=False)
+        posterior = model.posterior(test_X)
+        self.assertNotIsInstance(posterior, IndependentOutputPosterior)
+        self.assertIsNone(model._batched_model[-1])
+
+    def test_batched_posterior_cuda(self):
+        if torch.cuda.is_available():
+            self.test_batched_posterior(cuda=True)
@@ -0,0 +1,154 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.acquisition.monte_carlo import qExpectedImprovement
+from botorch.cross_validation import loo_cross_validation
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import (
+    FixedNoiseGP,
+    InferenceSettings,
+    RankWeightedGPEnsemble,
+    SingleTaskGP,
+)
+from botorch.models.ensemble import compute_ranking_loss
+from botorch.posteriors import GPyTorchPosterior
+
+
+def _get_model(n, shift, **tkwargs):
+    train_X = torch.rand(n, 1, **tkwargs)
+    train_Y = torch.sin(6 * train_X + shift)
+    model = SingleTaskGP(train_X, train_Y)
+    model.covar_module.base_kernel.lengthscale = 0.2
+    model.likelihood.noise = 1e-3
+    model.inference_settings = InferenceSettings(solver="cholesky", fast_pred_var=False)
+    return model.eval()
+
+
+class TestRankWeightedGPEnsemble(unittest.TestCase):
+    def test_rank_weighted_gp_ensemble(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda" if cuda else "cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            torch.manual_seed(0)
+            base_models = [
+                _get_model(n, shift, **tkwargs)
+                for n, shift in ((10, 0.0), (15, 2.0), (7, 0.1))
+            ]
+            target_model = _get_model(6, 0.05, **tkwargs)
+            models = base_models + [target_model]
+            model = RankWeightedGPEnsemble(base_models, target_model, num_samples=64)
+            # training data are padded to the largest size
+            self.assertEqual(model.train_mask.shape, torch.Size([4, 15]))
+            self.assertEqual(model.train_mask.sum(dim=-1).tolist(), [10, 15, 7, 6])
+            self.assertEqual(model.weights.shape, torch.Size([4]))
+            self.assertAlmostEqual(model.weights.sum().item(), 1.0, places=5)
+            self.assertTrue((model.weights >= 0).all())
+            # the member posteriors are the posteriors of the members
+            test_X = torch.rand(2, 3, 1, **tkwargs)
+            member_posterior = model.member_posterior(test_X)
+            self.assertEqual(member_posterior.mean.shape, torch.Size([2, 4, 3, 1]))
+            atol = 1e-4 if double else 1e-2
+            for i, m in enumerate(models):
+                posterior = m.posterior(test_X)
+                self.assertTrue(
+                    torch.allclose(
+                        member_posterior.mean[:, i], posterior.mean, atol=atol
+                    )
+                )
+                self.assertTrue(
+                    torch.allclose(
+                        member_posterior.mvn.covariance_matrix[:, i],
+                        posterior.mvn.covariance_matrix,
+                        atol=atol,
+                    )
+                )
+            # the posterior is the weighted combination of the members
+            weights = torch.tensor([0.1, 0.2, 0.3, 0.4], **tkwargs)
+            model = RankWeightedGPEnsemble(base_models, target_model, weights=weights)
+            self.assertTrue(torch.equal(model.weights, weights / weights.sum()))
+            posterior = model.posterior(test_X)
+            self.assertIsInstance(posterior, GPyTorchPosterior)
+            self.assertEqual(posterior.mean.shape, torch.Size([2, 3, 1]))
+            expected_mean = sum(
+                w * m.posterior(test_X).mean for w, m in zip(weights, models)
+            )
+            expected_covar = sum(
+                w ** 2 * m.posterior(test_X).mvn.covariance_matrix
+                for w, m in zip(weights, models)
+            )
+            self.assertTrue(torch.allclose(posterior.mean, expected_mean, atol=atol))
+            self.assertTrue(
+                torch.allclose(
+                    posterior.mvn.covariance_matrix, expected_covar, atol=atol
+                )
+            )
+            # non-batched inputs
+            posterior = model.posterior(test_X[0])
+            self.assertEqual(posterior.mean.shape, torch.Size([3, 1]))
+            # the ensemble can be used with MC acquisition functions
+            qEI = qExpectedImprovement(model, best_f=0.0)
+            self.assertEqual(qEI(test_X).shape, torch.Size([2]))
+            # test errors
+            with self.assertRaises(UnsupportedError):
+                model.posterior(test_X, observation_noise=True)
+            with self.assertRaises(ValueError):
+                RankWeightedGPEnsemble(base_models, target_model, weights=weights[:3])
+            train_X, train_Y = target_model.train_inputs[0], target_model.train_targets
+            fixed_noise_model = FixedNoiseGP(
+                train_X, train_Y.unsqueeze(-1), torch.full_like(train_Y, 0.01)
+            )
+            with self.assertRaises(UnsupportedError):
+                RankWeightedGPEnsemble([fixed_noise_model], target_model)
+            multi_output_model = SingleTaskGP(
+                train_X, train_Y.unsqueeze(-1).repeat(1, 2)
+            )
+            with self.assertRaises(UnsupportedError):
+                RankWeightedGPEnsemble([multi_output_model], target_model)
+
+    def test_rank_weighted_gp_ensemble_cuda(self):
+        if torch.cuda.is_available():
+            self.test_rank_weighted_gp_ensemble(cuda=True)
+
+    def test_rank_weights(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda" if cuda else "cpu"),
+            "dtype": torch.double,
+        }
+        torch.manual_seed(0)
+        target_model = _get_model(8, 0.0, **tkwargs)
+        good_model = _get_model(20, 0.0, **tkwargs)
+        bad_model = _get_model(20, 3.0, **tkwargs)
+        model = RankWeightedGPEnsemble(
+            [bad_model, good_model], target_model, num_samples=128
+        )
+        # the base model of the same function dominates the base model of the
+        # shifted function
+        self.assertGreater(model.weights[1], model.weights[0])
+        # the LOO predictive distributions of the target model are computed
+        # from the cached factorization
+        n = target_model.train_targets.size(-1)
+        K_inv_diag = torch.cholesky_inverse(model._L[-1, :n, :n]).diagonal()
+        loo_posterior = loo_cross_validation(target_model).posterior
+        self.assertTrue(
+            torch.allclose(
+                target_model.train_targets - model._alpha[-1, :n] / K_inv_diag,
+                loo_posterior.mean.view(-1),
+            )
+        )
+
+    def test_rank_weights_cuda(self):
+        if torch.cuda.is_available():
+            self.test_rank_weights(cuda=True)
+
+    def test_compute_ranking_loss(self):
+        target_Y = torch.tensor([0.0, 1.0, 2.0])
+        f_samples = torch.tensor([[0.0, 1.0, 2.0], [2.0, 1.0, 0.0], [1.0, 0.0, 2.0]])
+        loss = compute_ranking_loss(f_samples, target_Y)
+        # each misranked pair is counted in both orders
+        self.assertEqual(loss.tolist(), [0, 6, 2])
+        loss = compute_ranking_loss(f_samples.expand(4, 3, 3), target_Y)
+        self.assertEqual(loss.shape, torch.Size([4, 3]))
@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+
+import io
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models.export import export_to_torchscript
+from botorch.models.gp_regression import FixedNoiseGP, SingleTaskGP
+from botorch.models.multitask import MultiTaskGP
+from gpytorch.kernels import RBFKernel, ScaleKernel
+
+
+def _get_model(model_cls, batch_shape, num_outputs, nu, **tkwargs):
+    train_X = torch.rand(batch_shape + torch.Size([10, 2]), **tkwargs)
+    train_Y = torch.sin(6 * train_X.sum(dim=-1, keepdim=True))
+    train_Y = train_Y.repeat(*[1] * len(batch_shape), 1, num_outputs)
+    if num_outputs == 1:
+        train_Y = train_Y.squeeze(-1)
+    if model_cls is FixedNoiseGP:
+        model = model_cls(train_X, train_Y, torch.full_like(train_Y, 0.01))
+    else:
+        model = model_cls(train_X, train_Y)
+    model.covar_module.base_kernel.nu = nu
+    with torch.no_grad():
+        for param in model.parameters():
+            param.add_(0.5 * torch.rand_like(param))
+    return model
+
+
+class TestExportToTorchscript(unittest.TestCase):
+    def test_export_to_torchscript(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                for model_cls in (SingleTaskGP, FixedNoiseGP):
+                    for nu in (0.5, 1.5, 2.5):
+                        model = _get_model(
+                            model_cls, batch_shape, num_outputs, nu, **tkwargs
+                        )
+                        exported = export_to_torchscript(model)
+                        self.assertIsInstance(exported, torch.jit.ScriptModule)
+                        # save and load the exported module
+                        buffer = io.BytesIO()
+                        torch.jit.save(exported, buffer)
+                        buffer.seek(0)
+                        exported = torch.jit.load(buffer)
+                        test_X = torch.rand(3, *batch_shape, 4, 2, **tkwargs)
+                        posterior = model.posterior(test_X)
+                        mean, variance = exported(test_X)
+                        self.assertEqual(mean.shape, posterior.mean.shape)
+                        self.assertTrue(torch.allclose(mean, posterior.mean, atol=1e-6))
+                        self.assertTrue(
+                            torch.allclose(variance, posterior.variance, atol=1e-6)
+                        )
+                        covar = exported.covariance(test_X)
+                        expected_covar = posterior.mvn.covariance_matrix
+                        if num_outputs > 1:
+                            # outputs are independent (and not interleaved)
+                            expected_covar = torch.stack(
+                                [
+                                    expected_covar[
+                                        ..., 4 * i : 4 * (i + 1), 4 * i : 4 * (i + 1)
+                                    ]
+                                    for i in range(num_outputs)
+                                ],
+                                dim=-3,
+                            )
+                        self.assertEqual(covar.shape, expected_covar.shape)
+                        self.assertTrue(
+                            torch.allclose(covar, expected_covar, atol=1e-6)
+                        )
+
+    def test_export_to_torchscript_cuda(self):
+        if torch.cuda.is_available():
+            self.test_export_to_torchscript(cuda=True)
+
+    def test_export_to_torchscript_errors(self):
+        train_X, train_Y = torch.rand(10, 2), torch.rand(10)
+        model = SingleTaskGP(train_X, train_Y)
+        model.covar_module = ScaleKernel(RBFKernel())
+        with self.assertRaises(UnsupportedError):
+            export_to_torchscript(model)
+        train_X = torch.cat([train_X, torch.randint(2, (10, 1)).float()], dim=-1)
+        model = MultiTaskGP(train_X, train_Y, task_feature=-1)
+        with self.assertRaises(UnsupportedError):
+            export_to_torchscript(model)
@@ -0,0 +1,94 @@
+#! /usr/bin/env python3
+
+import math
+import unittest
+
+import torch
+from botorch import fit_gpytorch_model
+from botorch.acquisition import qExpectedImprovement, qNoisyExpectedImprovement
+from botorch.acquisition.sampler import SobolQMCNormalSampler
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models.fully_bayesian import FullyBayesianSingleTaskGP
+from botorch.optim.fit import fit_gpytorch_hmc
+from botorch.posteriors import FullyBayesianPosterior
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+
+
+def _get_random_data(n=10, **tkwargs):
+    train_x = torch.linspace(0, 0.95, n, **tkwargs).unsqueeze(-1) + 0.05 * torch.rand(
+        n, 1, **tkwargs
+    )
+    train_y = torch.sin(train_x * (2 * math.pi)) + 0.2 * torch.randn(n, 1, **tkwargs)
+    return train_x, train_y
+
+
+class TestFullyBayesianSingleTaskGP(unittest.TestCase):
+    def test_FullyBayesianSingleTaskGP(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X, train_Y = _get_random_data(**tkwargs)
+            model = FullyBayesianSingleTaskGP(train_X, train_Y, num_samples=4)
+            self.assertEqual(model.num_samples, 4)
+            self.assertEqual(model.train_inputs[0].shape, torch.Size([4, 10, 1]))
+            self.assertEqual(model.train_targets.shape, torch.Size([4, 10]))
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            fit_gpytorch_model(
+                mll,
+                optimizer=fit_gpytorch_hmc,
+                options={"num_warmup": 3, "num_iterations": 2, "disp": False},
+            )
+            # hyperparameter samples differ across batches
+            lengthscale = model.covar_module.base_kernel.lengthscale
+            self.assertEqual(lengthscale.shape, torch.Size([4, 1, 1]))
+            # test posterior
+            for batch_shape in (torch.Size([]), torch.Size([2])):
+                X = torch.rand(batch_shape + torch.Size([3, 1]), **tkwargs)
+                posterior = model.posterior(X)
+                self.assertIsInstance(posterior, FullyBayesianPosterior)
+                self.assertEqual(
+                    posterior.mvn.batch_shape, batch_shape + torch.Size([4])
+                )
+                self.assertEqual(posterior.mean.shape, batch_shape + torch.Size([3, 1]))
+                self.assertEqual(
+                    posterior.variance.shape, batch_shape + torch.Size([3, 1])
+                )
+                posterior_noisy = model.posterior(X, observation_noise=True)
+                self.assertTrue((posterior_noisy.variance > posterior.variance).all())
+            # test MC acquisition function
+            acqf = qExpectedImprovement(
+                model, best_f=train_Y.max(), sampler=SobolQMCNormalSampler(8)
+            )
+            X = torch.rand(5, 2, 1, **tkwargs, requires_grad=True)
+            acqf(X).sum().backward()
+            self.assertEqual(X.grad.shape, X.shape)
+            # the default samplers do not draw a multiple of the default number
+            # of hyperparameter samples
+            model = FullyBayesianSingleTaskGP(train_X, train_Y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            fit_gpytorch_model(
+                mll,
+                optimizer=fit_gpytorch_hmc,
+                options={"num_warmup": 3, "num_iterations": 2, "disp": False},
+            )
+            for acqf in (
+                qExpectedImprovement(model, best_f=train_Y.max()),
+                qNoisyExpectedImprovement(model, X_baseline=train_X),
+            ):
+                self.assertNotEqual(acqf.sampler.sample_shape[0] % model.num_samples, 0)
+                X = torch.rand(5, 2, 1, **tkwargs)
+                self.assertEqual(acqf(X).shape, torch.Size([5]))
+                self.assertTrue(torch.equal(acqf(X), acqf(X)))
+
+    def test_FullyBayesianSingleTaskGP_cuda(self):
+        if torch.cuda.is_available():
+            self.test_FullyBayesianSingleTaskGP(cuda=True)
+
+    def test_FullyBayesianSingleTaskGP_errors(self):
+        train_X, train_Y = _get_random_data()
+        with self.assertRaises(UnsupportedError):
+            FullyBayesianSingleTaskGP(train_X.unsqueeze(0), train_Y.unsqueeze(0))
+        with self.assertRaises(UnsupportedError):
+            FullyBayesianSingleTaskGP(train_X, train_Y.repeat(1, 2))
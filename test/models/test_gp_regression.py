@@ -5,12 +5,14 @@ import unittest
 
 import torch
 from botorch import fit_gpytorch_model
+from botorch.exceptions.errors import BotorchError
 from botorch.models.gp_regression import (
+    CachedHeteroskedasticNoise,
     FixedNoiseGP,
     HeteroskedasticSingleTaskGP,
     SingleTaskGP,
 )
-from botorch.posteriors import GPyTorchPosterior
+from botorch.posteriors import GPyTorchPosterior, IndependentOutputPosterior
 from gpytorch.distributions import MultivariateNormal
 from gpytorch.kernels import MaternKernel, ScaleKernel
 from gpytorch.likelihoods import (
@@ -96,6 +98,24 @@ class TestSingleTaskGP(unittest.TestCase):
                         posterior.mean.shape,
                         torch.Size([2]) + batch_shape + torch.Size([3, num_outputs]),
                     )
+                    # test output indices
+                    if num_outputs > 1:
+                        self.assertIsInstance(posterior, IndependentOutputPosterior)
+                        posterior_1 = model.posterior(X, output_indices=[1])
+                        self.assertIsInstance(posterior_1, IndependentOutputPosterior)
+                        self.assertTrue(
+                            torch.allclose(posterior_1.mean, posterior.mean[..., 1:])
+                        )
+                        self.assertTrue(
+                            torch.allclose(
+                                posterior_1.variance, posterior.variance[..., 1:]
+                            )
+                        )
+                        samples = posterior_1.rsample(torch.Size([4]))
+                        self.assertEqual(
+                            samples.shape,
+                            torch.Size([4, 2]) + batch_shape + torch.Size([3, 1]),
+                        )
 
     def test_SingleTaskGP_cuda(self):
         if torch.cuda.is_available():
@@ -123,7 +143,7 @@ class TestFixedNoiseGP(unittest.TestCase):
                         batch_shape=batch_shape,
                         num_outputs=num_outputs,
                         n=10,
-                        **tkwargs
+                        **tkwargs,
                     )
                     self.assertIsInstance(model, FixedNoiseGP)
                     self.assertIsInstance(
@@ -176,6 +196,38 @@ class TestFixedNoiseGP(unittest.TestCase):
         if torch.cuda.is_available():
             self.test_FixedNoiseGP(cuda=True)
 
+    def test_FixedNoiseGP_replicates(self, cuda=False):
+        for num_outputs in (1, 2):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double,
+            }
+            train_x, train_y = _get_random_data(
+                batch_shape=torch.Size(), num_outputs=num_outputs, n=6, **tkwargs
+            )
+            # replicate the training points with different observations and noise
+            train_x = train_x.repeat(3, 1)
+            train_y = train_y.repeat(3, *[1] * (num_outputs > 1))
+            train_y = train_y + 0.1 * torch.randn_like(train_y)
+            train_yvar = 0.01 + 0.1 * torch.rand_like(train_y)
+            model = FixedNoiseGP(
+                train_X=train_x, train_Y=train_y, train_Yvar=train_yvar
+            )
+            agg_model = FixedNoiseGP(
+                train_X=train_x, train_Y=train_y, train_Yvar=train_yvar, replicate_tol=0
+            )
+            self.assertEqual(agg_model.train_inputs[0].shape[-2], 6)
+            agg_model.load_state_dict(model.state_dict(), strict=False)
+            X = torch.rand(4, 1, **tkwargs)
+            posterior = model.posterior(X)
+            agg_posterior = agg_model.posterior(X)
+            self.assertTrue(torch.allclose(posterior.mean, agg_posterior.mean))
+            self.assertTrue(torch.allclose(posterior.variance, agg_posterior.variance))
+
+    def test_FixedNoiseGP_replicates_cuda(self):
+        if torch.cuda.is_available():
+            self.test_FixedNoiseGP_replicates(cuda=True)
+
 
 class TestHeteroskedasticSingleTaskGP(unittest.TestCase):
     def _get_model(self, batch_shape, num_outputs, **tkwargs):
@@ -247,3 +299,178 @@ class TestHeteroskedasticSingleTaskGP(unittest.TestCase):
     def test_HeterskedasticSingleTaskGP_cuda(self):
         if torch.cuda.is_available():
             self.test_HeterskedasticSingleTaskGP(cuda=True)
+
+    def test_HeterskedasticSingleTaskGP_cached_noise(self, cuda=False):
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double,
+                }
+                model = self._get_model(
+                    batch_shape=batch_shape, num_outputs=num_outputs, **tkwargs
+                )
+                model.eval()
+                noise_covar = model.likelihood.noise_covar
+                self.assertIsInstance(noise_covar, CachedHeteroskedasticNoise)
+                noise_model = noise_covar.noise_model
+                reference = HeteroskedasticNoise(noise_model)
+                # the noise levels match those of the full noise GP posterior
+                train_X = model.train_inputs[0]
+                test_X = torch.rand(
+                    torch.Size([2]) + train_X.shape[:-2] + torch.Size([3, 1]), **tkwargs
+                )
+
+                def check_noise():
+                    # clear the gpytorch caches of the noise GP for the reference
+                    noise_model.train()
+                    noise_model.eval()
+                    for X in (train_X, test_X):
+                        self.assertTrue(
+                            torch.allclose(
+                                noise_covar(X).diag(), reference(X).diag(), atol=1e-6
+                            )
+                        )
+
+                check_noise()
+                # the prediction cache of the noise GP is kept while the noise GP
+                # is not modified
+                cache = noise_covar._noise_model_cache
+                self.assertIsNotNone(cache)
+                noise_covar(test_X)
+                self.assertIs(noise_covar._noise_model_cache, cache)
+                # the cache is rebuilt if the parameters of the noise GP are
+                # loaded or assigned, or if its training data are set
+                state_dict = noise_model.state_dict()
+                state_dict["likelihood.noise_covar.raw_noise"] += 1.0
+                noise_model.load_state_dict(state_dict)
+                check_noise()
+                self.assertIsNot(noise_covar._noise_model_cache, cache)
+                cache = noise_covar._noise_model_cache
+                noise_model.likelihood.noise = 0.5
+                check_noise()
+                self.assertIsNot(noise_covar._noise_model_cache, cache)
+                cache = noise_covar._noise_model_cache
+                noise_model.set_train_data(
+                    targets=noise_model.train_targets + 0.1, strict=False
+                )
+                check_noise()
+                self.assertIsNot(noise_covar._noise_model_cache, cache)
+                # posterior with observation noise
+                X = torch.rand(batch_shape + torch.Size([3, 1]), **tkwargs)
+                posterior = model.posterior(X)
+                noisy_posterior = model.posterior(X, observation_noise=True)
+                self.assertEqual(noisy_posterior.mean.shape, posterior.mean.shape)
+                self.assertTrue(torch.equal(noisy_posterior.mean, posterior.mean))
+                if num_outputs > 1:
+                    # the outputs are in the first batch dimension of the noise
+                    noise = noise_covar(X.unsqueeze(0)).diag()
+                    noise = noise.unsqueeze(-1).transpose(0, -1).squeeze(0)
+                else:
+                    noise = noise_covar(X).diag().unsqueeze(-1)
+                self.assertTrue(
+                    torch.allclose(noisy_posterior.variance, posterior.variance + noise)
+                )
+                if num_outputs > 1:
+                    subset_posterior = model.posterior(
+                        X, output_indices=[1], observation_noise=True
+                    )
+                    self.assertIsInstance(subset_posterior, IndependentOutputPosterior)
+                    self.assertTrue(
+                        torch.allclose(
+                            subset_posterior.variance[..., 0],
+                            noisy_posterior.variance[..., 1],
+                        )
+                    )
+                # freezing the model freezes the noise model
+                model.freeze()
+                self.assertTrue(noise_model.is_frozen)
+                frozen_posterior = model.posterior(X, observation_noise=True)
+                self.assertTrue(
+                    torch.allclose(frozen_posterior.variance, noisy_posterior.variance)
+                )
+                with torch.no_grad():
+                    next(noise_model.parameters()).add_(1.0)
+                with self.assertRaises(BotorchError):
+                    noise_covar(test_X)
+                model.unfreeze()
+                self.assertFalse(noise_model.is_frozen)
+        # the noise levels at the training inputs account for the jitter added to
+        # a singular training covariance (here, of replicates with different
+        # observed noise levels and the initial zero noise of the noise GP)
+        train_X, train_Y = _get_random_data(
+            batch_shape=torch.Size(), num_outputs=1, n=6, **tkwargs
+        )
+        train_X, train_Y = train_X.repeat(2, 1), train_Y.repeat(2)
+        train_Yvar = 0.01 + 0.1 * torch.rand_like(train_Y)
+        model = HeteroskedasticSingleTaskGP(train_X, train_Y, train_Yvar).eval()
+        noise_covar = model.likelihood.noise_covar
+        reference = HeteroskedasticNoise(noise_covar.noise_model)
+        noise = noise_covar(train_X).diag()
+        self.assertTrue(torch.allclose(noise[:6], noise[6:]))
+        self.assertTrue(torch.allclose(noise, reference(train_X).diag(), atol=1e-6))
+
+    def test_HeterskedasticSingleTaskGP_cached_noise_cuda(self):
+        if torch.cuda.is_available():
+            self.test_HeterskedasticSingleTaskGP_cached_noise(cuda=True)
+
+    def test_HeterskedasticSingleTaskGP_replicates(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        train_x, train_y = _get_random_data(
+            batch_shape=torch.Size(), num_outputs=1, n=6, **tkwargs
+        )
+        train_x, train_y = train_x.repeat(2, 1), train_y.repeat(2)
+        train_yvar = torch.full_like(train_y, 0.04)
+        model = HeteroskedasticSingleTaskGP(
+            train_X=train_x, train_Y=train_y, train_Yvar=train_yvar, replicate_tol=0
+        )
+        self.assertEqual(model.train_inputs[0].shape[-2], 6)
+        # the noise model is fit to the original observations
+        noise_covar = model.likelihood.noise_covar
+        noise_model = noise_covar.noise_model
+        self.assertEqual(noise_model.train_inputs[0].shape[-2], 12)
+        self.assertTrue(
+            torch.allclose(
+                noise_model.train_targets,
+                torch.full_like(noise_model.train_targets, 0.04).log(),
+            )
+        )
+        self.assertEqual(noise_covar.replicate_group.tolist(), list(range(6)) * 2)
+        # the noise levels of the aggregated observations are computed from the
+        # noise levels of the original observations
+        for train in (True, False):
+            model.train(train)
+            agg_X = model.train_inputs[0]
+            noise = noise_covar(agg_X).diag()
+            orig_noise = noise_covar(train_x).diag()
+            self.assertEqual(noise.shape, torch.Size([6]))
+            self.assertEqual(orig_noise.shape, torch.Size([12]))
+            expected = 1 / (1 / orig_noise[:6] + 1 / orig_noise[6:])
+            self.assertTrue(torch.allclose(noise, expected))
+        posterior = model.posterior(torch.rand(3, 1, **tkwargs))
+        self.assertEqual(posterior.mean.shape, torch.Size([3, 1]))
+        # for exact replicates, the posterior is that of the model on the original
+        # observations (also for different observations and observed noise levels)
+        train_y = train_y + 0.1 * torch.randn_like(train_y)
+        train_yvar = 0.01 + 0.1 * torch.rand_like(train_y)
+        model = HeteroskedasticSingleTaskGP(
+            train_X=train_x, train_Y=train_y, train_Yvar=train_yvar, replicate_tol=0
+        )
+        full_model = HeteroskedasticSingleTaskGP(
+            train_X=train_x, train_Y=train_y, train_Yvar=train_yvar
+        )
+        test_x = torch.rand(3, 1, **tkwargs)
+        posterior = model.posterior(test_x)
+        full_posterior = full_model.posterior(test_x)
+        self.assertTrue(torch.allclose(posterior.mean, full_posterior.mean))
+        self.assertTrue(torch.allclose(posterior.variance, full_posterior.variance))
+        mll = ExactMarginalLogLikelihood(model.likelihood, model).train()
+        output = model(*model.train_inputs)
+        mll(output, model.train_targets, *model.train_inputs).backward()
+
+    def test_HeterskedasticSingleTaskGP_replicates_cuda(self):
+        if torch.cuda.is_available():
+            self.test_HeterskedasticSingleTaskGP_replicates(cuda=True)
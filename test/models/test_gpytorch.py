@@ -1,8 +1,12 @@
 #! /usr/bin/env python3
 
+import os
+import tempfile
 import unittest
 
+import numpy as np
 import torch
+from botorch.models import SingleTaskGP
 from botorch.models.gpytorch import GPyTorchModel
 from botorch.posteriors.gpytorch import GPyTorchPosterior
 from gpytorch.distributions import MultivariateNormal
@@ -39,3 +43,116 @@ class TestGPyTorchModel(unittest.TestCase):
         posterior = model.posterior(test_X, observation_noise=True)
         self.assertIsInstance(posterior, GPyTorchPosterior)
         self.assertEqual(posterior.mean.shape, torch.Size([2, 1]))
+
+
+class TestPredict(unittest.TestCase):
+    def test_predict(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda" if cuda else "cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X = torch.rand(5, 1, **tkwargs)
+            train_Y = torch.sin(train_X.squeeze())
+            model = SimpleGPyTorchModel(train_X, train_Y).to(**tkwargs)
+            test_X = torch.rand(10, 1, **tkwargs)
+            with torch.no_grad():
+                posterior = model.posterior(test_X.unsqueeze(-2))
+                expected_mean = posterior.mean.squeeze(-2)
+                expected_variance = posterior.variance.squeeze(-2)
+            # tensor inputs
+            tiles = list(model.predict(test_X, tile_size=4))
+            self.assertEqual([mean.shape[0] for mean, _ in tiles], [4, 4, 2])
+            mean = torch.cat([mean for mean, _ in tiles])
+            variance = torch.cat([variance for _, variance in tiles])
+            self.assertFalse(mean.requires_grad)
+            self.assertEqual(mean.shape, torch.Size([10, 1]))
+            self.assertTrue(torch.allclose(mean, expected_mean, atol=1e-5))
+            self.assertTrue(torch.allclose(variance, expected_variance, atol=1e-5))
+            # observation noise
+            _, noisy_variance = next(model.predict(test_X, observation_noise=True))
+            self.assertTrue((noisy_variance > variance).all())
+            # generator of numpy arrays (tiles are split to the tile size)
+            X_np = test_X.cpu().numpy()
+            generator = (X_np[i : i + 5] for i in (0, 5))
+            tiles = list(model.predict(generator, tile_size=3))
+            self.assertEqual([mean.shape[0] for mean, _ in tiles], [3, 2, 3, 2])
+            self.assertEqual(tiles[0][0].device, test_X.device)
+            mean = torch.cat([mean for mean, _ in tiles])
+            self.assertTrue(torch.allclose(mean, expected_mean, atol=1e-5))
+            # memory-mapped inputs and outputs
+            with tempfile.TemporaryDirectory() as directory:
+                X_mm = np.memmap(
+                    os.path.join(directory, "X"),
+                    dtype=X_np.dtype,
+                    mode="w+",
+                    shape=X_np.shape,
+                )
+                X_mm[:] = X_np
+                X_mm.flush()
+                X_mm = np.memmap(
+                    X_mm.filename, dtype=X_np.dtype, mode="r", shape=X_np.shape
+                )
+                mean_out, variance_out = (
+                    np.memmap(
+                        os.path.join(directory, name),
+                        dtype=X_np.dtype,
+                        mode="w+",
+                        shape=(10, 1),
+                    )
+                    for name in ("mean", "variance")
+                )
+                model.predict_into(X_mm, mean_out, variance_out, tile_size=4)
+                self.assertTrue(
+                    np.allclose(mean_out, expected_mean.cpu().numpy(), atol=1e-5)
+                )
+                self.assertTrue(
+                    np.allclose(
+                        variance_out, expected_variance.cpu().numpy(), atol=1e-5
+                    )
+                )
+                del X_mm, mean_out, variance_out
+            # observation noise of batched multi-output models
+            st_model = SingleTaskGP(train_X, train_Y.unsqueeze(-1).repeat(1, 2))
+            mean, variance = next(st_model.predict(test_X))
+            noisy_mean, noisy_variance = next(
+                st_model.predict(test_X, observation_noise=True)
+            )
+            self.assertTrue(torch.allclose(noisy_mean, mean))
+            noise = st_model.likelihood.noise.view(-1).detach()
+            self.assertTrue(torch.allclose(noisy_variance, variance + noise))
+            # test errors
+            with self.assertRaises(ValueError):
+                model.predict_into(test_X, np.zeros((10, 1)), np.zeros((9, 1)))
+            with self.assertRaises(ValueError):
+                model.predict_into(test_X, np.zeros((9, 1)), np.zeros((9, 1)))
+            with self.assertRaises(ValueError):
+                model.predict_into(test_X, np.zeros((11, 1)), np.zeros((11, 1)))
+
+    def test_predict_cuda(self):
+        if torch.cuda.is_available():
+            self.test_predict(cuda=True)
+
+    def test_predict_batched(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda" if cuda else "cpu"),
+            "dtype": torch.double,
+        }
+        train_X = torch.rand(3, 8, 2, **tkwargs)
+        train_Y = torch.sin(train_X).sum(dim=-1, keepdim=True).repeat(1, 1, 2)
+        model = SingleTaskGP(train_X, train_Y)
+        test_X = torch.rand(5, 2, **tkwargs)
+        mean, variance = next(model.predict(test_X))
+        self.assertEqual(mean.shape, torch.Size([5, 3, 2]))
+        posterior = model.posterior(
+            test_X.unsqueeze(-2).unsqueeze(-3).expand(5, 3, 1, 2)
+        )
+        self.assertTrue(torch.allclose(mean, posterior.mean.squeeze(-2)))
+        self.assertTrue(torch.allclose(variance, posterior.variance.squeeze(-2)))
+        _, noisy_variance = next(model.predict(test_X, observation_noise=True))
+        noise = model.likelihood.noise.detach().view(2, 3).t()
+        self.assertTrue(torch.allclose(noisy_variance, variance + noise))
+
+    def test_predict_batched_cuda(self):
+        if torch.cuda.is_available():
+            self.test_predict_batched(cuda=True)
@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+
+import math
+import unittest
+
+import torch
+from botorch import fit_gpytorch_model
+from botorch.models import InferenceSettings, ModelListGP, SingleTaskGP
+from botorch.models.inference import inference_settings
+from gpytorch import settings
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+
+
+class _RecordingGP(SingleTaskGP):
+    r"""A SingleTaskGP recording the GPyTorch settings it is evaluated with."""
+
+    def forward(self, x):
+        self.recorded = (
+            settings.max_cholesky_size.value(),
+            settings.max_preconditioner_size.value(),
+            settings.fast_pred_var.on(),
+        )
+        return super().forward(x)
+
+
+class TestInferenceSettings(unittest.TestCase):
+    def test_inference_settings(self):
+        config = InferenceSettings(
+            solver="auto",
+            max_cholesky_size=100,
+            preconditioner_rank=3,
+            cg_tolerance=0.5,
+            eval_cg_tolerance=0.05,
+            max_cg_iterations=20,
+            fast_pred_var=False,
+        )
+        with inference_settings(config):
+            self.assertEqual(settings.max_cholesky_size.value(), 100)
+            self.assertEqual(settings.max_preconditioner_size.value(), 3)
+            self.assertEqual(settings.cg_tolerance.value(), 0.5)
+            self.assertEqual(settings.eval_cg_tolerance.value(), 0.05)
+            self.assertEqual(settings.max_cg_iterations.value(), 20)
+            self.assertTrue(settings.fast_pred_var.off())
+        # the global settings are restored
+        self.assertNotEqual(settings.max_cholesky_size.value(), 100)
+        with inference_settings(InferenceSettings(solver="cholesky")):
+            self.assertEqual(settings.max_cholesky_size.value(), math.inf)
+            self.assertTrue(settings.fast_pred_var.on())
+        with inference_settings(InferenceSettings(solver="cg")):
+            self.assertEqual(settings.max_cholesky_size.value(), 0)
+        with self.assertRaises(ValueError):
+            with inference_settings(InferenceSettings(solver="foo")):
+                pass  # pragma: no cover
+
+    def test_default_inference_settings(self):
+        defaults = (
+            settings.max_cholesky_size.value(),
+            settings.max_preconditioner_size.value(),
+            settings.cg_tolerance.value(),
+            settings.fast_pred_var.on(),
+        )
+        # the default settings only set the Cholesky size and LOVE
+        with settings.max_cholesky_size(7), settings.fast_pred_var(False):
+            with inference_settings(InferenceSettings()):
+                self.assertEqual(settings.max_cholesky_size.value(), 384)
+                self.assertTrue(settings.fast_pred_var.on())
+                self.assertEqual(settings.max_preconditioner_size.value(), defaults[1])
+                self.assertEqual(settings.cg_tolerance.value(), defaults[2])
+            # the settings set to None are not overridden
+            config = InferenceSettings(
+                max_cholesky_size=None, preconditioner_rank=3, fast_pred_var=None
+            )
+            with inference_settings(config):
+                self.assertEqual(settings.max_cholesky_size.value(), 7)
+                self.assertTrue(settings.fast_pred_var.off())
+                self.assertEqual(settings.max_preconditioner_size.value(), 3)
+        self.assertEqual(
+            (
+                settings.max_cholesky_size.value(),
+                settings.max_preconditioner_size.value(),
+                settings.cg_tolerance.value(),
+                settings.fast_pred_var.on(),
+            ),
+            defaults,
+        )
+
+    def test_model_inference_settings(self, cuda=False):
+        torch.manual_seed(0)
+        default_preconditioner_size = settings.max_preconditioner_size.value()
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X = torch.rand(20, 2, **tkwargs)
+            train_Y = torch.sin(6 * train_X).sum(dim=-1)
+            test_X = torch.rand(4, 2, **tkwargs)
+            model = _RecordingGP(train_X, train_Y)
+            self.assertEqual(model.inference_settings, InferenceSettings())
+            # the default posterior is computed using LOVE
+            model.posterior(test_X)
+            self.assertEqual(model.recorded, (384, default_preconditioner_size, True))
+            # test fitting and posterior with custom settings
+            model.inference_settings = InferenceSettings(
+                solver="cg", preconditioner_rank=5, fast_pred_var=False
+            )
+            mll = ExactMarginalLogLikelihood(model.likelihood, model)
+            fit_gpytorch_model(mll, options={"maxiter": 2})
+            self.assertEqual(model.recorded, (0, 5, False))
+            posterior = model.posterior(test_X)
+            self.assertEqual(model.recorded, (0, 5, False))
+            self.assertEqual(posterior.mean.shape, torch.Size([4, 1]))
+            # sub-models of a ModelListGP are evaluated with their own settings
+            model_2 = _RecordingGP(train_X, train_Y)
+            model_2.inference_settings = InferenceSettings(solver="cholesky")
+            model_list = ModelListGP([model, model_2])
+            model_list.posterior(test_X)
+            self.assertEqual(model.recorded, (0, 5, False))
+            self.assertEqual(
+                model_2.recorded, (math.inf, default_preconditioner_size, True)
+            )
+
+    def test_model_inference_settings_cuda(self):
+        if torch.cuda.is_available():
+            self.test_model_inference_settings(cuda=True)
@@ -0,0 +1,128 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import SingleTaskKISSGP
+from botorch.optim.fit import fit_gpytorch_torch
+from botorch.posteriors import GPyTorchPosterior
+from gpytorch import settings
+from gpytorch.kernels.grid_interpolation_kernel import GridInterpolationKernel
+from gpytorch.kernels.matern_kernel import MaternKernel
+from gpytorch.kernels.scale_kernel import ScaleKernel
+from gpytorch.likelihoods.gaussian_likelihood import FixedNoiseGaussianLikelihood
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+from gpytorch.models.exact_prediction_strategies import InterpolatedPredictionStrategy
+from gpytorch.priors.torch_priors import GammaPrior
+
+
+def _get_data(n, d, **tkwargs):
+    train_X = torch.rand(n, d, **tkwargs)
+    train_Y = torch.sin(6 * train_X.sum(dim=-1, keepdim=True))
+    return train_X, train_Y + 0.1 * torch.randn_like(train_Y)
+
+
+class TestSingleTaskKISSGP(unittest.TestCase):
+    def test_single_task_kiss_gp(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            train_X, train_Y = _get_data(50, 2, **tkwargs)
+            model = SingleTaskKISSGP(train_X, train_Y)
+            # a single outputscale for the product of the one-dimensional kernels
+            self.assertIsInstance(model.covar_module, ScaleKernel)
+            self.assertEqual(model.covar_module.outputscale.shape, torch.Size([]))
+            self.assertIsInstance(model.covar_module.outputscale_prior, GammaPrior)
+            grid_kernel = model.covar_module.base_kernel
+            self.assertIsInstance(grid_kernel, GridInterpolationKernel)
+            self.assertIsInstance(grid_kernel.base_kernel, MaternKernel)
+            self.assertEqual(
+                grid_kernel.base_kernel.lengthscale.shape, torch.Size([1, 2])
+            )
+            # the default grid spans the (padded) training data with n^(1/d) points
+            self.assertEqual(grid_kernel.grid.shape, torch.Size([10, 2]))
+            self.assertEqual(grid_kernel.grid.dtype, tkwargs["dtype"])
+            for i, (lower, upper) in enumerate(grid_kernel.grid_bounds):
+                x_min, x_max = train_X[:, i].min().item(), train_X[:, i].max().item()
+                padding = 3 * (x_max - x_min) / 4
+                self.assertAlmostEqual(lower, x_min - padding, places=5)
+                self.assertAlmostEqual(upper, x_max + padding, places=5)
+            bounds = torch.tensor([[-1.0, 0.0], [1.0, 2.0]], **tkwargs)
+            model = SingleTaskKISSGP(
+                train_X, train_Y.view(-1), grid_size=20, grid_bounds=bounds
+            )
+            grid_kernel = model.covar_module.base_kernel
+            self.assertEqual(grid_kernel.grid.shape, torch.Size([20, 2]))
+            self.assertEqual(grid_kernel.grid_bounds, ((-1.0, 1.0), (0.0, 2.0)))
+            # test errors
+            with self.assertRaises(UnsupportedError):
+                SingleTaskKISSGP(train_X.expand(2, 50, 2), train_Y)
+            with self.assertRaises(UnsupportedError):
+                SingleTaskKISSGP(train_X, train_Y.repeat(1, 2))
+            with self.assertRaises(UnsupportedError):
+                model.freeze()
+            with self.assertRaises(UnsupportedError):
+                model.condition_on_observations(
+                    train_X[:2], train_Y[:2], noise=torch.rand_like(train_Y[:2])
+                )
+            with self.assertRaises(ValueError):
+                model.condition_on_observations(train_X[:2] + 2, train_Y[:2])
+            likelihood = FixedNoiseGaussianLikelihood(noise=torch.ones(50, **tkwargs))
+            model = SingleTaskKISSGP(train_X, train_Y, likelihood=likelihood)
+            with self.assertRaises(UnsupportedError):
+                model.condition_on_observations(train_X[:2], train_Y[:2])
+
+    def test_single_task_kiss_gp_cuda(self):
+        if torch.cuda.is_available():
+            self.test_single_task_kiss_gp(cuda=True)
+
+    def test_single_task_kiss_gp_posterior(self, cuda=False):
+        # Toeplitz structure is not needed on a one-dimensional grid of this size
+        with settings.use_toeplitz(False):
+            for double in (False, True):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double if double else torch.float,
+                }
+                torch.manual_seed(0)
+                train_X, train_Y = _get_data(200, 1, **tkwargs)
+                bounds = torch.tensor([[0.0], [1.0]], **tkwargs)
+                model = SingleTaskKISSGP(
+                    train_X, train_Y, grid_size=50, grid_bounds=bounds
+                )
+                mll = ExactMarginalLogLikelihood(model.likelihood, model)
+                mll.train()
+                fit_gpytorch_torch(
+                    mll, options={"maxiter": 50, "disp": False, "lr": 0.1}
+                )
+                mll.eval()
+                for batch_shape in (torch.Size(), torch.Size([3])):
+                    X = torch.rand(batch_shape + torch.Size([4, 1]), **tkwargs)
+                    posterior = model.posterior(X)
+                    self.assertIsInstance(posterior, GPyTorchPosterior)
+                    self.assertIsInstance(
+                        model.prediction_strategy, InterpolatedPredictionStrategy
+                    )
+                    expected_shape = batch_shape + torch.Size([4, 1])
+                    self.assertEqual(posterior.mean.shape, expected_shape)
+                    self.assertEqual(posterior.variance.shape, expected_shape)
+                    self.assertTrue((posterior.variance > 0).all())
+                    self.assertLess(
+                        (posterior.mean - torch.sin(6 * X)).abs().max().item(), 0.2
+                    )
+                    samples = posterior.rsample(sample_shape=torch.Size([2]))
+                    self.assertEqual(samples.shape, torch.Size([2]) + expected_shape)
+                # test conditioning on new observations
+                new_X, new_Y = _get_data(5, 1, **tkwargs)
+                model.condition_on_observations(new_X, new_Y)
+                self.assertEqual(model.train_targets.shape, torch.Size([205]))
+                self.assertTrue(torch.equal(model.train_inputs[0][-5:], new_X))
+                posterior = model.posterior(new_X)
+                self.assertEqual(posterior.mean.shape, torch.Size([5, 1]))
+
+    def test_single_task_kiss_gp_posterior_cuda(self):
+        if torch.cuda.is_available():
+            self.test_single_task_kiss_gp_posterior(cuda=True)
@@ -1,13 +1,17 @@
 #! /usr/bin/env python3
 
 import math
+import threading
 import unittest
+from copy import deepcopy
+from unittest import mock
 
 import torch
 from botorch import fit_gpytorch_model
 from botorch.models import ModelListGP
 from botorch.models.gp_regression import SingleTaskGP
 from botorch.posteriors import GPyTorchPosterior
+from gpytorch import settings
 from gpytorch.distributions import MultitaskMultivariateNormal, MultivariateNormal
 from gpytorch.kernels import MaternKernel, ScaleKernel
 from gpytorch.likelihoods import LikelihoodList
@@ -80,6 +84,106 @@ class TestModelListGP(unittest.TestCase):
         if torch.cuda.is_available():
             self.test_ModelListGP(cuda=True)
 
+    def test_ModelListGP_parallel(self, cuda=False):
+        torch.manual_seed(0)
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            # the serial posterior variances are computed using LOVE
+            atol = 1e-6 if double else 1e-4
+            model = _get_model(n=10, **tkwargs)
+            parallel_model = ModelListGP(gp_models=list(model.models), num_threads=2)
+            self.assertEqual(model._num_threads, 1)
+            self.assertEqual(parallel_model._num_threads, 2)
+            test_x = torch.rand(3, 2, 1, **tkwargs, requires_grad=True)
+            test_x_p = test_x.detach().clone().requires_grad_(True)
+            for observation_noise in (False, True):
+                posterior = model.posterior(test_x, observation_noise=observation_noise)
+                posterior_p = parallel_model.posterior(
+                    test_x_p, observation_noise=observation_noise
+                )
+                self.assertIsInstance(posterior_p.mvn, MultitaskMultivariateNormal)
+                self.assertTrue(
+                    torch.allclose(posterior.mean, posterior_p.mean, atol=atol)
+                )
+                self.assertTrue(
+                    torch.allclose(posterior.variance, posterior_p.variance, atol=atol)
+                )
+            # test gradients w.r.t. X
+            posterior.variance.sum().backward()
+            posterior_p.variance.sum().backward()
+            self.assertTrue(torch.allclose(test_x.grad, test_x_p.grad, atol=atol))
+            # the caches of the sub-models are reused across posterior calls
+            thread_caches = [m._thread_caches for m in parallel_model.models]
+            self.assertTrue(all(c is not None for c in thread_caches))
+            parallel_model.posterior(test_x_p)
+            for m, c in zip(parallel_model.models, thread_caches):
+                self.assertIs(m._thread_caches, c)
+            # the caches are rebuilt if a sub-model is modified
+            m = parallel_model.models[0]
+            state_dict = deepcopy(m.state_dict())
+            m.likelihood.noise = 0.5
+            posterior_p = parallel_model.posterior(test_x_p)
+            self.assertIsNot(m._thread_caches, thread_caches[0])
+            self.assertIs(parallel_model.models[1]._thread_caches, thread_caches[1])
+            m.train()
+            self.assertIsNone(m._thread_caches)
+            expected = m.posterior(test_x_p)
+            self.assertTrue(
+                torch.allclose(posterior_p.mean[..., :1], expected.mean, atol=atol)
+            )
+            m.load_state_dict(state_dict)
+            # the worker threads do not modify the (global) gpytorch settings
+            calls = []
+            set_state = settings.lazily_evaluate_kernels._set_state
+
+            def _set_state(state):
+                calls.append(threading.current_thread())
+                set_state(state)
+
+            with mock.patch.object(
+                settings.lazily_evaluate_kernels, "_set_state", _set_state
+            ):
+                parallel_model.posterior(test_x_p, observation_noise=True)
+            self.assertGreater(len(calls), 0)
+            self.assertTrue(all(t is threading.main_thread() for t in calls))
+            self.assertTrue(settings.lazily_evaluate_kernels.on())
+            # frozen sub-models are evaluated from their pinned caches
+            for m in parallel_model.models:
+                m.freeze()
+            posterior_p = parallel_model.posterior(test_x_p)
+            self.assertTrue(torch.allclose(posterior.mean, posterior_p.mean, atol=atol))
+            train_x = parallel_model.models[0].train_inputs[0].requires_grad_(True)
+            parallel_model.posterior(
+                test_x_p, detach_test_caches=False
+            ).mean.sum().backward()
+            self.assertIsNotNone(train_x.grad)
+            train_x.requires_grad_(False)
+            for m in parallel_model.models:
+                m.unfreeze()
+            # grad mode is respected in the worker threads
+            with torch.no_grad():
+                posterior_p = parallel_model.posterior(test_x_p)
+            self.assertFalse(posterior_p.mean.requires_grad)
+            # test output_indices (these are posteriors, not priors)
+            posterior_p = parallel_model.posterior(test_x_p, output_indices=[1, 0])
+            for j, i in enumerate([1, 0]):
+                expected = model.models[i].posterior(test_x_p)
+                self.assertTrue(
+                    torch.allclose(
+                        posterior_p.mean[..., j : j + 1], expected.mean, atol=atol
+                    )
+                )
+            # test that invalid num_threads throws correct error
+            with self.assertRaises(ValueError):
+                ModelListGP(gp_models=list(model.models), num_threads=0)
+
+    def test_ModelListGP_parallel_cuda(self):
+        if torch.cuda.is_available():
+            self.test_ModelListGP_parallel(cuda=True)
+
     def test_ModelListGPSingle(self, cuda=False):
         tkwargs = {
             "device": torch.device("cuda") if cuda else torch.device("cpu"),
@@ -5,7 +5,15 @@ import unittest
 
 import torch
 from botorch import fit_gpytorch_model
-from botorch.models.multitask import FixedNoiseMultiTaskGP, MultiTaskGP
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models.gp_regression import SingleTaskGP
+from botorch.models.multitask import (
+    FixedNoiseMultiTaskGP,
+    KroneckerMarginalLogLikelihood,
+    KroneckerMultiTaskGP,
+    MultiTaskGP,
+)
+from botorch.models.utils import _make_X_full
 from botorch.posteriors import GPyTorchPosterior
 from gpytorch.distributions import MultitaskMultivariateNormal, MultivariateNormal
 from gpytorch.kernels import IndexKernel, MaternKernel, ScaleKernel
@@ -131,6 +139,95 @@ class TestMultiTaskGP(unittest.TestCase):
         if torch.cuda.is_available():
             self.test_MultiTaskGP(cuda=True)
 
+    def test_MultiTaskGP_structured_posterior(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            atol = 1e-6 if double else 1e-4
+            # three tasks, two features, task feature in the last column
+            train_i = (torch.arange(15, **tkwargs) % 3).unsqueeze(-1)
+            train_X = torch.cat([torch.rand(15, 2, **tkwargs), train_i], dim=-1)
+            train_Y = torch.sin(3 * train_X.sum(dim=-1))
+            model = MultiTaskGP(train_X, train_Y, task_feature=-1)
+            self.assertEqual(model._task_feature, 2)
+            with torch.no_grad():
+                for param in model.parameters():
+                    param.add_(0.3 * torch.rand_like(param))
+            test_x = torch.rand(4, 5, 2, **tkwargs)
+            for output_indices in ([2, 0], [1]):
+                for observation_noise in (False, True):
+                    posterior = model.posterior(
+                        test_x,
+                        output_indices=output_indices,
+                        observation_noise=observation_noise,
+                    )
+                    # compare against evaluating the model on replicated inputs
+                    X_full = _make_X_full(test_x, output_indices, tf=2)
+                    with torch.no_grad():
+                        expected = model(X_full)
+                        if observation_noise:
+                            expected = model.likelihood(expected, X_full)
+                    o = len(output_indices)
+                    self.assertEqual(posterior.mean.shape, torch.Size([4, 5, o]))
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.mean,
+                            expected.mean.view(4, o, 5).transpose(-1, -2),
+                            atol=atol,
+                        )
+                    )
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.mvn.covariance_matrix,
+                            expected.covariance_matrix,
+                            atol=atol,
+                        )
+                    )
+            self.assertIsNotNone(model._prediction_cache)
+            # test gradients w.r.t. the training inputs without detaching caches
+            model.train_inputs[0].requires_grad_(True)
+            posterior = model.posterior(test_x, detach_test_caches=False)
+            posterior.mean.sum().backward()
+            self.assertIsNotNone(model.train_inputs[0].grad)
+            # train mode clears the cache
+            model.train()
+            self.assertIsNone(model._prediction_cache)
+            # the cache is rebuilt if the training data are set or a
+            # hyperparameter is assigned in eval mode
+            model.train_inputs[0].requires_grad_(False)
+            posterior = model.posterior(test_x)
+            cache = model._prediction_cache
+            model.posterior(test_x)
+            self.assertIs(model._prediction_cache, cache)
+            for modify in (
+                lambda: model.set_train_data(
+                    targets=model.train_targets + 1.0, strict=False
+                ),
+                lambda: setattr(model.likelihood, "noise", 0.5),
+            ):
+                modify()
+                new_posterior = model.posterior(test_x)
+                self.assertIsNot(model._prediction_cache, cache)
+                cache = model._prediction_cache
+                self.assertFalse(
+                    torch.allclose(new_posterior.mean, posterior.mean, atol=atol)
+                )
+                model.train()
+                expected = model.posterior(test_x)
+                self.assertTrue(
+                    torch.allclose(new_posterior.mean, expected.mean, atol=atol)
+                )
+                self.assertTrue(
+                    torch.allclose(new_posterior.variance, expected.variance, atol=atol)
+                )
+                posterior, cache = expected, model._prediction_cache
+
+    def test_MultiTaskGP_structured_posterior_cuda(self):
+        if torch.cuda.is_available():
+            self.test_MultiTaskGP_structured_posterior(cuda=True)
+
     def test_MultiTaskGP_single_output(self, cuda=False):
         for double in (False, True):
             tkwargs = {
@@ -283,3 +380,136 @@ class TestFixedNoiseMultiTaskGP(unittest.TestCase):
     def test_FixedNoiseMultiTaskGP_single_output_cuda(self):
         if torch.cuda.is_available():
             self.test_FixedNoiseMultiTaskGP_single_output(cuda=True)
+
+
+class TestKroneckerMultiTaskGP(unittest.TestCase):
+    def test_KroneckerMultiTaskGP(self, cuda=False):
+        for double in (False, True):
+            tkwargs = {
+                "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                "dtype": torch.double if double else torch.float,
+            }
+            # full grid of 8 inputs and 3 tasks in random order
+            X = torch.rand(8, 2, **tkwargs)
+            train_X = torch.cat(
+                [torch.cat([torch.full_like(X[:, :1], i), X], dim=-1) for i in range(3)]
+            )
+            train_Y = torch.sin(6 * train_X.sum(dim=-1))
+            perm = torch.randperm(24, device=tkwargs["device"])
+            model = KroneckerMultiTaskGP(train_X[perm], train_Y[perm], task_feature=0)
+            self.assertIsInstance(model, MultiTaskGP)
+            # training data is stored in task-major grid order
+            train_inputs = model.train_inputs[0].view(3, 8, 3)
+            self.assertTrue(
+                torch.equal(
+                    train_inputs[..., 0],
+                    torch.arange(3, **tkwargs).view(3, 1).expand(3, 8),
+                )
+            )
+            self.assertTrue(
+                torch.equal(
+                    train_inputs[1:, :, 1:], train_inputs[:1, :, 1:].expand(2, 8, 2)
+                )
+            )
+            with torch.no_grad():
+                for param in model.parameters():
+                    param.add_(0.3 * torch.rand_like(param))
+            # compare against the (dense) MultiTaskGP
+            dense_model = MultiTaskGP(
+                model.train_inputs[0], model.train_targets, task_feature=0
+            )
+            dense_model.load_state_dict(model.state_dict())
+            mll = KroneckerMarginalLogLikelihood(model.likelihood, model)
+            dense_mll = ExactMarginalLogLikelihood(dense_model.likelihood, dense_model)
+            model.train()
+            dense_model.train()
+            atol = 1e-6 if double else 1e-3
+            value = mll(model(*model.train_inputs), model.train_targets)
+            expected_value = dense_mll(
+                dense_model(*dense_model.train_inputs), dense_model.train_targets
+            )
+            self.assertTrue(torch.allclose(value, expected_value, atol=atol))
+            # the Kronecker-structured prior is consistent with the dense one
+            value = dense_mll(model(*model.train_inputs), model.train_targets)
+            self.assertTrue(torch.allclose(value, expected_value, atol=atol))
+            # test posterior
+            test_x = torch.rand(5, 2, **tkwargs)
+            for output_indices in (None, [2, 0], [1]):
+                for observation_noise in (False, True):
+                    posterior = model.posterior(
+                        test_x,
+                        output_indices=output_indices,
+                        observation_noise=observation_noise,
+                    )
+                    expected = dense_model.posterior(
+                        test_x,
+                        output_indices=output_indices,
+                        observation_noise=observation_noise,
+                    )
+                    o = 3 if output_indices is None else len(output_indices)
+                    self.assertEqual(posterior.mean.shape, torch.Size([5, o]))
+                    self.assertTrue(
+                        torch.allclose(posterior.mean, expected.mean, atol=atol)
+                    )
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.mvn.covariance_matrix,
+                            expected.mvn.covariance_matrix,
+                            atol=atol,
+                        )
+                    )
+                    if o > 1:
+                        self.assertIsInstance(
+                            posterior.mvn, MultitaskMultivariateNormal
+                        )
+                    else:
+                        self.assertIsInstance(posterior.mvn, MultivariateNormal)
+            self.assertIsNotNone(model._kronecker_cache)
+            # test posterior (batch eval)
+            test_x = torch.rand(4, 5, 2, **tkwargs)
+            posterior = model.posterior(test_x)
+            self.assertEqual(posterior.mean.shape, torch.Size([4, 5, 3]))
+            posterior_1 = model.posterior(test_x[1])
+            self.assertTrue(
+                torch.allclose(posterior.mean[1], posterior_1.mean, atol=atol)
+            )
+            self.assertTrue(
+                torch.allclose(
+                    posterior.mvn.covariance_matrix[1],
+                    posterior_1.mvn.covariance_matrix,
+                    atol=atol,
+                )
+            )
+            # train mode clears the cache
+            model.train()
+            self.assertIsNone(model._kronecker_cache)
+            # test model fitting
+            fit_gpytorch_model(mll, options={"maxiter": 1})
+
+    def test_KroneckerMultiTaskGP_cuda(self):
+        if torch.cuda.is_available():
+            self.test_KroneckerMultiTaskGP(cuda=True)
+
+    def test_KroneckerMultiTaskGP_errors(self):
+        X = torch.rand(4, 1)
+        train_X = torch.cat(
+            [
+                torch.cat([X, torch.zeros(4, 1)], -1),
+                torch.cat([X, torch.ones(4, 1)], -1),
+            ]
+        )
+        train_Y = torch.rand(8)
+        with self.assertRaises(ValueError):
+            KroneckerMultiTaskGP(torch.rand(2, 8, 2), train_Y, task_feature=-1)
+        # missing observation
+        with self.assertRaises(ValueError):
+            KroneckerMultiTaskGP(train_X[:-1], train_Y[:-1], task_feature=-1)
+        # different inputs for different tasks
+        train_X_ng = train_X.clone()
+        train_X_ng[-1, 0] += 0.1
+        with self.assertRaises(ValueError):
+            KroneckerMultiTaskGP(train_X_ng, train_Y, task_feature=-1)
+        # KroneckerMarginalLogLikelihood requires a KroneckerMultiTaskGP
+        model = SingleTaskGP(X, train_Y[:4])
+        with self.assertRaises(UnsupportedError):
+            KroneckerMarginalLogLikelihood(model.likelihood, model)
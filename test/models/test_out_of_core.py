@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.fit import fit_gpytorch_model
+from botorch.models import (
+    InferenceSettings,
+    OutOfCoreMarginalLogLikelihood,
+    OutOfCoreSingleTaskGP,
+    SingleTaskGP,
+)
+from botorch.posteriors import GPyTorchPosterior
+from gpytorch import settings
+from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+
+
+def _get_data(n, d, **tkwargs):
+    train_X = torch.rand(n, d, **tkwargs)
+    train_Y = torch.sin(6 * train_X.sum(dim=-1, keepdim=True))
+    return train_X, train_Y + 0.1 * torch.randn_like(train_Y)
+
+
+class TestOutOfCoreSingleTaskGP(unittest.TestCase):
+    def test_out_of_core_single_task_gp(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda" if cuda else "cpu"),
+            "dtype": torch.double,
+        }
+        train_X, train_Y = _get_data(30, 2, **tkwargs)
+        model = OutOfCoreSingleTaskGP(train_X, train_Y, tile_size=8)
+        dense_model = SingleTaskGP(train_X, train_Y)
+        dense_model.inference_settings = InferenceSettings(
+            solver="cholesky", fast_pred_var=False
+        )
+        for m in (model, dense_model):
+            m.covar_module.base_kernel.lengthscale = torch.tensor([0.3, 0.5])
+            m.likelihood.noise = 0.05
+        # test log marginal likelihood and its gradient
+        mll = OutOfCoreMarginalLogLikelihood(model.likelihood, model)
+        dense_mll = ExactMarginalLogLikelihood(dense_model.likelihood, dense_model)
+        mll.train()
+        dense_mll.train()
+        train_inputs, train_targets = model.train_inputs, model.train_targets
+        loss = mll(model(*train_inputs), train_targets, *train_inputs)
+        loss.backward()
+        with settings.max_cholesky_size(float("inf")):
+            dense_loss = dense_mll(
+                dense_model(*train_inputs), train_targets, *train_inputs
+            )
+            dense_loss.backward()
+        self.assertAlmostEqual(loss.item(), dense_loss.item(), places=6)
+        for (name, p), dense_p in zip(
+            model.named_parameters(), dense_model.parameters()
+        ):
+            self.assertTrue(torch.allclose(p.grad, dense_p.grad, atol=1e-6), name)
+        # test posterior
+        test_X = torch.rand(3, 4, 2, **tkwargs, requires_grad=True)
+        dense_posterior = dense_model.posterior(test_X)
+        posterior = model.posterior(test_X)
+        self.assertIsInstance(posterior, GPyTorchPosterior)
+        self.assertEqual(posterior.mean.shape, torch.Size([3, 4, 1]))
+        self.assertTrue(torch.allclose(posterior.mean, dense_posterior.mean))
+        self.assertTrue(
+            torch.allclose(
+                posterior.mvn.covariance_matrix, dense_posterior.mvn.covariance_matrix
+            )
+        )
+        noisy_posterior = model.posterior(test_X, observation_noise=True)
+        self.assertTrue(
+            torch.allclose(
+                noisy_posterior.variance, posterior.variance + 0.05, atol=1e-6
+            )
+        )
+        posterior.mean.sum().backward()
+        self.assertEqual(test_X.grad.shape, test_X.shape)
+        # the factorization is cached until the model is modified
+        factorization = model._factorization[1]
+        model.posterior(test_X)
+        self.assertIs(model._factorization[1], factorization)
+        model.likelihood.noise = 0.1
+        model.posterior(test_X)
+        self.assertIsNot(model._factorization[1], factorization)
+        # test fitting
+        fit_gpytorch_model(mll, options={"maxiter": 5})
+        self.assertFalse(model.training)
+        # test errors
+        with self.assertRaises(UnsupportedError):
+            OutOfCoreSingleTaskGP(train_X.expand(2, 30, 2), train_Y)
+        with self.assertRaises(UnsupportedError):
+            OutOfCoreSingleTaskGP(train_X, train_Y.repeat(1, 2))
+        with self.assertRaises(UnsupportedError):
+            model.freeze()
+        with self.assertRaises(UnsupportedError):
+            model.condition_on_observations(train_X[:2], train_Y[:2])
+        with self.assertRaises(UnsupportedError):
+            OutOfCoreMarginalLogLikelihood(dense_model.likelihood, dense_model)
+
+    def test_out_of_core_single_task_gp_cuda(self):
+        if torch.cuda.is_available():
+            self.test_out_of_core_single_task_gp(cuda=True)
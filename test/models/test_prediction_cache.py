@@ -0,0 +1,324 @@
+#! /usr/bin/env python3
+
+import math
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import torch
+from botorch.exceptions.errors import BotorchError
+from botorch.models.gp_regression import FixedNoiseGP, SingleTaskGP
+from botorch.models.prediction_cache import (
+    ExactPredictionCache,
+    build_prediction_cache,
+    extend_prediction_cache,
+    get_variance_root,
+    predict_from_cache,
+    remove_from_prediction_cache,
+)
+
+
+def _get_data(batch_shape, num_outputs, n=12, **tkwargs):
+    train_X = torch.rand(batch_shape + torch.Size([n, 2]), **tkwargs)
+    train_Y = torch.sin(train_X.sum(dim=-1, keepdim=True) * (2 * math.pi))
+    train_Y = train_Y.repeat(*[1] * len(batch_shape), 1, num_outputs)
+    train_Y = train_Y + 0.1 * torch.randn_like(train_Y)
+    train_Yvar = torch.full_like(train_Y, 0.01)
+    if num_outputs == 1:
+        train_Y, train_Yvar = train_Y.squeeze(-1), train_Yvar.squeeze(-1)
+    return train_X, train_Y, train_Yvar
+
+
+def _perturb_parameters(model):
+    with torch.no_grad():
+        for param in model.parameters():
+            param.add_(0.5 * torch.rand_like(param))
+
+
+class TestPredictionCache(unittest.TestCase):
+    def test_prediction_cache(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            train_X, train_Y, _ = _get_data(batch_shape, num_outputs=1, **tkwargs)
+            model = SingleTaskGP(train_X[..., :8, :], train_Y[..., :8])
+            _perturb_parameters(model)
+            model.eval()
+            cache = build_prediction_cache(model)
+            self.assertIsInstance(cache, ExactPredictionCache)
+            self.assertEqual(cache.L.shape, batch_shape + torch.Size([8, 8]))
+            self.assertEqual(cache.alpha.shape, batch_shape + torch.Size([8]))
+            test_X = torch.rand(3, *batch_shape, 4, 2, **tkwargs)
+            mvn = predict_from_cache(cache=cache, model=model, X=test_X)
+            expected = model(test_X)
+            self.assertTrue(torch.allclose(mvn.mean, expected.mean, atol=1e-6))
+            self.assertTrue(
+                torch.allclose(
+                    mvn.covariance_matrix, expected.covariance_matrix, atol=1e-6
+                )
+            )
+            # the same posterior using the (batched or non-batched) variance root
+            mvn_root = predict_from_cache(
+                cache=cache,
+                model=model,
+                X=test_X,
+                variance_root=get_variance_root(cache),
+            )
+            self.assertTrue(torch.allclose(mvn_root.mean, mvn.mean))
+            self.assertTrue(
+                torch.allclose(
+                    mvn_root.covariance_matrix, mvn.covariance_matrix, atol=1e-6
+                )
+            )
+            # extend the cache
+            cache = extend_prediction_cache(
+                cache=cache, model=model, X=train_X[..., 8:, :], Y=train_Y[..., 8:]
+            )
+            self.assertEqual(cache.L.shape, batch_shape + torch.Size([12, 12]))
+            expected_model = SingleTaskGP(train_X, train_Y)
+            expected_model.load_state_dict(model.state_dict())
+            expected_cache = build_prediction_cache(expected_model.eval())
+            for t, expected_t in zip(cache, expected_cache):
+                self.assertTrue(torch.allclose(t, expected_t, atol=1e-6))
+            # remove an observation from the cache
+            cache = remove_from_prediction_cache(cache=cache, model=model, index=3)
+            self.assertEqual(cache.L.shape, batch_shape + torch.Size([11, 11]))
+            keep = [i for i in range(12) if i != 3]
+            expected_model.set_train_data(
+                train_X[..., keep, :], train_Y[..., keep], strict=False
+            )
+            expected_cache = build_prediction_cache(expected_model)
+            for t, expected_t in zip(cache, expected_cache):
+                self.assertTrue(torch.allclose(t, expected_t, atol=1e-6))
+
+    def test_prediction_cache_cuda(self):
+        if torch.cuda.is_available():
+            self.test_prediction_cache(cuda=True)
+
+
+class TestConditionOnObservations(unittest.TestCase):
+    def test_condition_on_observations(self, cuda=False):
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                for double in (False, True):
+                    tkwargs = {
+                        "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                        "dtype": torch.double if double else torch.float,
+                    }
+                    train_X, train_Y, train_Yvar = _get_data(
+                        batch_shape, num_outputs=num_outputs, **tkwargs
+                    )
+                    n, k = 8, 2
+                    for fixed_noise in (False, True):
+                        model_cls = FixedNoiseGP if fixed_noise else SingleTaskGP
+                        model = _get_model(model_cls, train_X, train_Y, train_Yvar, n)
+                        _perturb_parameters(model)
+                        self.assertIsNone(model._prediction_cache)
+                        # condition on two batches of k observations
+                        for i in (n, n + k):
+                            new_Y = (
+                                train_Y[..., i : i + k]
+                                if num_outputs == 1
+                                else train_Y[..., i : i + k, :]
+                            )
+                            new_Yvar = torch.full_like(new_Y, 0.01)
+                            model.condition_on_observations(
+                                train_X[..., i : i + k, :], new_Y, noise=new_Yvar
+                            )
+                        self.assertIsInstance(
+                            model._prediction_cache, ExactPredictionCache
+                        )
+                        self.assertEqual(
+                            model.train_inputs[0].shape[-2:], torch.Size([12, 2])
+                        )
+                        self.assertEqual(model.train_targets.shape[-1], 12)
+                        # compare against a model on all data with the same
+                        # hyperparameters
+                        expected_model = _get_model(
+                            model_cls, train_X, train_Y, train_Yvar, n + 2 * k
+                        )
+                        expected_model.load_state_dict(model.state_dict())
+                        test_X = torch.rand(3, *batch_shape, 4, 2, **tkwargs)
+                        posterior = model.posterior(test_X)
+                        expected_posterior = expected_model.posterior(test_X)
+                        expected_shape = torch.Size([3]) + batch_shape
+                        expected_shape += torch.Size([4, num_outputs])
+                        self.assertEqual(posterior.mean.shape, expected_shape)
+                        atol = 1e-6 if double else 1e-3
+                        self.assertTrue(
+                            torch.allclose(
+                                posterior.mean, expected_posterior.mean, atol=atol
+                            )
+                        )
+                        self.assertTrue(
+                            torch.allclose(
+                                posterior.variance,
+                                expected_posterior.variance,
+                                atol=atol,
+                            )
+                        )
+                        # gradients w.r.t. the test points
+                        test_X.requires_grad_(True)
+                        model.posterior(test_X).mean.sum().backward()
+                        self.assertIsNotNone(test_X.grad)
+                        # train mode clears the cache
+                        model.train()
+                        self.assertIsNone(model._prediction_cache)
+
+    def test_condition_on_observations_cuda(self):
+        if torch.cuda.is_available():
+            self.test_condition_on_observations(cuda=True)
+
+    def test_condition_on_observations_errors(self):
+        train_X, train_Y, train_Yvar = _get_data(torch.Size(), num_outputs=1)
+        model = FixedNoiseGP(train_X, train_Y, train_Yvar)
+        with self.assertRaises(ValueError):
+            model.condition_on_observations(train_X[:2], train_Y[:2])
+
+
+class TestFreeze(unittest.TestCase):
+    def test_freeze(self, cuda=False):
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                for double in (False, True):
+                    tkwargs = {
+                        "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                        "dtype": torch.double if double else torch.float,
+                    }
+                    train_X, train_Y, train_Yvar = _get_data(
+                        batch_shape, num_outputs=num_outputs, **tkwargs
+                    )
+                    for model_cls in (SingleTaskGP, FixedNoiseGP):
+                        model = _get_model(model_cls, train_X, train_Y, train_Yvar, 12)
+                        _perturb_parameters(model)
+                        test_X = torch.rand(3, *batch_shape, 4, 2, **tkwargs)
+                        expected_posterior = model.posterior(test_X)
+                        expected_noisy = model.posterior(test_X, observation_noise=True)
+                        self.assertFalse(model.is_frozen)
+                        model.freeze()
+                        self.assertTrue(model.is_frozen)
+                        self.assertFalse(model.training)
+                        self.assertIsInstance(
+                            model._prediction_cache, ExactPredictionCache
+                        )
+                        posterior = model.posterior(test_X)
+                        self.assertEqual(
+                            posterior.mean.shape, expected_posterior.mean.shape
+                        )
+                        atol = 1e-6 if double else 1e-3
+                        self.assertTrue(
+                            torch.allclose(
+                                posterior.mean, expected_posterior.mean, atol=atol
+                            )
+                        )
+                        self.assertTrue(
+                            torch.allclose(
+                                posterior.variance,
+                                expected_posterior.variance,
+                                atol=atol,
+                            )
+                        )
+                        # observation noise
+                        noisy_posterior = model.posterior(
+                            test_X, observation_noise=True
+                        )
+                        self.assertTrue(
+                            torch.allclose(
+                                noisy_posterior.variance,
+                                expected_noisy.variance,
+                                atol=atol,
+                            )
+                        )
+                        if model_cls is SingleTaskGP:
+                            self.assertTrue(
+                                (noisy_posterior.variance > posterior.variance).all()
+                            )
+                        # gradients w.r.t. the test points
+                        test_X.requires_grad_(True)
+                        model.posterior(test_X).mean.sum().backward()
+                        self.assertIsNotNone(test_X.grad)
+                        # gradients w.r.t. the training inputs
+                        train_inputs = model.train_inputs[0].requires_grad_(True)
+                        model.posterior(
+                            test_X, detach_test_caches=False
+                        ).mean.sum().backward()
+                        self.assertIsNotNone(train_inputs.grad)
+                        train_inputs.requires_grad_(False)
+                        # modifying the training data
+                        train_targets = model.train_targets
+                        model.set_train_data(
+                            targets=train_targets.clone(), strict=False
+                        )
+                        with self.assertRaises(BotorchError):
+                            model.posterior(test_X)
+                        model.set_train_data(targets=train_targets, strict=False)
+                        model.posterior(test_X)
+                        # frozen models cannot be modified
+                        with self.assertRaises(BotorchError):
+                            model.train()
+                        with self.assertRaises(BotorchError):
+                            model.condition_on_observations(
+                                train_X[..., :1, :],
+                                train_Y[..., :1, :]
+                                if num_outputs > 1
+                                else train_Y[..., :1],
+                            )
+                        _perturb_parameters(model)
+                        with self.assertRaises(BotorchError):
+                            model.posterior(test_X)
+                        # unfreezing allows modifying the model again
+                        model.unfreeze()
+                        self.assertFalse(model.is_frozen)
+                        self.assertIsNone(model._prediction_cache)
+                        model.posterior(test_X)
+                        model.train()
+
+    def test_freeze_cuda(self):
+        if torch.cuda.is_available():
+            self.test_freeze(cuda=True)
+
+    def test_read_only(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        for num_outputs in (1, 2):
+            train_X, train_Y, _ = _get_data(
+                torch.Size(), num_outputs=num_outputs, **tkwargs
+            )
+            model = SingleTaskGP(train_X, train_Y)
+            _perturb_parameters(model)
+            test_Xs = [torch.rand(4, 2, **tkwargs) for _ in range(16)]
+            expected_means = [model.posterior(X).mean for X in test_Xs]
+            model.train()
+            model.set_read_only()
+            self.assertFalse(model.is_frozen)
+            with mock.patch.object(model, "freeze", wraps=model.freeze) as mock_freeze:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    posteriors = list(executor.map(model.posterior, test_Xs))
+                self.assertEqual(mock_freeze.call_count, 1)
+            self.assertTrue(model.is_frozen)
+            for posterior, expected_mean in zip(posteriors, expected_means):
+                self.assertTrue(torch.allclose(posterior.mean, expected_mean))
+            # leaving read-only mode unfreezes the model
+            model.set_read_only(False)
+            self.assertFalse(model.is_frozen)
+            model.posterior(test_Xs[0])
+            self.assertFalse(model.is_frozen)
+
+    def test_read_only_cuda(self):
+        if torch.cuda.is_available():
+            self.test_read_only(cuda=True)
+
+
+def _get_model(model_cls, train_X, train_Y, train_Yvar, n):
+    args = [train_X[..., :n, :]]
+    if train_Y.dim() == train_X.dim():
+        args += [train_Y[..., :n, :], train_Yvar[..., :n, :]]
+    else:
+        args += [train_Y[..., :n], train_Yvar[..., :n]]
+    if model_cls is SingleTaskGP:
+        args = args[:2]
+    return model_cls(*args)
@@ -0,0 +1,110 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import SingleTaskGP, SlidingWindowGP
+from botorch.models.sliding_window import _remove_from_inverse
+
+
+def _get_data(n, num_outputs, **tkwargs):
+    train_X = torch.rand(n, 2, **tkwargs)
+    train_Y = torch.sin(6 * train_X.sum(dim=-1, keepdim=True))
+    train_Y = train_Y.repeat(1, num_outputs) + 0.1 * torch.randn(
+        n, num_outputs, **tkwargs
+    )
+    return train_X, train_Y.squeeze(-1) if num_outputs == 1 else train_Y
+
+
+class TestSlidingWindowGP(unittest.TestCase):
+    def test_sliding_window_gp(self, cuda=False):
+        for num_outputs in (1, 2):
+            for double in (False, True):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double if double else torch.float,
+                }
+                train_X, train_Y = _get_data(20, num_outputs, **tkwargs)
+                # only the last window_size points are used initially
+                model = SlidingWindowGP(train_X[:12], train_Y[:12], window_size=10)
+                self.assertEqual(model.train_inputs[0].shape[-2], 10)
+                train_inputs = model.train_inputs[0]
+                self.assertTrue(
+                    torch.equal(train_inputs, train_X[2:12].expand_as(train_inputs))
+                )
+                with torch.no_grad():
+                    for param in model.parameters():
+                        param.add_(0.5 * torch.rand_like(param))
+                model.condition_on_observations(train_X[12:15], train_Y[12:15])
+                model.condition_on_observations(train_X[15:], train_Y[15:])
+                self.assertEqual(model.train_targets.shape[-1], 10)
+                self.assertEqual(model._prediction_cache.L.shape[-1], 10)
+                # the most recent points are kept
+                self.assertTrue(
+                    torch.equal(
+                        model.train_inputs[0],
+                        train_X[10:].expand_as(model.train_inputs[0]),
+                    )
+                )
+                # compare against a model on the window with the same hyperparameters
+                expected_model = SingleTaskGP(train_X[10:], train_Y[10:])
+                expected_model.load_state_dict(model.state_dict())
+                test_X = torch.rand(3, 4, 2, **tkwargs)
+                posterior = model.posterior(test_X)
+                expected_posterior = expected_model.posterior(test_X)
+                atol = 1e-6 if double else 1e-3
+                self.assertTrue(
+                    torch.allclose(posterior.mean, expected_posterior.mean, atol=atol)
+                )
+                self.assertTrue(
+                    torch.allclose(
+                        posterior.variance, expected_posterior.variance, atol=atol
+                    )
+                )
+
+    def test_sliding_window_gp_cuda(self):
+        if torch.cuda.is_available():
+            self.test_sliding_window_gp(cuda=True)
+
+    def test_sliding_window_gp_loo_variance(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        train_X = torch.linspace(0, 1, 5, **tkwargs).unsqueeze(-1)
+        train_Y = torch.sin(6 * train_X).squeeze(-1)
+        model = SlidingWindowGP(
+            train_X, train_Y, window_size=5, eviction="loo_variance"
+        )
+        # a replicate of an existing point is the least informative point
+        model.condition_on_observations(train_X[2:3] + 1e-4, train_Y[2:3])
+        self.assertEqual(model.train_targets.shape[-1], 5)
+        train_inputs = model.train_inputs[0].view(-1)
+        self.assertEqual((train_inputs - train_X[2]).abs().lt(1e-3).sum().item(), 1)
+        for x in train_X[[0, 1, 3, 4]].view(-1):
+            self.assertIn(x.item(), train_inputs.tolist())
+
+        # multiple evictions in one call
+        model.condition_on_observations(
+            torch.rand(3, 1, **tkwargs), torch.rand(3, **tkwargs)
+        )
+        self.assertEqual(model.train_targets.shape[-1], 5)
+        # the inverse is downdated rather than recomputed
+        A = torch.rand(2, 6, 6, **tkwargs)
+        K = A @ A.transpose(-1, -2) + torch.eye(6, **tkwargs)
+        keep = [0, 1, 3, 4, 5]
+        K_inv = _remove_from_inverse(K.inverse(), 2)
+        expected = K[..., keep, :][..., keep].inverse()
+        self.assertTrue(torch.allclose(K_inv, expected))
+
+    def test_sliding_window_gp_loo_variance_cuda(self):
+        if torch.cuda.is_available():
+            self.test_sliding_window_gp_loo_variance(cuda=True)
+
+    def test_sliding_window_gp_errors(self):
+        train_X, train_Y = _get_data(5, 1)
+        with self.assertRaises(UnsupportedError):
+            SlidingWindowGP(train_X.unsqueeze(0), train_Y.unsqueeze(0), window_size=3)
+        with self.assertRaises(ValueError):
+            SlidingWindowGP(train_X, train_Y, window_size=3, eviction="foo")
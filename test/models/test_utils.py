@@ -3,7 +3,13 @@
 import unittest
 
 import torch
-from botorch.models.utils import add_output_dim, multioutput_to_batch_mode_transform
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models.utils import (
+    add_output_dim,
+    aggregate_replicates,
+    group_replicates,
+    multioutput_to_batch_mode_transform,
+)
 
 
 class TestMultiOutputToBatchModeTransform(unittest.TestCase):
@@ -88,3 +94,53 @@ class TestAddOutputDim(unittest.TestCase):
     def test_add_output_dim_cuda(self, cuda=False):
         if torch.cuda.is_available():
             self.test_add_output_dim(cuda=True)
+
+
+class TestAggregateReplicates(unittest.TestCase):
+    def test_aggregate_replicates(self, cuda=False):
+        for dtype in (torch.float, torch.double):
+            tkwargs = {
+                "device": torch.device("cuda" if cuda else "cpu"),
+                "dtype": dtype,
+            }
+            train_X = torch.tensor([[0.0, 1.0], [0.5, 0.5], [0.0, 1.0], [0.5, 0.501]])
+            train_Y = torch.tensor([1.0, 2.0, 3.0, 4.0])
+            train_Yvar = torch.tensor([0.1, 0.1, 0.3, 0.1])
+            train_X, train_Y, train_Yvar = (
+                t.to(**tkwargs) for t in (train_X, train_Y, train_Yvar)
+            )
+            # exact replicates
+            X, Y, Yvar = aggregate_replicates(train_X, train_Y, train_Yvar)
+            self.assertTrue(torch.equal(X, train_X[[0, 1, 3]]))
+            expected_Y = torch.tensor([1.5, 2.0, 4.0], **tkwargs)
+            expected_Yvar = torch.tensor([0.075, 0.1, 0.1], **tkwargs)
+            self.assertTrue(torch.allclose(Y, expected_Y))
+            self.assertTrue(torch.allclose(Yvar, expected_Yvar))
+            # near-exact replicates, multiple outputs
+            X, Y, Yvar = aggregate_replicates(
+                train_X,
+                train_Y.unsqueeze(-1).repeat(1, 2),
+                train_Yvar.unsqueeze(-1).repeat(1, 2),
+                tol=1e-2,
+            )
+            self.assertTrue(torch.equal(X, train_X[:2]))
+            expected_Y = torch.tensor([1.5, 3.0], **tkwargs).unsqueeze(-1)
+            expected_Yvar = torch.tensor([0.075, 0.05], **tkwargs).unsqueeze(-1)
+            self.assertTrue(torch.allclose(Y, expected_Y.expand(2, 2)))
+            self.assertTrue(torch.allclose(Yvar, expected_Yvar.expand(2, 2)))
+            # groups are ordered by first occurrence
+            first_idcs, group = group_replicates(train_X.flip(0))
+            self.assertEqual(first_idcs.tolist(), [0, 1, 2])
+            self.assertEqual(group.tolist(), [0, 1, 2, 1])
+            # points are grouped by grid cells of side length `tol`
+            first_idcs, group = group_replicates(train_X, tol=2e-4)
+            self.assertEqual(group.tolist(), [0, 1, 0, 2])
+            # batched training data is not supported
+            with self.assertRaises(UnsupportedError):
+                aggregate_replicates(
+                    train_X.unsqueeze(0), train_Y.unsqueeze(0), train_Yvar.unsqueeze(0)
+                )
+
+    def test_aggregate_replicates_cuda(self):
+        if torch.cuda.is_available():
+            self.test_aggregate_replicates(cuda=True)
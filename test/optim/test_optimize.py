@@ -7,6 +7,7 @@ import torch
 from botorch.exceptions.errors import UnsupportedError
 from botorch.exceptions.warnings import BadInitialCandidatesWarning
 from botorch.optim.optimize import (
+    additive_optimize,
     gen_batch_initial_conditions,
     joint_optimize,
     sequential_optimize,
@@ -193,3 +194,45 @@ class TestJointOptimize(TestCase):
     def test_joint_optimize_cuda(self):
         if torch.cuda.is_available():
             self.test_joint_optimize(cuda=True)
+
+
+class TestAdditiveOptimize(TestCase):
+    @mock.patch("botorch.optim.optimize.joint_optimize")
+    def test_additive_optimize(self, mock_joint_optimize, cuda=False):
+        tkwargs = {"device": torch.device("cuda") if cuda else torch.device("cpu")}
+        groups = [[0, 2], [1]]
+        for dtype in (torch.float, torch.double):
+            tkwargs["dtype"] = dtype
+            acq_functions = [MockAcquisitionFunction() for _ in groups]
+            mock_joint_optimize.side_effect = [
+                torch.tensor([[1.0, 3.0]], **tkwargs),
+                torch.tensor([[2.0]], **tkwargs),
+            ]
+            bounds = torch.stack(
+                [torch.zeros(3, **tkwargs), 4 * torch.ones(3, **tkwargs)]
+            )
+            candidate = additive_optimize(
+                acq_functions=acq_functions,
+                groups=groups,
+                bounds=bounds,
+                num_restarts=2,
+                raw_samples=10,
+            )
+            expected_candidate = torch.tensor([[1.0, 2.0, 3.0]], **tkwargs)
+            self.assertTrue(torch.equal(candidate, expected_candidate))
+            call_args_list = mock_joint_optimize.call_args_list[-2:]
+            for acq_function, group, call_args in zip(
+                acq_functions, groups, call_args_list
+            ):
+                self.assertIs(call_args[1]["acq_function"], acq_function)
+                self.assertTrue(torch.equal(call_args[1]["bounds"], bounds[:, group]))
+                self.assertEqual(call_args[1]["q"], 1)
+            # test errors
+            with self.assertRaises(ValueError):
+                additive_optimize(acq_functions[:1], groups, bounds, 2, 10)
+            with self.assertRaises(ValueError):
+                additive_optimize(acq_functions, [[0], [1]], bounds, 2, 10)
+
+    def test_additive_optimize_cuda(self):
+        if torch.cuda.is_available():
+            self.test_additive_optimize(cuda=True)
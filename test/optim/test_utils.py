@@ -3,10 +3,13 @@
 import unittest
 
 import torch
+from botorch.exceptions.errors import UnsupportedError
 from botorch.models import ModelListGP, SingleTaskGP
 from botorch.optim.utils import (
     _expand_bounds,
+    _get_batch_mll,
     _get_extra_mll_args,
+    check_batch_convergence,
     check_convergence,
     columnwise_clamp,
     fix_features,
@@ -36,6 +39,30 @@ class TestCheckConvergence(unittest.TestCase):
             self.test_check_convergence(cuda=True)
 
 
+class TestCheckBatchConvergence(unittest.TestCase):
+    def test_check_batch_convergence(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        losses = [torch.tensor([5.0, 5.0], device=device)]
+        converged = check_batch_convergence(
+            loss_trajectory=losses, options={"maxiter": 5, "window": 1}
+        )
+        self.assertEqual(converged.dtype, torch.bool)
+        self.assertFalse(converged.any())
+        losses.append(torch.tensor([4.0, 5.0 - 1e-8], device=device))
+        converged = check_batch_convergence(
+            loss_trajectory=losses, options={"maxiter": 5, "window": 1}
+        )
+        self.assertEqual(converged.tolist(), [False, True])
+        converged = check_batch_convergence(
+            loss_trajectory=losses, options={"maxiter": 2, "window": 1}
+        )
+        self.assertTrue(converged.all())
+
+    def test_check_batch_convergence_cuda(self):
+        if torch.cuda.is_available():
+            self.test_check_batch_convergence(cuda=True)
+
+
 class TestColumnWiseClamp(unittest.TestCase):
     def setUp(self):
         self.X = torch.tensor([[-2, 1], [0.5, -0.5]])
@@ -166,6 +193,29 @@ class testGetExtraMllArgs(unittest.TestCase):
             _get_extra_mll_args(mll=unsupported_mll)
 
 
+class TestGetBatchMll(unittest.TestCase):
+    def test_get_batch_mll(self):
+        for dtype in (torch.float, torch.double):
+            train_X = torch.rand(3, 5, 1, dtype=dtype)
+            train_Y = torch.rand(3, 5, dtype=dtype)
+            model = SingleTaskGP(train_X, train_Y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model)
+            mll.train()
+            batch_mll = _get_batch_mll(mll)
+            self.assertEqual(batch_mll.shape, torch.Size([3]))
+            # each batch element is equal to the MLL of an individual model
+            for i in range(3):
+                model_i = SingleTaskGP(train_X[i], train_Y[i])
+                mll_i = ExactMarginalLogLikelihood(model_i.likelihood, model_i)
+                mll_i.train()
+                expected = mll_i(model_i(train_X[i]), train_Y[i], train_X[i])
+                self.assertTrue(torch.allclose(batch_mll[i], expected))
+            # test unsupported MarginalLogLikelihood type
+            unsupported_mll = MarginalLogLikelihood(model.likelihood, model)
+            with self.assertRaises(UnsupportedError):
+                _get_batch_mll(unsupported_mll)
+
+
 class testExpandBounds(unittest.TestCase):
     def test_expand_bounds(self):
         X = torch.zeros(2, 3)
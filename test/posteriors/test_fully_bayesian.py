@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.posteriors.fully_bayesian import FullyBayesianPosterior
+from gpytorch.distributions import MultivariateNormal
+from gpytorch.lazy.non_lazy_tensor import lazify
+
+
+class TestFullyBayesianPosterior(unittest.TestCase):
+    def test_FullyBayesianPosterior(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for dtype in (torch.float, torch.double):
+            # batch_shape = 2, num_samples = 4, q = 3
+            mean = torch.rand(2, 4, 3, dtype=dtype, device=device)
+            variance = 1 + torch.rand(2, 4, 3, dtype=dtype, device=device)
+            covar = variance.unsqueeze(-1) * torch.eye(3).type_as(variance)
+            mvn = MultivariateNormal(mean, lazify(covar))
+            posterior = FullyBayesianPosterior(mvn=mvn)
+            # basics
+            self.assertEqual(posterior.num_samples, 4)
+            self.assertEqual(posterior.device.type, device.type)
+            self.assertTrue(posterior.dtype == dtype)
+            self.assertEqual(posterior.event_shape, torch.Size([2, 3, 1]))
+            expected_mean = mean.mean(dim=-2).unsqueeze(-1)
+            self.assertTrue(torch.allclose(posterior.mean, expected_mean))
+            expected_variance = (variance + mean.pow(2)).mean(
+                dim=-2
+            ) - expected_mean.squeeze(-1).pow(2)
+            self.assertTrue(
+                torch.allclose(posterior.variance, expected_variance.unsqueeze(-1))
+            )
+            # rsample
+            samples = posterior.rsample()
+            self.assertEqual(samples.shape, torch.Size([1, 2, 3, 1]))
+            samples = posterior.rsample(sample_shape=torch.Size([4, 2]))
+            self.assertEqual(samples.shape, torch.Size([4, 2, 2, 3, 1]))
+            # rsample w/ base samples
+            base_samples = torch.randn(8, 1, 3, 1, device=device, dtype=dtype)
+            with self.assertRaises(RuntimeError):
+                posterior.rsample(
+                    sample_shape=torch.Size([3]), base_samples=base_samples
+                )
+            samples = posterior.rsample(
+                sample_shape=torch.Size([8]), base_samples=base_samples
+            )
+            self.assertEqual(samples.shape, torch.Size([8, 2, 3, 1]))
+            # sample i is drawn from mixture component i mod num_samples, also if
+            # the number of samples is not a multiple of the number of components
+            samples_6 = posterior.rsample(
+                sample_shape=torch.Size([6]), base_samples=base_samples[:6]
+            )
+            self.assertTrue(torch.equal(samples_6, samples[:6]))
+            for i in range(8):
+                expected = mean[:, i % 4] + variance[:, i % 4].sqrt() * base_samples[
+                    i
+                ].view(1, 3)
+                self.assertTrue(
+                    torch.allclose(samples[i].squeeze(-1), expected, atol=1e-5)
+                )
+            # without base samples, the components are selected in the same way
+            mvn = MultivariateNormal(
+                torch.arange(4, dtype=dtype, device=device).view(4, 1),
+                lazify(
+                    1e-10 * torch.eye(1, dtype=dtype, device=device).repeat(4, 1, 1)
+                ),
+            )
+            mixture_samples = FullyBayesianPosterior(mvn=mvn).rsample(torch.Size([7]))
+            components = mixture_samples.view(-1).round().long().tolist()
+            self.assertEqual(components, [0, 1, 2, 3, 0, 1, 2])
+
+    def test_FullyBayesianPosterior_cuda(self):
+        if torch.cuda.is_available():
+            self.test_FullyBayesianPosterior(cuda=True)
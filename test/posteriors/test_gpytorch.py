@@ -4,7 +4,7 @@ import unittest
 import warnings
 
 import torch
-from botorch.posteriors.gpytorch import GPyTorchPosterior
+from botorch.posteriors.gpytorch import GPyTorchPosterior, IndependentOutputPosterior
 from gpytorch.distributions import MultitaskMultivariateNormal, MultivariateNormal
 from gpytorch.lazy.non_lazy_tensor import lazify
 
@@ -252,3 +252,60 @@ class TestGPyTorchPosterior(unittest.TestCase):
     def test_degenerate_GPyTorchPosterior_Multitask_cuda(self):
         if torch.cuda.is_available():
             self.test_degenerate_GPyTorchPosterior_Multitask(cuda=True)
+
+
+class TestIndependentOutputPosterior(unittest.TestCase):
+    def test_IndependentOutputPosterior(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for dtype in (torch.float, torch.double):
+            tkwargs = {"device": device, "dtype": dtype}
+            # mean of shape `batch_shape_1 x o x batch_shape_2 x q`
+            mean = torch.rand(2, 3, 4, 5, **tkwargs)
+            A = torch.rand(2, 3, 4, 5, 5, **tkwargs)
+            covar = A @ A.transpose(-1, -2) + torch.eye(5, **tkwargs)
+            mvn = MultivariateNormal(mean, lazify(covar))
+            posterior = IndependentOutputPosterior(mvn=mvn, output_dim=1)
+            self.assertEqual(posterior.device.type, device.type)
+            self.assertTrue(posterior.dtype == dtype)
+            self.assertEqual(posterior.event_shape, torch.Size([2, 4, 5, 3]))
+            self.assertTrue(torch.equal(posterior.mean, mean.permute(0, 2, 3, 1)))
+            expected_variance = covar.diagonal(dim1=-2, dim2=-1).permute(0, 2, 3, 1)
+            self.assertTrue(torch.allclose(posterior.variance, expected_variance))
+            # compare against the equivalent MultitaskMultivariateNormal
+            mtmvn = posterior.mvn
+            self.assertIsInstance(mtmvn, MultitaskMultivariateNormal)
+            self.assertTrue(torch.allclose(mtmvn.mean, posterior.mean))
+            self.assertTrue(torch.allclose(mtmvn.variance, posterior.variance))
+            self.assertIs(posterior.mvn, mtmvn)
+            self.assertTrue(posterior._is_mt)
+            # setting the mvn sets the batched MVN and resets the lazy MTMVN
+            posterior.mvn = MultivariateNormal(mean + 1, lazify(covar))
+            self.assertTrue(torch.equal(posterior.batched_mvn.mean, mean + 1))
+            self.assertTrue(torch.allclose(posterior.mvn.mean, posterior.mean))
+            posterior.mvn = mvn
+            # rsample
+            samples = posterior.rsample()
+            self.assertEqual(samples.shape, torch.Size([1, 2, 4, 5, 3]))
+            samples = posterior.rsample(sample_shape=torch.Size([4, 2]))
+            self.assertEqual(samples.shape, torch.Size([4, 2, 2, 4, 5, 3]))
+            # rsample w/ base samples
+            base_samples = torch.randn(8, 2, 4, 5, 3, **tkwargs)
+            with self.assertRaises(RuntimeError):
+                posterior.rsample(
+                    sample_shape=torch.Size([3]), base_samples=base_samples
+                )
+            samples = posterior.rsample(
+                sample_shape=torch.Size([8]), base_samples=base_samples
+            )
+            L = torch.cholesky(covar)
+            expected = mean + (
+                L @ base_samples.permute(0, 1, 4, 2, 3).unsqueeze(-1)
+            ).squeeze(-1)
+            atol = 1e-6 if dtype == torch.double else 1e-4
+            self.assertTrue(
+                torch.allclose(samples, expected.permute(0, 1, 3, 4, 2), atol=atol)
+            )
+
+    def test_IndependentOutputPosterior_cuda(self):
+        if torch.cuda.is_available():
+            self.test_IndependentOutputPosterior(cuda=True)
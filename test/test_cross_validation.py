@@ -4,7 +4,15 @@ import math
 import unittest
 
 import torch
-from botorch.cross_validation import batch_cross_validation, gen_loo_cv_folds
+from botorch.cross_validation import (
+    batch_cross_validation,
+    gen_kfold_cv_folds,
+    gen_loo_cv_folds,
+    loo_cross_validation,
+    streaming_cross_validation,
+)
+from botorch.exceptions.errors import UnsupportedError
+from botorch.models import ModelListGP
 from botorch.models.gp_regression import FixedNoiseGP, SingleTaskGP
 from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
 
@@ -67,3 +75,299 @@ class TestFitBatchCrossValidation(unittest.TestCase):
     def test_single_task_batch_cv_cuda(self):
         if torch.cuda.is_available():
             self.test_single_task_batch_cv(cuda=True)
+
+
+class TestGenLooCVFolds(unittest.TestCase):
+    def test_gen_loo_cv_folds(self, cuda=False):
+        n = 5
+        tkwargs = {"device": torch.device("cuda") if cuda else torch.device("cpu")}
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            train_X = torch.rand(batch_shape + torch.Size([n, 2]), **tkwargs)
+            train_Y = torch.rand(batch_shape + torch.Size([n]), **tkwargs)
+            train_Yvar = torch.rand_like(train_Y)
+            cv_folds = gen_loo_cv_folds(
+                train_X=train_X, train_Y=train_Y, train_Yvar=train_Yvar
+            )
+            self.assertEqual(
+                cv_folds.train_X.shape, batch_shape + torch.Size([n, n - 1, 2])
+            )
+            self.assertEqual(cv_folds.test_X.shape, batch_shape + torch.Size([n, 1, 2]))
+            self.assertEqual(
+                cv_folds.train_Yvar.shape, batch_shape + torch.Size([n, n - 1, 1])
+            )
+            for i in range(n):
+                mask = torch.arange(n, **tkwargs) != i
+                self.assertTrue(
+                    torch.equal(cv_folds.train_X[..., i, :, :], train_X[..., mask, :])
+                )
+                self.assertTrue(
+                    torch.equal(cv_folds.test_X[..., i, :, :], train_X[..., [i], :])
+                )
+                self.assertTrue(
+                    torch.equal(cv_folds.train_Y[..., i, :, 0], train_Y[..., mask])
+                )
+                self.assertTrue(
+                    torch.equal(cv_folds.test_Yvar[..., i, :, 0], train_Yvar[..., [i]])
+                )
+
+    def test_gen_loo_cv_folds_cuda(self):
+        if torch.cuda.is_available():
+            self.test_gen_loo_cv_folds(cuda=True)
+
+
+class TestLooCrossValidation(unittest.TestCase):
+    def test_loo_cross_validation(self, cuda=False):
+        n = 8
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double,
+                }
+                train_X, train_Y = _get_random_data(
+                    batch_shape=batch_shape, num_outputs=num_outputs, n=n, **tkwargs
+                )
+                train_Yvar = torch.full_like(train_Y, 0.01)
+                expected_shape = batch_shape + torch.Size([n, 1, num_outputs])
+                for model_cls, Yvar in (
+                    (SingleTaskGP, None),
+                    (FixedNoiseGP, train_Yvar),
+                ):
+                    kwargs = {"train_X": train_X, "train_Y": train_Y}
+                    if Yvar is not None:
+                        kwargs["train_Yvar"] = Yvar
+                    model = model_cls(**kwargs)
+                    model.eval()
+                    cv_results = loo_cross_validation(model)
+                    self.assertIs(cv_results.model, model)
+                    posterior = cv_results.posterior
+                    self.assertEqual(posterior.mean.shape, expected_shape)
+                    self.assertEqual(posterior.variance.shape, expected_shape)
+                    self.assertEqual(cv_results.observed_Y.shape, expected_shape)
+                    # compare against conditioning on the LOO folds with the
+                    # same hyperparameters
+                    cv_folds = gen_loo_cv_folds(
+                        train_X=train_X, train_Y=train_Y, train_Yvar=Yvar
+                    )
+                    fold_kwargs = {
+                        "train_X": cv_folds.train_X,
+                        "train_Y": cv_folds.train_Y,
+                    }
+                    if Yvar is not None:
+                        fold_kwargs["train_Yvar"] = cv_folds.train_Yvar
+                    expected_posterior = model_cls(**fold_kwargs).posterior(
+                        cv_folds.test_X
+                    )
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.mean, expected_posterior.mean, atol=1e-6
+                        )
+                    )
+                    self.assertTrue(
+                        torch.allclose(
+                            posterior.variance, expected_posterior.variance, atol=1e-6
+                        )
+                    )
+                    self.assertTrue(torch.equal(cv_results.observed_Y, cv_folds.test_Y))
+                    # test observation noise
+                    noisy_cv_results = loo_cross_validation(
+                        model, observation_noise=True
+                    )
+                    noise = noisy_cv_results.posterior.variance - posterior.variance
+                    if Yvar is None:
+                        self.assertIsNone(cv_results.observed_Yvar)
+                        # bring `(o) x batch_shape x 1` noise into the shape
+                        # `batch_shape x 1 x 1 x o`
+                        expected_noise = model.likelihood.noise.squeeze(-1)
+                        if num_outputs > 1:
+                            expected_noise = expected_noise.permute(
+                                *range(1, expected_noise.dim()), 0
+                            )
+                        else:
+                            expected_noise = expected_noise.unsqueeze(-1)
+                        expected_noise = expected_noise.unsqueeze(-2).unsqueeze(-2)
+                        self.assertTrue(
+                            torch.allclose(noise, expected_noise.expand_as(noise))
+                        )
+                    else:
+                        self.assertTrue(
+                            torch.allclose(cv_results.observed_Yvar, cv_folds.test_Yvar)
+                        )
+                        self.assertTrue(torch.allclose(noise, cv_folds.test_Yvar))
+
+    def test_loo_cross_validation_cuda(self):
+        if torch.cuda.is_available():
+            self.test_loo_cross_validation(cuda=True)
+
+    def test_loo_cross_validation_unsupported(self):
+        train_X, train_Y = _get_random_data(batch_shape=torch.Size(), num_outputs=1)
+        model = ModelListGP([SingleTaskGP(train_X, train_Y)])
+        with self.assertRaises(UnsupportedError):
+            loo_cross_validation(model)
+
+
+class TestGenKFoldCVFolds(unittest.TestCase):
+    def test_gen_kfold_cv_folds(self, cuda=False):
+        n, num_folds = 10, 3
+        tkwargs = {"device": torch.device("cuda") if cuda else torch.device("cpu")}
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            train_X = torch.rand(batch_shape + torch.Size([n, 2]), **tkwargs)
+            train_Y = torch.rand(batch_shape + torch.Size([n]), **tkwargs)
+            train_Yvar = torch.rand_like(train_Y)
+            cv_folds = gen_kfold_cv_folds(
+                train_X=train_X,
+                train_Y=train_Y,
+                train_Yvar=train_Yvar,
+                num_folds=num_folds,
+                num_repeats=2,
+                seed=0,
+            )
+            # folds are generated lazily
+            self.assertNotIsInstance(cv_folds, list)
+            cv_folds = list(cv_folds)
+            self.assertEqual(len(cv_folds), 2 * num_folds)
+            for repeat in range(2):
+                folds = cv_folds[repeat * num_folds : (repeat + 1) * num_folds]
+                # each point is a test point exactly once per repeat
+                test_X = torch.cat([f.test_X for f in folds], dim=-2)
+                self.assertEqual(test_X.shape, train_X.shape)
+                self.assertTrue(
+                    torch.equal(
+                        test_X[..., 0].sort(dim=-1)[0], train_X[..., 0].sort(dim=-1)[0]
+                    )
+                )
+                for f in folds:
+                    n_test = f.test_X.shape[-2]
+                    self.assertIn(n_test, (3, 4))
+                    self.assertEqual(
+                        f.train_X.shape, batch_shape + torch.Size([n - n_test, 2])
+                    )
+                    self.assertEqual(
+                        f.test_Y.shape, batch_shape + torch.Size([n_test, 1])
+                    )
+                    self.assertEqual(
+                        f.train_Yvar.shape, batch_shape + torch.Size([n - n_test, 1])
+                    )
+                    # training and test data are disjoint
+                    all_X = torch.cat([f.train_X, f.test_X], dim=-2)
+                    self.assertTrue(
+                        torch.equal(
+                            all_X[..., 0].sort(dim=-1)[0],
+                            train_X[..., 0].sort(dim=-1)[0],
+                        )
+                    )
+            # test seed
+            cv_folds_2 = list(
+                gen_kfold_cv_folds(
+                    train_X=train_X,
+                    train_Y=train_Y,
+                    train_Yvar=train_Yvar,
+                    num_folds=num_folds,
+                    num_repeats=2,
+                    seed=0,
+                )
+            )
+            for f1, f2 in zip(cv_folds, cv_folds_2):
+                self.assertTrue(torch.equal(f1.test_X, f2.test_X))
+            # test stratification
+            if len(batch_shape) == 0:
+                train_Y = torch.arange(n, **tkwargs).float()
+                for f in gen_kfold_cv_folds(
+                    train_X=train_X, train_Y=train_Y, num_folds=2, stratify=True
+                ):
+                    # one of each pair of consecutive observations per fold
+                    blocks = (f.test_Y.view(-1) // 2).sort()[0]
+                    self.assertTrue(
+                        torch.equal(blocks, torch.arange(n // 2, **tkwargs).float())
+                    )
+                    self.assertIsNone(f.train_Yvar)
+            else:
+                with self.assertRaises(UnsupportedError):
+                    next(gen_kfold_cv_folds(train_X, train_Y, stratify=True))
+            with self.assertRaises(ValueError):
+                next(gen_kfold_cv_folds(train_X, train_Y, num_folds=n + 1))
+
+    def test_gen_kfold_cv_folds_cuda(self):
+        if torch.cuda.is_available():
+            self.test_gen_kfold_cv_folds(cuda=True)
+
+
+class TestStreamingCrossValidation(unittest.TestCase):
+    def test_streaming_cross_validation(self, cuda=False):
+        n, num_folds = 10, 3
+        for batch_shape in (torch.Size([]), torch.Size([2])):
+            for num_outputs in (1, 2):
+                tkwargs = {
+                    "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                    "dtype": torch.double,
+                }
+                train_X, train_Y = _get_random_data(
+                    batch_shape=batch_shape, num_outputs=num_outputs, n=n, **tkwargs
+                )
+                train_Yvar = torch.full_like(train_Y, 0.01)
+                cv_folds = list(
+                    gen_kfold_cv_folds(
+                        train_X=train_X,
+                        train_Y=train_Y,
+                        train_Yvar=train_Yvar,
+                        num_folds=num_folds,
+                        seed=0,
+                    )
+                )
+                # folds of sizes 4, 3, 3 result in groups of 1 and 2 folds
+                results = list(
+                    streaming_cross_validation(
+                        model_cls=FixedNoiseGP,
+                        mll_cls=ExactMarginalLogLikelihood,
+                        cv_folds=iter(cv_folds),
+                        fold_batch_size=2,
+                        fit_args={"options": {"maxiter": 1}},
+                    )
+                )
+                self.assertEqual(len(results), 2)
+                for cv_results, k, n_test in zip(results, (1, 2), (4, 3)):
+                    expected_shape = batch_shape + torch.Size([k, n_test, num_outputs])
+                    self.assertEqual(cv_results.posterior.mean.shape, expected_shape)
+                    self.assertEqual(cv_results.observed_Y.shape, expected_shape)
+                    self.assertEqual(cv_results.observed_Yvar.shape, expected_shape)
+                self.assertTrue(
+                    torch.equal(results[0].observed_Y[..., 0, :, :], cv_folds[0].test_Y)
+                )
+                self.assertTrue(
+                    torch.equal(results[1].observed_Y[..., 1, :, :], cv_folds[2].test_Y)
+                )
+
+    def test_streaming_cross_validation_cuda(self):
+        if torch.cuda.is_available():
+            self.test_streaming_cross_validation(cuda=True)
+
+    def test_streaming_cross_validation_workers(self):
+        train_X, train_Y = _get_random_data(
+            batch_shape=torch.Size(), num_outputs=1, n=9, dtype=torch.double
+        )
+        fit_args = {"options": {"maxiter": 2}}
+        results = []
+        for max_workers in (None, 2):
+            cv_folds = gen_kfold_cv_folds(
+                train_X=train_X, train_Y=train_Y, num_folds=3, seed=0
+            )
+            results.append(
+                list(
+                    streaming_cross_validation(
+                        model_cls=SingleTaskGP,
+                        mll_cls=ExactMarginalLogLikelihood,
+                        cv_folds=cv_folds,
+                        fit_args=fit_args,
+                        max_workers=max_workers,
+                    )
+                )
+            )
+        self.assertEqual(len(results[1]), 3)
+        for cv_results, expected in zip(*results):
+            self.assertIsInstance(cv_results.model, SingleTaskGP)
+            self.assertTrue(
+                torch.allclose(
+                    cv_results.posterior.mean, expected.posterior.mean, atol=1e-6
+                )
+            )
+            self.assertTrue(torch.equal(cv_results.observed_Y, expected.observed_Y))
@@ -2,16 +2,25 @@
 
 import math
 import unittest
+from unittest import mock
 
 import torch
 from botorch import fit_gpytorch_model
 from botorch.models import SingleTaskGP
+from botorch.exceptions.errors import UnsupportedError
 from botorch.optim.fit import (
     OptimizationIteration,
+    _get_log_jacobian,
+    fit_gpytorch_hmc,
+    fit_gpytorch_lbfgs_batched,
     fit_gpytorch_scipy,
     fit_gpytorch_torch,
+    fit_gpytorch_torch_batched,
 )
+from botorch.optim.utils import _get_batch_mll
+from botorch.utils.sampling import manual_seed
 from gpytorch.mlls.exact_marginal_log_likelihood import ExactMarginalLogLikelihood
+from torch.utils.data import DataLoader, TensorDataset
 
 
 NOISE = [0.127, -0.113, -0.345, -0.034, -0.069, -0.272, 0.013, 0.056, 0.087, -0.081]
@@ -92,3 +101,228 @@ class TestFitGPyTorchModel(unittest.TestCase):
     def test_fit_gpytorch_model_torch_cuda(self):
         if torch.cuda.is_available():
             self.test_fit_gpytorch_model_torch(cuda=True)
+
+    def test_fit_gpytorch_torch_data_loader(self):
+        mll = self._getModel()
+        train_x, train_y = mll.model.train_inputs[0], mll.model.train_targets
+        loader = DataLoader(TensorDataset(train_x, train_y), batch_size=5)
+        # minibatch training is only supported for variational models
+        with self.assertRaises(UnsupportedError):
+            fit_gpytorch_torch(mll, data_loader=loader)
+
+
+class TestFitGPyTorchModelBatched(unittest.TestCase):
+    def test_fit_gpytorch_torch_batched(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for double in (False, True):
+            tkwargs = {
+                "device": device,
+                "dtype": torch.double if double else torch.float,
+            }
+            train_x = torch.linspace(0, 1, 10, **tkwargs).unsqueeze(-1)
+            noise = torch.tensor(NOISE, **tkwargs)
+            train_y = torch.stack(
+                [
+                    torch.sin(train_x.view(-1) * (2 * math.pi)) + noise,
+                    torch.full_like(noise, 0.5),
+                ]
+            )
+            model = SingleTaskGP(train_x.expand(2, 10, 1), train_y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            options = {"disp": True, "maxiter": 30, "ftol": 1e-3, "window": 2}
+            mll, iterations = fit_gpytorch_torch_batched(
+                mll, options=options, track_iterations=True
+            )
+            self.assertGreater(len(iterations), 0)
+            self.assertLessEqual(len(iterations), options["maxiter"])
+            self.assertIsInstance(iterations[0], OptimizationIteration)
+            lengthscale = model.covar_module.base_kernel.raw_lengthscale
+            self.assertEqual(lengthscale.shape, torch.Size([2, 1, 1]))
+            self.assertTrue((lengthscale.abs() > 0.1).all())
+
+            # converged batches are frozen: with maxiter=1 all batches converge
+            # after the first step
+            model = SingleTaskGP(train_x.expand(2, 10, 1), train_y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            mll, iterations = fit_gpytorch_torch_batched(
+                mll, options={"disp": False, "maxiter": 1}
+            )
+            self.assertEqual(len(iterations), 1)
+
+            # test bounds
+            model = SingleTaskGP(train_x.expand(2, 10, 1), train_y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            mll, _ = fit_gpytorch_torch_batched(
+                mll,
+                bounds={"likelihood.noise_covar.raw_noise": (1e-1, None)},
+                options={"disp": False, "maxiter": 5},
+            )
+            self.assertTrue((model.likelihood.raw_noise >= 1e-1).all())
+
+    def test_fit_gpytorch_torch_batched_cuda(self):
+        if torch.cuda.is_available():
+            self.test_fit_gpytorch_torch_batched(cuda=True)
+
+
+class TestFitGPyTorchHMC(unittest.TestCase):
+    def test_fit_gpytorch_hmc(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for double in (False, True):
+            tkwargs = {
+                "device": device,
+                "dtype": torch.double if double else torch.float,
+            }
+            train_x = torch.linspace(0, 1, 10, **tkwargs).unsqueeze(-1)
+            noise = torch.tensor(NOISE, **tkwargs)
+            train_y = torch.sin(train_x.view(-1) * (2 * math.pi)) + noise
+            model = SingleTaskGP(train_x.expand(3, 10, 1), train_y.expand(3, 10))
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            mll.train()
+            options = {"num_warmup": 5, "num_iterations": 3, "disp": True}
+            initial_lengthscale = (
+                model.covar_module.base_kernel.raw_lengthscale.detach().clone().view(-1)
+            )
+            with manual_seed(1234):
+                mll, iterations = fit_gpytorch_hmc(
+                    mll,
+                    bounds={"likelihood.noise_covar.raw_noise": (1e-3, None)},
+                    options=options,
+                )
+            self.assertEqual(len(iterations), 8)
+            self.assertIsInstance(iterations[0], OptimizationIteration)
+            self.assertTrue((model.likelihood.raw_noise >= 1e-3).all())
+            for param in model.parameters():
+                self.assertFalse(torch.isnan(param).any())
+            # chains evolve independently (from a shared initial state)
+            lengthscale = model.covar_module.base_kernel.raw_lengthscale.view(-1)
+            self.assertEqual(lengthscale.unique().numel(), 3)
+            self.assertTrue((lengthscale != initial_lengthscale).all())
+
+            # shared parameters are not supported
+            mll.register_parameter(
+                "dummy_param", torch.nn.Parameter(torch.tensor([5.0], **tkwargs))
+            )
+            with self.assertRaises(UnsupportedError):
+                fit_gpytorch_hmc(mll, options=options)
+
+    def test_fit_gpytorch_hmc_cuda(self):
+        if torch.cuda.is_available():
+            self.test_fit_gpytorch_hmc(cuda=True)
+
+    def test_fit_gpytorch_hmc_non_psd(self, cuda=False):
+        tkwargs = {
+            "device": torch.device("cuda") if cuda else torch.device("cpu"),
+            "dtype": torch.double,
+        }
+        train_x = torch.linspace(0, 1, 10, **tkwargs).unsqueeze(-1)
+        train_y = torch.sin(train_x.view(-1) * (2 * math.pi))
+        model = SingleTaskGP(train_x.expand(3, 10, 1), train_y.expand(3, 10))
+        mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+        mll.train()
+        initial_params = [p.detach().clone() for p in model.parameters()]
+        options = {"num_warmup": 0, "num_iterations": 1, "disp": False}
+        calls = []
+
+        def batch_mll(mll):
+            # fail the batched evaluation after the first leapfrog step
+            calls.append(None)
+            if len(calls) == 2:
+                raise RuntimeError("cholesky_cpu: U(1,1) is zero, singular U.")
+            return _get_batch_mll(mll)
+
+        failed = torch.tensor([True, False, False], device=tkwargs["device"])
+        with mock.patch("botorch.optim.fit._get_batch_mll", side_effect=batch_mll):
+            with mock.patch(
+                "botorch.optim.fit._get_non_psd_chains", return_value=failed
+            ):
+                with manual_seed(0):
+                    fit_gpytorch_hmc(mll, options=options)
+        # only the failed chain is rejected
+        for p, p0 in zip(model.parameters(), initial_params):
+            self.assertTrue(torch.equal(p[0], p0[0]))
+        lengthscale = model.covar_module.base_kernel.raw_lengthscale.view(-1)
+        self.assertFalse(torch.equal(lengthscale[1:], initial_params[-1].view(-1)[1:]))
+        # errors that are not due to non-PSD covariances are raised
+        calls.clear()
+        with mock.patch("botorch.optim.fit._get_batch_mll", side_effect=batch_mll):
+            with mock.patch(
+                "botorch.optim.fit._get_non_psd_chains",
+                return_value=torch.zeros_like(failed),
+            ):
+                with self.assertRaises(RuntimeError):
+                    fit_gpytorch_hmc(mll, options=options)
+
+    def test_fit_gpytorch_hmc_non_psd_cuda(self):
+        if torch.cuda.is_available():
+            self.test_fit_gpytorch_hmc_non_psd(cuda=True)
+
+    def test_get_log_jacobian(self):
+        model = SingleTaskGP(torch.rand(3, 5, 1), torch.rand(3, 5))
+        kernel = model.covar_module.base_kernel
+        raw = kernel.raw_lengthscale
+        log_jacobian = _get_log_jacobian(
+            param=raw,
+            constraint=kernel.raw_lengthscale_constraint,
+            batch_shape=torch.Size([3]),
+        )
+        # softplus has derivative sigmoid
+        expected = torch.sigmoid(raw).log().view(3, -1).sum(dim=-1)
+        self.assertTrue(torch.allclose(log_jacobian, expected))
+        self.assertTrue(log_jacobian.requires_grad)
+
+
+class TestFitGPyTorchLBFGSBatched(unittest.TestCase):
+    def test_fit_gpytorch_lbfgs_batched(self, cuda=False):
+        device = torch.device("cuda") if cuda else torch.device("cpu")
+        for double in (False, True):
+            tkwargs = {
+                "device": device,
+                "dtype": torch.double if double else torch.float,
+            }
+            train_x = torch.linspace(0, 1, 10, **tkwargs).unsqueeze(-1)
+            noise = torch.tensor(NOISE, **tkwargs)
+            train_y = torch.stack(
+                [
+                    torch.sin(train_x.view(-1) * (2 * math.pi)) + noise,
+                    torch.full_like(noise, 0.5),
+                ],
+                dim=-1,
+            )
+            model = SingleTaskGP(train_x, train_y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            mll.train()
+            with torch.no_grad():
+                initial_mll = _get_batch_mll(mll)
+            options = {"disp": True, "maxiter": 20}
+            mll, iterations = fit_gpytorch_lbfgs_batched(mll, options=options)
+            self.assertGreater(len(iterations), 0)
+            self.assertLessEqual(len(iterations), options["maxiter"])
+            self.assertIsInstance(iterations[0], OptimizationIteration)
+            # each output improves separately
+            with torch.no_grad():
+                final_mll = _get_batch_mll(mll)
+            self.assertEqual(final_mll.shape, torch.Size([2]))
+            self.assertTrue((final_mll > initial_mll).all())
+            self.assertLess(iterations[-1].fun, iterations[0].fun)
+
+            # test via fit_gpytorch_model and bounds
+            model = SingleTaskGP(train_x, train_y)
+            mll = ExactMarginalLogLikelihood(model.likelihood, model).to(**tkwargs)
+            mll = fit_gpytorch_model(
+                mll,
+                optimizer=fit_gpytorch_lbfgs_batched,
+                bounds={"likelihood.noise_covar.raw_noise": (1e-1, None)},
+                options={"disp": False, "maxiter": 5},
+            )
+            self.assertTrue((model.likelihood.raw_noise >= 1e-1).all())
+
+            # shared parameters are not supported
+            mll.register_parameter(
+                "dummy_param", torch.nn.Parameter(torch.tensor([5.0], **tkwargs))
+            )
+            with self.assertRaises(UnsupportedError):
+                fit_gpytorch_lbfgs_batched(mll, options=options)
+
+    def test_fit_gpytorch_lbfgs_batched_cuda(self):
+        if torch.cuda.is_available():
+            self.test_fit_gpytorch_lbfgs_batched(cuda=True)
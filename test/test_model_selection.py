@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+
+import math
+import unittest
+
+import torch
+from botorch.exceptions.errors import UnsupportedError
+from botorch.model_selection import (
+    ModelCandidate,
+    ModelSelectionResults,
+    batch_model_selection,
+)
+from botorch.models.gp_regression import SingleTaskGP
+from botorch.models.kernels import MixedMaternKernel
+from botorch.posteriors import GPyTorchPosterior
+
+
+def _get_random_data(num_outputs, n=10, **tkwargs):
+    train_x = torch.linspace(0, 0.95, n, **tkwargs).unsqueeze(-1) + 0.05 * torch.rand(
+        n, 1, **tkwargs
+    )
+    train_y = torch.sin(train_x * (2 * math.pi)) + 0.2 * torch.randn(
+        n, num_outputs, **tkwargs
+    )
+    if num_outputs == 1:
+        train_y = train_y.squeeze(-1)
+    return train_x, train_y
+
+
+class TestBatchModelSelection(unittest.TestCase):
+    def test_batch_model_selection(self, cuda=False):
+        candidates = [
+            ModelCandidate(nu=0.5),
+            ModelCandidate(nu=2.5, lengthscale_prior=(2.0, 4.0)),
+            ModelCandidate(nu=math.inf, noise_prior=(1.5, 0.1)),
+        ]
+        for num_outputs in (1, 2):
+            for double in (False, True):
+                for criterion in ("mll", "loo"):
+                    tkwargs = {
+                        "device": torch.device("cuda") if cuda else torch.device("cpu"),
+                        "dtype": torch.double if double else torch.float,
+                    }
+                    train_X, train_Y = _get_random_data(
+                        num_outputs=num_outputs, **tkwargs
+                    )
+                    results = batch_model_selection(
+                        train_X=train_X,
+                        train_Y=train_Y,
+                        candidates=candidates,
+                        criterion=criterion,
+                        fit_args={"options": {"maxiter": 5, "disp": False}},
+                    )
+                    self.assertIsInstance(results, ModelSelectionResults)
+                    self.assertIsInstance(results.model, SingleTaskGP)
+                    self.assertEqual(results.scores.shape, torch.Size([3, num_outputs]))
+                    self.assertTrue(
+                        torch.equal(results.best_index, results.scores.argmax(dim=0))
+                    )
+                    # check the best model
+                    best_model = results.best_model
+                    kernel = best_model.covar_module.base_kernel
+                    self.assertIsInstance(kernel, MixedMaternKernel)
+                    nu_best = torch.tensor(
+                        [candidates[i].nu for i in results.best_index.tolist()]
+                    ).to(kernel.nu)
+                    self.assertTrue(torch.equal(kernel.nu.view(-1), nu_best))
+                    batched_ls = results.model.covar_module.base_kernel.lengthscale
+                    if num_outputs > 1:
+                        expected_ls = batched_ls[
+                            torch.arange(num_outputs), results.best_index
+                        ]
+                    else:
+                        expected_ls = batched_ls[results.best_index[0]]
+                    self.assertTrue(torch.equal(kernel.lengthscale, expected_ls))
+                    X = torch.rand(4, 1, **tkwargs)
+                    posterior = best_model.posterior(X)
+                    self.assertIsInstance(posterior, GPyTorchPosterior)
+                    self.assertEqual(posterior.mean.shape, torch.Size([4, num_outputs]))
+
+    def test_batch_model_selection_cuda(self):
+        if torch.cuda.is_available():
+            self.test_batch_model_selection(cuda=True)
+
+    def test_batch_model_selection_errors(self):
+        train_X, train_Y = _get_random_data(num_outputs=1)
+        with self.assertRaises(ValueError):
+            batch_model_selection(train_X, train_Y, [ModelCandidate()], criterion="foo")
+        with self.assertRaises(UnsupportedError):
+            batch_model_selection(
+                train_X.unsqueeze(0), train_Y.unsqueeze(0), [ModelCandidate()]
+            )
@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import torch
+from botorch.utils.cholesky import cholesky_delete, cholesky_extend, cholesky_update
+
+
+class TestCholeskyExtend(unittest.TestCase):
+    def test_cholesky_extend(self, cuda=False):
+        tkwargs = {"device": torch.device("cuda" if cuda else "cpu")}
+        for dtype in (torch.float, torch.double):
+            tkwargs["dtype"] = dtype
+            for batch_shape in (torch.Size([]), torch.Size([2])):
+                A = torch.randn(batch_shape + torch.Size([6, 6]), **tkwargs)
+                K = A @ A.transpose(-1, -2) + torch.eye(6, **tkwargs)
+                L = torch.cholesky(K[..., :4, :4])
+                L_ext = cholesky_extend(L, K[..., :4, 4:], K[..., 4:, 4:])
+                self.assertEqual(L_ext.shape, K.shape)
+                self.assertTrue(torch.allclose(L_ext, torch.cholesky(K), atol=1e-4))
+                self.assertTrue(torch.equal(L_ext, L_ext.tril()))
+            # test broadcasting of a non-batched factor
+            K = K[0]
+            L = torch.cholesky(K[:4, :4])
+            K12 = K[:4, 4:].expand(3, 4, 2)
+            L_ext = cholesky_extend(L, K12, K[4:, 4:])
+            self.assertEqual(L_ext.shape, torch.Size([3, 6, 6]))
+            self.assertTrue(
+                torch.allclose(L_ext, torch.cholesky(K).expand(3, 6, 6), atol=1e-4)
+            )
+
+    def test_cholesky_extend_cuda(self):
+        if torch.cuda.is_available():
+            self.test_cholesky_extend(cuda=True)
+
+
+class TestCholeskyUpdate(unittest.TestCase):
+    def test_cholesky_update(self, cuda=False):
+        tkwargs = {"device": torch.device("cuda" if cuda else "cpu")}
+        for dtype in (torch.float, torch.double):
+            tkwargs["dtype"] = dtype
+            for batch_shape in (torch.Size([]), torch.Size([2])):
+                A = torch.randn(batch_shape + torch.Size([5, 5]), **tkwargs)
+                K = A @ A.transpose(-1, -2) + torch.eye(5, **tkwargs)
+                x = torch.randn(batch_shape + torch.Size([5]), **tkwargs)
+                L = torch.cholesky(K)
+                L_up = cholesky_update(L, x)
+                expected = torch.cholesky(K + x.unsqueeze(-1) @ x.unsqueeze(-2))
+                self.assertTrue(torch.allclose(L_up, expected, atol=1e-4))
+                self.assertTrue(torch.equal(L_up, L_up.tril()))
+                # inputs are not modified in-place
+                self.assertTrue(torch.equal(L, torch.cholesky(K)))
+
+    def test_cholesky_update_cuda(self):
+        if torch.cuda.is_available():
+            self.test_cholesky_update(cuda=True)
+
+
+class TestCholeskyDelete(unittest.TestCase):
+    def test_cholesky_delete(self, cuda=False):
+        tkwargs = {"device": torch.device("cuda" if cuda else "cpu")}
+        for dtype in (torch.float, torch.double):
+            tkwargs["dtype"] = dtype
+            for batch_shape in (torch.Size([]), torch.Size([2])):
+                A = torch.randn(batch_shape + torch.Size([5, 5]), **tkwargs)
+                K = A @ A.transpose(-1, -2) + torch.eye(5, **tkwargs)
+                L = torch.cholesky(K)
+                for index in (0, 2, 4):
+                    keep = torch.tensor(
+                        [i for i in range(5) if i != index], device=tkwargs["device"]
+                    )
+                    L_del = cholesky_delete(L, index)
+                    K_del = K.index_select(-2, keep).index_select(-1, keep)
+                    self.assertEqual(L_del.shape, K_del.shape)
+                    self.assertTrue(
+                        torch.allclose(L_del, torch.cholesky(K_del), atol=1e-4)
+                    )
+
+    def test_cholesky_delete_cuda(self):
+        if torch.cuda.is_available():
+            self.test_cholesky_delete(cuda=True)
@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import torch
+from botorch.utils.out_of_core import (
+    TiledLowerMatrix,
+    tiled_cholesky_,
+    tiled_logdet,
+    tiled_matrix,
+    tiled_triangular_solve,
+)
+
+
+def _get_psd_matrix(n, **tkwargs):
+    A = torch.randn(n, n, **tkwargs)
+    return A @ A.t() + n * torch.eye(n, **tkwargs)
+
+
+class TestTiledLowerMatrix(unittest.TestCase):
+    def test_tiled_lower_matrix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            A = TiledLowerMatrix(n=5, tile_size=2, directory=directory)
+            self.assertEqual(A.num_tiles, 3)
+            self.assertEqual(A.data.shape, (6, 2, 2))
+            self.assertEqual(os.path.dirname(A.filename), directory)
+            self.assertEqual(A.tile_slice(2), slice(4, 5))
+            # the trailing diagonal tile is padded with an identity
+            self.assertTrue(
+                torch.equal(A.get_tile(2, 2), torch.tensor([[0.0, 0.0], [0.0, 1.0]]))
+            )
+            A.set_tile(2, 1, torch.ones(1, 2))
+            self.assertEqual(A.get_tile(2, 1).dtype, torch.double)
+            self.assertTrue(
+                torch.equal(A.get_tile(2, 1), torch.tensor([[1.0, 1.0], [0.0, 0.0]]))
+            )
+            with self.assertRaises(IndexError):
+                A.get_tile(1, 2)
+            # the file is removed with the matrix
+            filename = A.filename
+            del A
+            self.assertFalse(os.path.exists(filename))
+
+
+class TestTiledCholesky(unittest.TestCase):
+    def test_tiled_cholesky(self, cuda=False):
+        device = torch.device("cuda" if cuda else "cpu")
+        for dtype in (torch.float, torch.double):
+            tkwargs = {"device": device, "dtype": dtype}
+            for n, tile_size in ((7, 3), (8, 4), (5, 8)):
+                K = _get_psd_matrix(n, **tkwargs)
+                A = tiled_matrix(
+                    lambda rows, cols: K[rows, cols],
+                    n=n,
+                    tile_size=tile_size,
+                    dtype=dtype,
+                )
+                L = tiled_cholesky_(A, device=device)
+                self.assertIs(L, A)
+                L_dense = torch.cat(
+                    [
+                        torch.cat(
+                            [
+                                L.get_tile(i, j)
+                                if j <= i
+                                else torch.zeros(tile_size, tile_size, dtype=dtype)
+                                for j in range(L.num_tiles)
+                            ],
+                            dim=-1,
+                        )
+                        for i in range(L.num_tiles)
+                    ]
+                )[:n, :n].to(device)
+                self.assertTrue(
+                    torch.allclose(L_dense, torch.cholesky(K), atol=1e-4, rtol=1e-4)
+                )
+                self.assertTrue(
+                    torch.allclose(tiled_logdet(L).to(K), K.logdet(), atol=1e-4)
+                )
+                B = torch.randn(n, 2, **tkwargs)
+                X = tiled_triangular_solve(L, B)
+                self.assertEqual(X.shape, B.shape)
+                self.assertTrue(torch.allclose(L_dense @ X, B, atol=1e-4))
+                X = tiled_triangular_solve(L, B, transpose=True)
+                self.assertTrue(torch.allclose(L_dense.t() @ X, B, atol=1e-4))
+                # test gradients w.r.t. the right hand side
+                B.requires_grad_(True)
+                tiled_triangular_solve(L, B).sum().backward()
+                expected_grad = torch.triangular_solve(
+                    torch.ones_like(B), L_dense, upper=False, transpose=True
+                )[0]
+                self.assertTrue(torch.allclose(B.grad, expected_grad, atol=1e-4))
+
+    def test_tiled_cholesky_cuda(self):
+        if torch.cuda.is_available():
+            self.test_tiled_cholesky(cuda=True)